@@ -0,0 +1,151 @@
+"""
+Generator of synthetic datasets in the layout of the SampleProjectSchema, to benchmark the analyzer with realistic
+sizes. The tasks are generated day by day: the number of tasks closed each day follows the chosen throughput
+distribution, and the cycle time and the wait before starting each task are drawn from log-normal distributions.
+A share of the tasks is left open (to do or in progress) at the end of the history.
+
+Usage: python benchmarks/generate_dataset.py --tasks 1000000 --throughput bursty --output datasets/synthetic.csv
+"""
+import argparse
+import datetime
+import math
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+THROUGHPUT_DISTRIBUTIONS = ["poisson", "uniform", "bursty"]
+TYPES = ["Feature", "Bug", "Tech-debt", "Infra"]
+TYPE_PROBABILITIES = [0.45, 0.25, 0.2, 0.1]
+POINTS = [1, 2, 3, 5, 8]
+# share of the tasks without estimation
+UNESTIMATED_RATIO = 0.2
+DATE_FORMAT_UNIT = "ms"
+DEFAULT_START_DATE = datetime.datetime(2020, 1, 1)
+DEFAULT_CHUNK_SIZE = 1_000_000
+COLUMNS = ["Name", "ID", "Status", "Backlog", "Type", "lastModifiedStatus", "createdAt", "TaskName", "toDone",
+           "stillInProgress", "toInProgress", "Cycle Time", "Points"]
+
+
+def draw_throughput(rng: np.random.Generator, distribution: str, mean: float, num_days: int) -> np.ndarray:
+    """
+    Returns the number of tasks closed on each of the given number of days
+    """
+    if distribution == "poisson":
+        return rng.poisson(mean, num_days)
+    elif distribution == "uniform":
+        return rng.integers(0, max(1, round(2 * mean)) + 1, num_days)
+    elif distribution == "bursty":
+        # negative binomial: same mean, but with many idle days and a few days closing lots of tasks
+        dispersion = 0.5
+        return rng.negative_binomial(dispersion, dispersion / (dispersion + mean), num_days)
+    else:
+        raise ValueError(f"Invalid throughput distribution: {distribution}")
+
+
+def generate_tasks(num_tasks: int, throughput: str = "poisson", mean_throughput: float = 5.0,
+                   open_ratio: float = 0.1, start_date: datetime.datetime = DEFAULT_START_DATE,
+                   seed: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yields the tasks of the dataset in chunks of at most chunk_size tasks, ordered by closing date
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(start_date, DATE_FORMAT_UNIT)
+    day_ms = np.timedelta64(1, "D").astype(f"timedelta64[{DATE_FORMAT_UNIT}]")
+    first_day = 0
+    for first_task in range(0, num_tasks, chunk_size):
+        size = min(chunk_size, num_tasks - first_task)
+        num_closed = round(size * (1 - open_ratio))
+
+        # days of the chunk, drawn until they close enough tasks
+        counts = np.empty(0, dtype=np.int64)
+        while counts.sum() < num_closed:
+            counts = np.concatenate([counts, draw_throughput(rng, throughput, mean_throughput,
+                                                             math.ceil(num_closed / mean_throughput) + 1)])
+        num_days = int(np.searchsorted(np.cumsum(counts), num_closed)) + 1
+        closing_days = first_day + np.repeat(np.arange(num_days), counts[:num_days])[:num_closed]
+
+        closed_at = start + closing_days * day_ms + rng.integers(0, day_ms.astype(np.int64), num_closed)
+        cycle_days = np.floor(rng.lognormal(1.0, 0.8, num_closed))
+        started_at = closed_at - (cycle_days * day_ms.astype(np.int64)).astype(np.int64)
+        started_at -= rng.integers(0, day_ms.astype(np.int64) // 4, num_closed)
+        wait_days = np.floor(rng.lognormal(1.5, 1.0, num_closed))
+        created_at = started_at - (wait_days * day_ms.astype(np.int64)).astype(np.int64)
+
+        # open tasks, created during the days of the chunk
+        num_open = size - num_closed
+        open_created_at = start + (first_day + rng.integers(0, num_days, num_open)) * day_ms + \
+            rng.integers(0, day_ms.astype(np.int64), num_open)
+        in_progress = rng.random(num_open) < 0.5
+        open_started_at = np.where(in_progress, open_created_at + day_ms, np.datetime64("NaT"))
+        first_day += num_days
+
+        status = np.concatenate([np.full(num_closed, "Done", dtype=object),
+                                 np.where(in_progress, "In Progress", "Todo").astype(object)])
+        created = np.concatenate([created_at, open_created_at])
+        started = np.concatenate([started_at, open_started_at.astype(created.dtype)])
+        closed = np.concatenate([closed_at, np.full(num_open, np.datetime64("NaT"), dtype=created.dtype)])
+        points = rng.choice(POINTS, size).astype(np.float64)
+        points[rng.random(size) < UNESTIMATED_RATIO] = np.nan
+        ids = np.arange(first_task + 1, first_task + size + 1)
+        names = np.char.add("task ", ids.astype(str)).astype(object)
+        yield pd.DataFrame({
+            "Name": names,
+            "ID": ids,
+            "Status": status,
+            "Backlog": np.where(status == "Todo", "Product Backlog", "Sprint Backlog"),
+            "Type": rng.choice(TYPES, size, p=TYPE_PROBABILITIES),
+            "lastModifiedStatus": _format_dates(np.fmax(np.fmax(created, started), closed)),
+            "createdAt": _format_dates(created),
+            "TaskName": names,
+            "toDone": _format_dates(closed),
+            "stillInProgress": None,
+            "toInProgress": _format_dates(started),
+            "Cycle Time": None,
+            "Points": points,
+        }, columns=COLUMNS)
+
+
+def write_dataset(file_path: str, num_tasks: int, file_format: str = "csv", **kwargs):
+    """
+    Writes a synthetic dataset to file_path, chunk by chunk (see generate_tasks for the parameters)
+    """
+    with open(file_path, "w", newline="") as dataset_file:
+        if file_format == "csv":
+            header = True
+            for chunk in generate_tasks(num_tasks, **kwargs):
+                chunk.to_csv(dataset_file, index=False, header=header)
+                header = False
+        elif file_format == "json":
+            # array of records, written chunk by chunk
+            dataset_file.write("[")
+            for index, chunk in enumerate(generate_tasks(num_tasks, **kwargs)):
+                if index > 0:
+                    dataset_file.write(",")
+                dataset_file.write(chunk.to_json(orient="records")[1:-1])
+            dataset_file.write("]")
+        else:
+            raise ValueError("Invalid format")
+
+
+def _format_dates(dates: np.ndarray) -> np.ndarray:
+    # same ISO 8601 layout as Airtable (e.g. 2024-02-08T10:22:39.000Z), None when missing
+    formatted = np.char.add(np.datetime_as_string(dates, unit=DATE_FORMAT_UNIT), "Z").astype(object)
+    formatted[np.isnat(dates)] = None
+    return formatted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic dataset in the layout of the sample project")
+    parser.add_argument("--tasks", "-n", type=int, required=True, help="Number of tasks")
+    parser.add_argument("--output", "-o", type=str, required=True, help="Dataset file path")
+    parser.add_argument("--format", "-f", type=str, default="csv", help="Format of the dataset: csv, json")
+    parser.add_argument("--throughput", "-t", type=str, default="poisson", choices=THROUGHPUT_DISTRIBUTIONS,
+                        help="Distribution of the number of tasks closed per day")
+    parser.add_argument("--mean_throughput", type=float, default=5.0, help="Mean number of tasks closed per day")
+    parser.add_argument("--open_ratio", type=float, default=0.1, help="Share of tasks still open")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random generator")
+    args = parser.parse_args()
+
+    write_dataset(args.output, args.tasks, file_format=args.format, throughput=args.throughput,
+                  mean_throughput=args.mean_throughput, open_ratio=args.open_ratio, seed=args.seed)
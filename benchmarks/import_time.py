@@ -0,0 +1,71 @@
+"""
+Benchmark of the cold start of the package: time to import it and time to the first report, each one measured in a
+fresh interpreter. The eager scenario imports every report and its dependencies up front, as the package did before
+the imports were made lazy, to show the difference.
+
+Usage: python benchmarks/import_time.py --dataset datasets/sample_project.csv --project sample_project
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+
+IMPORT_PACKAGE = "import development_analyzer"
+
+EAGER_IMPORTS = """
+import pandas, scipy.stats, matplotlib.pyplot
+from development_analyzer.reports import cumulative_flow_diagram, cycle_time_estimation_relationship, \\
+    cycle_time_histogram, cycle_time_scatter, monte_carlo_how_many_done, monte_carlo_when_will_be_finished
+"""
+
+FIRST_REPORT = """
+from development_analyzer import DevelopmentAnalyzer
+from development_analyzer.datasources.datasource_factory import create_datasource
+from development_analyzer.project_schemas.project_schema_factory import create_project_schema
+datasource = create_datasource(source="{source}", schema=create_project_schema("{project}"))
+datasource.load_dataset("{dataset}")
+DevelopmentAnalyzer(datasource, output_folder="{output_folder}").plot_histogram()
+"""
+
+TIMED_SCRIPT = """
+import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(code: str, repeat: int) -> float:
+    """
+    Returns the median time in seconds of running the code in a fresh interpreter
+    """
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", TIMED_SCRIPT.format(code=code)], check=True,
+                                capture_output=True, text=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start benchmark of the development analyzer")
+    parser.add_argument("--dataset", "-d", type=str, required=True, help="Dataset file path")
+    parser.add_argument("--project", "-p", type=str, default="sample_project", help="Project schema code")
+    parser.add_argument("--source", "-s", type=str, default="airtable", help="Data source")
+    parser.add_argument("--repeat", "-n", type=int, default=5, help="Number of runs of each scenario")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_folder:
+        first_report = FIRST_REPORT.format(source=args.source, project=args.project, dataset=args.dataset,
+                                           output_folder=output_folder)
+        # the first run parses the dataset and stores its cache, so all the scenarios load it from the cache
+        measure(first_report, 1)
+        scenarios = {
+            "import package (lazy)": IMPORT_PACKAGE,
+            "import package (eager)": IMPORT_PACKAGE + EAGER_IMPORTS,
+            "first report (lazy)": first_report,
+            "first report (eager)": EAGER_IMPORTS + first_report,
+        }
+        for name, code in scenarios.items():
+            print(f"{name:<25} {measure(code, args.repeat) * 1000:8.1f} ms")
@@ -0,0 +1,164 @@
+"""
+Benchmark suite of the hot paths of the analyzer, run on synthetic datasets of the given sizes: loading the dataset
+(parsed and from the cache), filtering it, building each report (computation and figure, without saving it),
+generating each report (including the rendering to a file) and the Monte Carlo engine.
+The results are saved to a JSON file, and can be compared with the results of a previous run.
+
+Usage: python benchmarks/run_benchmarks.py --sizes 1000 100000 --compare benchmarks/results/<previous>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+# run from the benchmarks folder: make the package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from matplotlib import pyplot as plt  # noqa: E402
+
+from development_analyzer import DevelopmentAnalyzer  # noqa: E402
+from development_analyzer.datasources.datasource_factory import create_datasource  # noqa: E402
+from development_analyzer.project_schemas.project_schema_factory import create_project_schema  # noqa: E402
+from development_analyzer.reports.report_factory import REPORT_TYPES, create_report  # noqa: E402
+from development_analyzer.simulations.backtesting import backtest  # noqa: E402
+from development_analyzer.simulations.convolution_engine import ConvolutionEngine  # noqa: E402
+from development_analyzer.simulations.monte_carlo_engine import MonteCarloEngine  # noqa: E402
+from generate_dataset import THROUGHPUT_DISTRIBUTIONS, write_dataset  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000]
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+NUM_TASKS = 100
+NUM_DAYS = 30
+NUM_SIMULATIONS = 10000
+# simulations of the parallel Monte Carlo benchmark, large enough to spread over all the cores
+PARALLEL_NUM_SIMULATIONS = 200000
+# simulations of each forecast of the backtest, that makes two forecasts on every day of the history
+BACKTEST_NUM_SIMULATIONS = 2000
+# a slowdown above this ratio is reported as a regression when comparing with a previous run
+REGRESSION_RATIO = 1.2
+
+
+def measure(function: Callable, repeat: int, setup: Optional[Callable] = None) -> dict:
+    """
+    Runs the function the given number of times and returns the statistics of its wall times in seconds.
+    The setup, if given, runs before each run and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}
+
+
+def run_size(size: int, repeat: int, throughput: str, seed: int, folder: str) -> dict[str, dict]:
+    dataset_path = os.path.join(folder, f"synthetic_{size}.csv")
+    write_dataset(dataset_path, size, throughput=throughput, seed=seed)
+    project_schema = create_project_schema("sample_project")
+    datasource = create_datasource(source="airtable", schema=project_schema)
+    filters = {
+        "created_until": datetime.datetime.now(),
+        "closed_since": None,
+        "closed_until": datetime.datetime.now(),
+        "max_cycle_time": None,
+        "has_estimation": False,
+        "valid_types": None,
+    }
+    results = {
+        "load_dataset.parse": measure(lambda: datasource.load_dataset(dataset_path, use_cache=False), repeat),
+        "load_dataset.cached": measure(lambda: datasource.load_dataset(dataset_path),
+                                       repeat, setup=lambda: datasource.load_dataset(dataset_path)),
+        "filter_by": measure(lambda: datasource.filter_by(**filters), repeat),
+    }
+
+    output_folder = os.path.join(folder, f"output_{size}")
+    analyzer = DevelopmentAnalyzer(datasource, output_folder=output_folder)
+    reports = analyzer.default_reports()
+    for report_type in REPORT_TYPES:
+        options = reports[report_type]
+        # compute and render are timed apart, so a regression can be attributed to one of them
+        report = create_report(report_type, datasource, output_folder, options)
+        results[f"report.{report_type}.compute"] = measure(report.compute, repeat)
+        metrics = report.compute()
+        results[f"report.{report_type}.render"] = measure(lambda: report.render(metrics), repeat,
+                                                          setup=lambda: plt.close("all"))
+        results[f"report.{report_type}.generate"] = measure(
+            lambda: create_report(report_type, datasource, output_folder, options).generate_report(), repeat)
+    plt.close("all")
+
+    engine = MonteCarloEngine(datasource.tasks.throughput_per_day(), seed=seed)
+    results["monte_carlo.days_to_finish"] = measure(lambda: engine.days_to_finish(NUM_TASKS, NUM_SIMULATIONS),
+                                                    repeat)
+    results["monte_carlo.tasks_done"] = measure(lambda: engine.tasks_done(NUM_DAYS, NUM_SIMULATIONS), repeat)
+    # the same simulations in one process and in all the cores, to measure the scaling
+    for workers in sorted({1, os.cpu_count() or 1}):
+        parallel_engine = MonteCarloEngine(datasource.tasks.throughput_per_day(), seed=seed, max_workers=workers)
+        results[f"monte_carlo.days_to_finish.{workers}_workers"] = measure(
+            lambda: parallel_engine.days_to_finish(NUM_TASKS, PARALLEL_NUM_SIMULATIONS), repeat)
+
+    convolution_engine = ConvolutionEngine(datasource.tasks.throughput_per_day())
+    results["convolution.days_to_finish"] = measure(lambda: convolution_engine.days_to_finish_cdf(NUM_TASKS), repeat)
+    results["convolution.tasks_done"] = measure(lambda: convolution_engine.tasks_done_cdf(NUM_DAYS), repeat)
+    results["backtest.daily_origins"] = measure(
+        lambda: backtest(datasource, NUM_DAYS, NUM_TASKS, BACKTEST_NUM_SIMULATIONS, step_days=1, seed=seed), repeat)
+    return results
+
+
+def compare(results: dict, previous: dict):
+    print(f"\nComparison with the run of {previous['timestamp']} (median times):")
+    for size, benchmarks in results["results"].items():
+        previous_benchmarks = previous["results"].get(size, {})
+        for name, result in benchmarks.items():
+            if name not in previous_benchmarks:
+                continue
+            ratio = result["median_s"] / previous_benchmarks[name]["median_s"]
+            flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+            print(f"{size:>10} {name:<55} {ratio:6.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite of the development analyzer")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Number of tasks of each dataset")
+    parser.add_argument("--repeat", "-n", type=int, default=3, help="Number of runs of each benchmark")
+    parser.add_argument("--throughput", "-t", type=str, default="poisson", choices=THROUGHPUT_DISTRIBUTIONS,
+                        help="Distribution of the number of tasks closed per day of the synthetic datasets")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic datasets")
+    parser.add_argument("--output", "-o", type=str, default=None, help="JSON file to save the results to")
+    parser.add_argument("--compare", "-c", type=str, default=None, help="JSON file of a previous run to compare with")
+    args = parser.parse_args()
+
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    results = {
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "throughput": args.throughput,
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            print(f"Running benchmarks with {size} tasks...")
+            results["results"][str(size)] = run_size(size, args.repeat, args.throughput, args.seed, folder)
+            for name, result in results["results"][str(size)].items():
+                print(f"{size:>10} {name:<55} {result['median_s'] * 1000:10.1f} ms")
+
+    output = args.output or os.path.join(RESULTS_FOLDER, f"benchmark-{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            compare(results, json.load(previous_file))
@@ -1,5 +1,38 @@
-from .datasources import *
-from .development_analyzer import *
-from .reports import *
-from .project_schemas import *
-from .task import *
\ No newline at end of file
+import importlib
+import os
+
+# reports are only saved to files, so the non-interactive backend is used unless another one is configured.
+# it must be set before pyplot is imported, and it also avoids probing the GUI backends on import
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+# the public classes are imported lazily (PEP 562), so importing the package does not pull in pandas, matplotlib
+# or scipy until they are used: each report only imports its own dependencies when it is created by name
+_LAZY_ATTRIBUTES = {
+    "DevelopmentAnalyzer": "development_analyzer.development_analyzer",
+    "ReportResult": "development_analyzer.development_analyzer",
+    "compute_metrics": "development_analyzer.development_analyzer",
+    "backtest": "development_analyzer.simulations.backtesting",
+    "ConvolutionEngine": "development_analyzer.simulations.convolution_engine",
+    "DatasetStatistics": "development_analyzer.dataset_statistics",
+    "MonteCarloEngine": "development_analyzer.simulations.monte_carlo_engine",
+    "Task": "development_analyzer.task",
+    "TaskTable": "development_analyzer.task_table",
+}
+_SUBPACKAGES = ["datasources", "project_schemas", "reports", "simulations"]
+
+__all__ = list(_LAZY_ATTRIBUTES) + _SUBPACKAGES
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    elif name in _SUBPACKAGES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
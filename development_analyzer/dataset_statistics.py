@@ -0,0 +1,129 @@
+import datetime
+from functools import cached_property
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+from development_analyzer.task_table import TaskTable
+
+# percentiles calculated and shown by all the reports, in the order of their legends
+PERCENTILES = [95, 85, 50]
+# color of the line of each percentile in the charts
+PERCENTILE_COLORS = {95: "green", 85: "orange", 50: "red"}
+DEFAULT_PERCENTILE_COLOR = "gray"
+# rounding error allowed when comparing cumulative probabilities with the percentile levels
+PROBABILITY_TOLERANCE = 1e-9
+# values of the tasks that percentiles can be calculated of
+METRICS: dict[str, Callable[[TaskTable], np.ndarray]] = {
+    "cycle_time": lambda tasks: tasks.cycle_time,
+    "estimation": lambda tasks: tasks.estimation[tasks.has_estimation],
+    "throughput": lambda tasks: tasks.throughput_per_day(),
+}
+
+
+def percentiles(values: np.ndarray, levels: Sequence[int] = PERCENTILES, inverted: bool = False,
+                axis: Optional[int] = None) -> dict[int, Any]:
+    """
+    Percentiles of the values at each level, calculated in a single pass (the values are partitioned once for all the
+    levels). Inverted percentiles count from the top: the value reached by the given share of the values.
+    With an axis, the percentiles of each level are an array with the percentiles along that axis.
+    """
+    if len(values) == 0:
+        return {level: np.nan for level in levels}
+    values = np.percentile(values, [100 - level if inverted else level for level in levels], axis=axis)
+    return dict(zip(levels, values.tolist() if axis is None else list(values)))
+
+
+def distribution_percentiles(cdf: np.ndarray, levels: Sequence[int] = PERCENTILES, inverted: bool = False,
+                             axis: int = 0) -> dict[int, Any]:
+    """
+    Percentiles at each level of a discrete distribution, given by the cumulative probabilities of the values 0, 1,
+    2... along the axis: the first value whose cumulative probability reaches the level. Inverted percentiles count
+    from the top, like in `percentiles`.
+    With more than one dimension, the percentiles of each level are an array along the other axis.
+    """
+    values = {}
+    for level in levels:
+        probability = (100 - level if inverted else level) / 100
+        value = np.argmax(cdf >= probability - PROBABILITY_TOLERANCE, axis=axis)
+        values[level] = int(value) if np.ndim(value) == 0 else value
+    return values
+
+
+def percentile_color(level: int) -> str:
+    return PERCENTILE_COLORS.get(level, DEFAULT_PERCENTILE_COLOR)
+
+
+class DatasetStatistics:
+    """
+    Aggregates of a set of tasks, each one calculated once on first access.
+    A new instance must be created whenever the tasks change.
+    Attributes
+    ----------
+        tasks: TaskTable
+            Tasks the statistics are calculated from
+        percentile_levels: list[int]
+            Percentiles calculated of each metric
+    """
+    tasks: TaskTable
+    percentile_levels: list[int]
+
+    def __init__(self, tasks: TaskTable, percentile_levels: Sequence[int] = PERCENTILES):
+        self.tasks = tasks
+        self.percentile_levels = list(percentile_levels)
+        self._percentiles: dict[str, dict[int, float]] = {}
+
+    @cached_property
+    def count(self) -> int:
+        return len(self.tasks)
+
+    @cached_property
+    def content_hash(self) -> str:
+        return self.tasks.content_hash()
+
+    @cached_property
+    def first_creation_date(self) -> Optional[datetime.datetime]:
+        return _min_date(self.tasks.created_at)
+
+    @cached_property
+    def first_closing_date(self) -> Optional[datetime.datetime]:
+        return _min_date(self.tasks.closed_at)
+
+    @cached_property
+    def last_closing_date(self) -> Optional[datetime.datetime]:
+        return _max_date(self.tasks.closed_at)
+
+    @cached_property
+    def max_cycle_time(self) -> Optional[int]:
+        cycle_times = self.tasks.cycle_time[self.tasks.has_cycle_time]
+        if len(cycle_times) == 0:
+            return None
+        return int(cycle_times.max())
+
+    @property
+    def cycle_time_percentiles(self) -> dict[int, float]:
+        return self.percentiles("cycle_time")
+
+    def percentiles(self, metric: str) -> dict[int, float]:
+        """
+        Percentiles of a metric of the tasks (see METRICS), calculated once for all the levels on first access
+        """
+        if metric not in self._percentiles:
+            if metric not in METRICS:
+                raise ValueError(f"Invalid metric: {metric}")
+            self._percentiles[metric] = percentiles(METRICS[metric](self.tasks), self.percentile_levels)
+        return self._percentiles[metric]
+
+
+def _min_date(dates: np.ndarray) -> Optional[datetime.datetime]:
+    dates = dates[~np.isnat(dates)]
+    if len(dates) == 0:
+        return None
+    return dates.min().astype(datetime.datetime)
+
+
+def _max_date(dates: np.ndarray) -> Optional[datetime.datetime]:
+    dates = dates[~np.isnat(dates)]
+    if len(dates) == 0:
+        return None
+    return dates.max().astype(datetime.datetime)
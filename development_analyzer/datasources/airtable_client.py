@@ -0,0 +1,179 @@
+import queue
+import random
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+AIRTABLE_API_URL = "https://api.airtable.com"
+PAGE_SIZE = 100
+# airtable allows 5 requests per second per base
+DEFAULT_REQUESTS_PER_SECOND = 5
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_SECONDS = 1.0
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# characters of the record ids after the "rec" prefix, used to partition the table
+RECORD_ID_CHARACTERS = string.ascii_letters + string.digits
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces the requests to a maximum number of requests per second
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second
+        self.next_request_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            request_time = max(now, self.next_request_time)
+            self.next_request_time = request_time + self.interval
+        time.sleep(max(0.0, request_time - now))
+
+
+class AirtableClient:
+    """
+    Minimal client of the Airtable REST API to list the records of a table.
+    Requests are rate limited and retried with exponential backoff, and the table can be fetched concurrently by
+    splitting it in partitions of record ids that are paginated in parallel.
+    Attributes
+    ----------
+        api_key: str
+            Personal access token of the Airtable API
+        base: str
+            Id of the base of the table
+        table: str
+            Name or id of the table
+        endpoint_url: str
+            URL of the Airtable API, can be overridden to use a local fake of the API
+        max_retries: int
+            Maximum number of retries of a failed request
+        backoff_seconds: float
+            Wait before the first retry, doubled on each retry unless the API sends a Retry-After header
+    """
+    api_key: str
+    base: str
+    table: str
+    endpoint_url: str
+    max_retries: int
+    backoff_seconds: float
+
+    def __init__(self, api_key: str, base: str, table: str, endpoint_url: str = AIRTABLE_API_URL,
+                 requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS):
+        self.api_key = api_key
+        self.base = base
+        self.table = table
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = RateLimiter(requests_per_second)
+        # requests sessions are not thread-safe, so each thread uses its own one
+        self._local = threading.local()
+
+    def iterate_pages(self, formula: Optional[str] = None) -> Iterator[list[dict]]:
+        """
+        Yields the records of the table page by page, optionally filtered by an Airtable formula
+        """
+        params = {"pageSize": PAGE_SIZE}
+        if formula:
+            params["filterByFormula"] = formula
+        while True:
+            page = self._get_page(params)
+            yield page["records"]
+            if "offset" not in page:
+                return
+            params["offset"] = page["offset"]
+
+    def iterate_pages_concurrently(self, formula: Optional[str] = None, concurrency: int = 4,
+                                   max_buffered_pages: int = 16) -> Iterator[list[dict]]:
+        """
+        Yields the records of the table page by page as they arrive, fetching concurrently one partition of the
+        record ids per worker. At most max_buffered_pages pages are kept in memory waiting to be consumed.
+        The order of the pages is not deterministic.
+        """
+        if concurrency <= 1:
+            yield from self.iterate_pages(formula)
+            return
+
+        pages = queue.Queue(maxsize=max_buffered_pages)
+        finished = object()
+        cancelled = threading.Event()
+
+        def fetch_partition(partition_formula: str):
+            try:
+                for page in self.iterate_pages(partition_formula):
+                    if cancelled.is_set():
+                        return
+                    pages.put(page)
+            finally:
+                pages.put(finished)
+
+        partition_formulas = [self._partition_formula(partition, concurrency, formula)
+                              for partition in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(fetch_partition, partition_formula)
+                       for partition_formula in partition_formulas]
+            try:
+                remaining_partitions = concurrency
+                while remaining_partitions > 0:
+                    page = pages.get()
+                    if page is finished:
+                        remaining_partitions -= 1
+                    else:
+                        yield page
+            finally:
+                cancelled.set()
+                # unblock the workers waiting for space in the queue
+                while any(not future.done() for future in futures):
+                    try:
+                        pages.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+            for future in futures:
+                future.result()
+
+    @staticmethod
+    def _partition_formula(partition: int, num_partitions: int, formula: Optional[str]) -> str:
+        # record ids are random, so their first character after "rec" splits the table evenly
+        characters = RECORD_ID_CHARACTERS[partition::num_partitions]
+        partition_formula = f"FIND(MID(RECORD_ID(), 4, 1), '{characters}') > 0"
+        return f"AND({formula}, {partition_formula})" if formula else partition_formula
+
+    def _get_page(self, params: dict) -> dict:
+        # imported here, so loading local datasets does not import requests
+        import requests
+        for retry in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self._session().get(f"{self.endpoint_url}/v0/{self.base}/{self.table}", params=params,
+                                               headers={"Authorization": f"Bearer {self.api_key}"})
+            except requests.ConnectionError:
+                if retry == self.max_retries:
+                    raise
+                time.sleep(self._backoff(retry, None))
+                continue
+            if response.status_code in RETRY_STATUS_CODES and retry < self.max_retries:
+                time.sleep(self._backoff(retry, response.headers.get("Retry-After")))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def _backoff(self, retry: int, retry_after: Optional[str]) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        # exponential backoff with jitter, so the workers do not retry at the same time
+        return self.backoff_seconds * 2 ** retry * (1 + random.random())
+
+    def _session(self) -> "requests.Session":
+        if not hasattr(self._local, "session"):
+            import requests
+            self._local.session = requests.Session()
+        return self._local.session
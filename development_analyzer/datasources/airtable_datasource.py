@@ -1,24 +1,177 @@
-import pandas as pd
+import json
+from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+
+from development_analyzer.datasources.airtable_client import AirtableClient, AIRTABLE_API_URL, \
+    DEFAULT_REQUESTS_PER_SECOND
 from development_analyzer.datasources.datasource import DataSource
 
 import os
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+RECORD_ID_COLUMN = "_record_id"
+DEFAULT_MODIFIED_FIELD = "lastModifiedStatus"
+DEFAULT_CONCURRENCY = 4
+# number of rows written to the csv at once
+WRITE_CHUNK_SIZE = 10000
+
 
 class AirtableDataSource(DataSource):
+    """
+    Datasource that imports the tasks from an Airtable table.
+    Pages of records are fetched concurrently and streamed to disk as they arrive, so the memory used does not depend
+    on the size of the table.
+    Attributes
+    ----------
+        api_key: str
+            Airtable API key, read from the AIRTABLE_API_KEY environment variable if not given
+        base: str
+            Airtable base id, read from the AIRTABLE_BASE environment variable if not given
+        table: str
+            Airtable table name or id, read from the AIRTABLE_TABLE environment variable if not given
+        modified_field: str
+            Last modified time field of the table, used as watermark to sync only the records modified since the
+            previous sync
+        endpoint_url: str
+            URL of the Airtable API
+        concurrency: int
+            Number of partitions of the table fetched in parallel
+        requests_per_second: float
+            Maximum number of requests per second sent to the API
+    """
+    api_key: Optional[str]
+    base: Optional[str]
+    table: Optional[str]
+    modified_field: str
+    endpoint_url: str
+    concurrency: int
+    requests_per_second: float
+
+    def __init__(self, project_schema, api_key: Optional[str] = None, base: Optional[str] = None,
+                 table: Optional[str] = None, modified_field: str = DEFAULT_MODIFIED_FIELD,
+                 endpoint_url: str = AIRTABLE_API_URL, concurrency: int = DEFAULT_CONCURRENCY,
+                 requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND, **kwargs):
+        super().__init__(project_schema, **kwargs)
+        self.api_key = api_key
+        self.base = base
+        self.table = table
+        self.modified_field = modified_field
+        self.endpoint_url = endpoint_url
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
 
     def import_dataset(self, file_path: str):
         super().import_dataset(file_path)
-        # TODO import using airtable API
-        from pyairtable import Api
+        pages = self._client().iterate_pages_concurrently(concurrency=self.concurrency)
+        watermark = self._write_dataset(file_path, pages, watermark=None, merge=False)
+        self._store_watermark(file_path, watermark)
+
+    def sync_dataset(self, file_path: str):
+        """
+        Incrementally syncs the dataset stored in file_path: only the records modified since the previous sync are
+        fetched, and they are upserted by record id into the stored dataset.
+        Falls back to a full import if there is no previous sync. Records deleted in Airtable are not removed.
+        """
+        watermark = self._load_watermark(file_path)
+        if watermark is None or not os.path.exists(file_path):
+            return self.import_dataset(file_path)
+        self.file_path = file_path
+
+        # records modified at the watermark are fetched again, the upsert makes it harmless
+        formula = f"NOT(IS_BEFORE({{{self.modified_field}}}, '{watermark}'))"
+        pages = self._client().iterate_pages_concurrently(formula=formula, concurrency=self.concurrency)
+        watermark = self._write_dataset(file_path, pages, watermark=watermark, merge=True)
+        self._store_watermark(file_path, watermark)
+
+    def _client(self) -> AirtableClient:
+        return AirtableClient(self.api_key or os.environ['AIRTABLE_API_KEY'],
+                              self.base or os.environ['AIRTABLE_BASE'],
+                              self.table or os.environ['AIRTABLE_TABLE'], endpoint_url=self.endpoint_url,
+                              requests_per_second=self.requests_per_second)
+
+    def _write_dataset(self, file_path: str, pages: Iterable[list[dict]], watermark: Optional[str],
+                       merge: bool) -> Optional[str]:
+        """
+        Streams the pages of records into the csv dataset, upserting them into the existing dataset if merge is set.
+        The records are spooled to a json lines file as they arrive, because the csv columns are only known once all
+        the records have been fetched (airtable omits the empty fields of each record).
+        Returns the new watermark.
+        """
+        import pandas as pd
+        records_path = f"{file_path}.records.jsonl"
+        temporary_path = f"{file_path}.tmp"
+        try:
+            columns = {RECORD_ID_COLUMN: None}
+            record_ids = set()
+            with open(records_path, "w") as records_file:
+                for page in pages:
+                    for record in page:
+                        # parse records, keeping the record id to be able to upsert them:
+                        row = {RECORD_ID_COLUMN: record['id'], **record['fields']}
+                        columns.update(dict.fromkeys(row))
+                        if merge:
+                            record_ids.add(record['id'])
+                        records_file.write(json.dumps(row) + "\n")
+                        # airtable returns the times in the same ISO 8601 format, so they can be compared as strings
+                        modified = record['fields'].get(self.modified_field)
+                        if modified is not None and (watermark is None or modified > watermark):
+                            watermark = modified
+
+            if merge and not record_ids:
+                return watermark
+
+            chunks = self._read_records(records_path)
+            if merge:
+                existing_columns = pd.read_csv(file_path, nrows=0).columns
+                columns = {**dict.fromkeys(existing_columns), **columns}
+                existing_chunks = (chunk[~chunk[RECORD_ID_COLUMN].isin(record_ids)]
+                                   for chunk in pd.read_csv(file_path, dtype=str, chunksize=WRITE_CHUNK_SIZE))
+                chunks = _chain(existing_chunks, chunks)
+
+            header = True
+            with open(temporary_path, "w", newline="") as csv_file:
+                for chunk in chunks:
+                    chunk.reindex(columns=list(columns)).to_csv(csv_file, index=False, header=header)
+                    header = False
+            if header:  # no records
+                pd.DataFrame(columns=list(columns)).to_csv(temporary_path, index=False)
+            os.replace(temporary_path, file_path)
+            return watermark
+        finally:
+            # the spooled records and the partial csv are removed even if the sync fails, so the previous dataset and
+            # watermark are left as they were
+            for path in [records_path, temporary_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def _read_records(records_path: str) -> Iterator["pd.DataFrame"]:
+        import pandas as pd
+        with open(records_path) as records_file:
+            rows = []
+            for line in records_file:
+                rows.append(json.loads(line))
+                if len(rows) == WRITE_CHUNK_SIZE:
+                    yield pd.DataFrame(rows)
+                    rows = []
+            if rows:
+                yield pd.DataFrame(rows)
+
+    @staticmethod
+    def _load_watermark(file_path: str) -> Optional[str]:
+        sync_path = f"{file_path}.sync.json"
+        if not os.path.exists(sync_path):
+            return None
+        with open(sync_path) as sync_file:
+            return json.load(sync_file)["watermark"]
 
-        api = Api(os.environ['AIRTABLE_API_KEY'])
-        base = os.environ['AIRTABLE_BASE']
-        table = os.environ['AIRTABLE_TABLE']
+    @staticmethod
+    def _store_watermark(file_path: str, watermark: Optional[str]):
+        with open(f"{file_path}.sync.json", "w") as sync_file:
+            json.dump({"watermark": watermark}, sync_file)
 
-        table = api.table(base, table)
-        records = table.all()
-        # parse records:
-        records = [record['fields'] for record in records]
 
-        df = pd.DataFrame(records)
-        df.to_csv(file_path, index=False)
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
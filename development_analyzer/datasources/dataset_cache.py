@@ -0,0 +1,130 @@
+import dataclasses
+import hashlib
+import json
+import os
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+
+from development_analyzer.project_schemas.project_schema import ProjectSchema
+from development_analyzer.task_table import TaskTable, COLUMN_NAMES
+
+# increase when the parsing or the layout of the cache changes, to invalidate the existing caches
+CACHE_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+METADATA_FILE = "metadata.json"
+DESCRIPTIONS_FILE = "description.txt"
+
+
+class DatasetCache:
+    """
+    Binary sidecar of a parsed dataset, stored next to the dataset file in a "<file>.cache" folder.
+    Each column is stored as a .npy array that is memory-mapped when loaded, and the descriptions as a single utf-8
+    text with the offsets of each one.
+    The cache is keyed by the size, modification time and content hash of the dataset file and the schema definition,
+    so any change of them invalidates it.
+    Attributes
+    ----------
+        file_path: str
+            Path of the dataset file
+        file_format: str
+            Format of the dataset file
+        project_schema: ProjectSchema
+            Schema used to parse the dataset
+        cache_path: str
+            Path of the cache folder
+    """
+    file_path: str
+    file_format: str
+    project_schema: ProjectSchema
+    cache_path: str
+
+    def __init__(self, file_path: str, file_format: str, project_schema: ProjectSchema):
+        self.file_path = file_path
+        self.file_format = file_format
+        self.project_schema = project_schema
+        self.cache_path = f"{file_path}.cache"
+
+    def load(self) -> Optional[TaskTable]:
+        """
+        Returns the cached tasks, or None if there is no cache or it does not match the dataset file and schema
+        """
+        metadata_path = os.path.join(self.cache_path, METADATA_FILE)
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path) as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata["key"] != self.key:
+            return None
+
+        columns = {name: np.load(self._column_path(name), mmap_mode="r") for name in COLUMN_NAMES
+                   if name != "description"}
+        columns["description"] = self._load_descriptions()
+        return TaskTable(columns,
+                         type_categories=np.asarray(metadata["type_categories"], dtype=object),
+                         status_categories=np.asarray(metadata["status_categories"], dtype=object))
+
+    def store(self, tasks: TaskTable):
+        os.makedirs(self.cache_path, exist_ok=True)
+        # the metadata is written last, so an interrupted write leaves an invalid cache
+        metadata_path = os.path.join(self.cache_path, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            os.remove(metadata_path)
+
+        for name in COLUMN_NAMES:
+            if name != "description":
+                np.save(self._column_path(name), np.ascontiguousarray(tasks.column(name)))
+        self._store_descriptions(tasks.description)
+
+        metadata = {
+            "key": self.key,
+            "type_categories": tasks.type_categories.tolist(),
+            "status_categories": tasks.status_categories.tolist(),
+        }
+        with open(metadata_path, "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+
+    @cached_property
+    def key(self) -> str:
+        stat = os.stat(self.file_path)
+        content_hash = hashlib.sha256()
+        with open(self.file_path, "rb") as dataset_file:
+            for block in iter(lambda: dataset_file.read(HASH_BLOCK_SIZE), b""):
+                content_hash.update(block)
+        schema_definition = {
+            "schema": type(self.project_schema).__name__,
+            "fields": {key: dataclasses.asdict(field) for key, field in self.project_schema.fields.items()},
+        }
+        key = {
+            "version": CACHE_VERSION,
+            "format": self.file_format,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "content": content_hash.hexdigest(),
+            "schema": schema_definition,
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.cache_path, f"{name}.npy")
+
+    def _store_descriptions(self, descriptions: np.ndarray):
+        present = np.array([description is not None for description in descriptions], dtype=bool)
+        texts = [str(description) if description is not None else "" for description in descriptions]
+        # offsets in characters of each description in the joined text
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=offsets[1:])
+        with open(os.path.join(self.cache_path, DESCRIPTIONS_FILE), "w", encoding="utf-8", newline="") as text_file:
+            text_file.write("".join(texts))
+        np.save(self._column_path("description_offsets"), offsets)
+        np.save(self._column_path("description_present"), present)
+
+    def _load_descriptions(self) -> np.ndarray:
+        with open(os.path.join(self.cache_path, DESCRIPTIONS_FILE), encoding="utf-8", newline="") as text_file:
+            text = text_file.read()
+        offsets = np.load(self._column_path("description_offsets")).tolist()
+        present = np.load(self._column_path("description_present"))
+        descriptions = np.array([text[start:end] for start, end in zip(offsets[:-1], offsets[1:])], dtype=object)
+        descriptions[~present] = None
+        return descriptions
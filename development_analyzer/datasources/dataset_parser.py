@@ -0,0 +1,83 @@
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from development_analyzer.project_schemas.field import Field
+from development_analyzer.project_schemas.project_schema import ProjectSchema
+from development_analyzer.task_table import TaskTable, DATETIME_DTYPE
+
+TASK_FIELDS = ["type", "status", "created_at", "closed_at", "started_at", "estimation", "description"]
+NUMERIC_FIELDS = ["estimation"]
+# date formats in ISO 8601 layout: a date, optionally followed by a time (with fractions of a second) and a UTC
+# designator or offset
+ISO_DATE_FORMAT = re.compile(r"%Y-%m-%d([T ]%H(:%M(:%S(\.%f)?)?)?)?(Z|%z)?")
+
+
+class DatasetParser:
+    """
+    Parser of datasets compiled once from a project schema, that converts whole columns at once into a TaskTable.
+    Attributes
+    ----------
+        fields: dict[str, Optional[Field]]
+            Field of the schema for each of the task fields, None if the schema does not define it
+    """
+    fields: dict[str, Optional[Field]]
+
+    def __init__(self, project_schema: ProjectSchema):
+        schema_fields = project_schema.fields
+        self.fields = {key: schema_fields.get(key) for key in TASK_FIELDS}
+
+    @property
+    def column_names(self) -> set[str]:
+        """
+        Names of the columns of the dataset used by the schema
+        """
+        return {field.column_name for field in self.fields.values() if field is not None}
+
+    def parse(self, dataset: pd.DataFrame) -> TaskTable:
+        return TaskTable.from_columns(**{key: self._parse_column(dataset, key) for key in TASK_FIELDS})
+
+    def _parse_column(self, dataset: pd.DataFrame, key: str) -> np.ndarray:
+        field = self.fields[key]
+        column = dataset[field.column_name] if field is not None and field.column_name in dataset else None
+        if field is not None and field.format is not None:
+            return _parse_dates(column, field.format, len(dataset))
+        if key in NUMERIC_FIELDS:
+            return _parse_integers(column, len(dataset))
+        return _parse_values(column, len(dataset))
+
+
+def _parse_dates(column: Optional[pd.Series], date_format: str, length: int) -> np.ndarray:
+    if column is None:
+        return np.full(length, np.datetime64("NaT"), dtype=DATETIME_DTYPE)
+    if pd.api.types.is_datetime64_any_dtype(column):  # already converted by the reader (e.g. json)
+        if column.dt.tz is not None:
+            column = column.dt.tz_convert(None)
+        return column.to_numpy(dtype=DATETIME_DTYPE)
+
+    if ISO_DATE_FORMAT.fullmatch(date_format):
+        # formats in ISO 8601 layout (e.g. "%Y-%m-%dT%H:%M:%S.%fZ") are parsed by the ISO parser of pandas, several
+        # times faster than matching the format (a literal "Z" in it makes pandas fall back to strptime). The dates
+        # are converted to UTC and stored without time zone, like the ones with a "Z"
+        dates = pd.to_datetime(column, format="ISO8601", utc=True).dt.tz_convert(None)
+    else:
+        dates = pd.to_datetime(column, format=date_format)
+    return dates.to_numpy(dtype=DATETIME_DTYPE)
+
+
+def _parse_integers(column: Optional[pd.Series], length: int) -> np.ndarray:
+    if column is None:
+        return np.full(length, np.nan)
+    # truncated like int(), keeping NaN for the missing values
+    return np.trunc(pd.to_numeric(column).to_numpy(dtype=np.float64))
+
+
+def _parse_values(column: Optional[pd.Series], length: int) -> np.ndarray:
+    values = np.full(length, None, dtype=object)
+    if column is None:
+        return values
+    present = column.notna().to_numpy()
+    values[present] = column.to_numpy(dtype=object)[present]
+    return values
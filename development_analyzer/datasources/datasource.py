@@ -1,15 +1,27 @@
+import copy
 import datetime
 from abc import ABC, abstractmethod
-from typing import Optional
+from functools import cached_property
+from typing import Optional, TYPE_CHECKING
 
+from development_analyzer.dataset_statistics import DatasetStatistics, PERCENTILES
+from development_analyzer.datasources.dataset_cache import DatasetCache
+from development_analyzer.instrumentation import span
 from development_analyzer.project_schemas.project_schema import ProjectSchema
-from development_analyzer.task import Task
-import pandas as pd
+from development_analyzer.task_table import TaskTable, MISSING_CODE
 import numpy as np
 
+if TYPE_CHECKING:
+    from development_analyzer.datasources.dataset_parser import DatasetParser
+
+FILTER_NAMES = ["created_until", "closed_since", "closed_until", "max_cycle_time", "has_estimation", "valid_types"]
+
 
 class DataSource(ABC):
-    tasks: list[Task] = []
+    dataset: TaskTable = TaskTable.empty()
+    _tasks: TaskTable = TaskTable.empty()
+    _statistics: Optional[DatasetStatistics] = None
+    _percentile_levels: list[int] = PERCENTILES
     filters: dict = {}
     file_path: str
     project_schema: ProjectSchema
@@ -17,44 +29,80 @@ class DataSource(ABC):
     def __init__(self, project_schema: ProjectSchema, **kwargs):
         self.project_schema = project_schema
 
-    def load_dataset(self, file_path: str, file_format: str = "csv"):
+    @cached_property
+    def dataset_parser(self) -> "DatasetParser":
+        # pandas is only imported when a dataset has to be parsed, not when it is loaded from the cache
+        from development_analyzer.datasources.dataset_parser import DatasetParser
+        return DatasetParser(self.project_schema)
+
+    def load_dataset(self, file_path: str, file_format: str = "csv", use_cache: bool = True,
+                     chunk_size: Optional[int] = None, filters: Optional[dict] = None):
+        """
+        Loads and parses the dataset file. When use_cache is set, the parsed dataset is stored in a binary sidecar
+        next to the file, that is loaded instead of parsing the file again until the file or the schema change.
+        When chunk_size is set, the csv file is streamed and parsed in chunks of that number of rows.
+        When filters are given (same criteria as filter_by), only the tasks that pass them are kept in the dataset,
+        and they become the active filters. Combined with chunk_size, each chunk is filtered as soon as it is parsed,
+        so the memory used depends on the number of tasks kept instead of the size of the file.
+        Filtered datasets are not cached.
+        """
+        with span("load_dataset", file_path=file_path, chunk_size=chunk_size) as load_span:
+            load_span.attributes["cached"] = self._load_dataset(file_path, file_format, use_cache, chunk_size, filters)
+            load_span.attributes["tasks"] = len(self.dataset)
+
+    def _load_dataset(self, file_path: str, file_format: str, use_cache: bool, chunk_size: Optional[int],
+                      filters: Optional[dict]) -> bool:
+        """
+        Returns whether the dataset was loaded from the cache
+        """
         self.file_path = file_path
+        if filters is not None:
+            filters = {name: filters.get(name) for name in FILTER_NAMES}
+        cache = DatasetCache(file_path, file_format, self.project_schema) if use_cache and filters is None else None
+        cached_tasks = cache.load() if cache else None
+        if cached_tasks is not None:
+            self.dataset = cached_tasks
+            self.tasks = self.dataset
+            return True
+
+        if chunk_size:
+            self.dataset = self._read_chunks(file_path, file_format, chunk_size, filters)
+        else:
+            self.dataset = self._filter_tasks(self.dataset_parser.parse(self._read_file(file_path, file_format)),
+                                              filters)
+        self.tasks = self.dataset
+        if filters is not None:
+            self.filters = filters
+        if cache:
+            cache.store(self.dataset)
+        return False
+
+    def _read_file(self, file_path: str, file_format: str, chunk_size: Optional[int] = None):
+        import pandas as pd
         if file_format == "csv":
-            dataset = pd.read_csv(file_path)
+            # only the columns of the schema are read
+            column_names = self.dataset_parser.column_names
+            return pd.read_csv(file_path, usecols=lambda column: column in column_names, chunksize=chunk_size)
+        elif file_format == "json" and chunk_size is None:
+            return pd.read_json(file_path)
         elif file_format == "json":
-            dataset = pd.read_json(file_path)
+            raise ValueError("Chunked loading is only supported for csv datasets")
         else:
             raise ValueError("Invalid format")
-        dataset = dataset.replace({np.nan: None})
-
-        def _get_or_default(row, key, default_value=None, converter=None):
-            if key not in self.project_schema.fields:
-                return default_value
-
-            column_name = self.project_schema.fields[key].column_name
-            if column_name in row and row[column_name] is not None:
-                if self.project_schema.fields[key].format is not None:
-                    return datetime.datetime.strptime(row[column_name], self.project_schema.fields[key].format)
-                else:
-                    return converter(row[column_name]) if converter else row[column_name]
-            else:
-                return default_value
-
-        self.tasks = []
-        for index, row in dataset.iterrows():
-            task = Task(
-                type=_get_or_default(row, "type", default_value=None),
-                status=_get_or_default(row, "status", default_value=None),
-                created_at=_get_or_default(row, "created_at", default_value=None),
-                closed_at=_get_or_default(row, "closed_at", default_value=None),
-                started_at=_get_or_default(row, "started_at", default_value=None),
-                estimation=_get_or_default(row, "estimation", default_value=None, converter=int),
-                description=_get_or_default(row, "description", default_value=None)
-            )
-            self.tasks.append(task)
+
+    def _read_chunks(self, file_path: str, file_format: str, chunk_size: int, filters: Optional[dict]) -> TaskTable:
+        tables = [self._filter_tasks(self.dataset_parser.parse(chunk), filters)
+                  for chunk in self._read_file(file_path, file_format, chunk_size)]
+        return TaskTable.concatenate(tables)
+
+    def _filter_tasks(self, tasks: TaskTable, filters: Optional[dict]) -> TaskTable:
+        if filters is None:
+            return tasks
+        # compacted so the rest of the parsed columns can be freed
+        return tasks.select(self._filter_mask(tasks, **filters)).compact()
 
     def export_dataset(self, file_path: str, file_format: str = "csv"):
-        dataset = pd.DataFrame([task.__dict__ for task in self.tasks])
+        dataset = self.tasks.to_dataframe()
         if file_format == "csv":
             dataset.to_csv(file_path, index=False)
         elif file_format == "json":
@@ -66,12 +114,23 @@ class DataSource(ABC):
     def import_dataset(self, file_path: str):
         self.file_path = file_path
 
+    def sync_dataset(self, file_path: str):
+        """
+        Updates the dataset stored in file_path with the changes of the external source.
+        Datasources that do not support incremental syncs import the whole dataset again.
+        """
+        self.import_dataset(file_path)
+
     def filter_by(self, created_until: Optional[datetime.datetime],
                   closed_since: Optional[datetime.datetime],
                   closed_until: Optional[datetime.datetime],
                   max_cycle_time: Optional[int],
                   has_estimation: Optional[bool],
                   valid_types: Optional[list[str]]) -> None:
+        """
+        Filters the loaded dataset, replacing any previous filter. The loaded dataset is kept intact,
+        so it can be filtered again with different criteria without reloading it.
+        """
         self.filters = {
             "created_until": created_until,
             "closed_since": closed_since,
@@ -80,59 +139,110 @@ class DataSource(ABC):
             "has_estimation": has_estimation,
             "valid_types": valid_types
         }
-        new_tasks = []
-        for task in self.tasks:
-            # logical checks: closed_at > started_at > created_at
-            if task.created_at is None or task.closed_at is None:
-                continue
-            if task.closed_at < task.created_at:
-                continue
-            if task.started_at and task.started_at < task.created_at:
-                continue
-            if task.started_at and task.closed_at < task.started_at:
-                continue
-            # condition checks:
-            # created_at < created_until
-            if created_until is not None and task.created_at > created_until:
-                continue
-            # closed_since < closed_at < closed_until
-            if closed_since is not None and task.closed_at < closed_since:
-                continue
-            if closed_until is not None and task.closed_at > closed_until:
-                continue
-            if max_cycle_time is not None and task.cycle_time > max_cycle_time:
-                continue
-            if has_estimation and not task.estimation:
-                continue
-            if valid_types is not None and task.type not in valid_types:
-                continue
-            new_tasks.append(task)
-        self.tasks = new_tasks
+        with span("filter_by", dataset_tasks=len(self.dataset)) as filter_span:
+            self.tasks = self.dataset.select(self._filter_mask(self.dataset, **self.filters))
+            filter_span.attributes["tasks"] = len(self.tasks)
+
+    def filtered(self, created_until: Optional[datetime.datetime] = None,
+                 closed_since: Optional[datetime.datetime] = None,
+                 closed_until: Optional[datetime.datetime] = None,
+                 max_cycle_time: Optional[int] = None,
+                 has_estimation: Optional[bool] = None,
+                 valid_types: Optional[list[str]] = None) -> "DataSource":
+        """
+        Returns a copy of the datasource whose tasks are a view of the current tasks with the given filters applied
+        on top of the current ones. Neither this datasource nor its dataset are modified.
+        """
+        filters = {
+            "created_until": created_until,
+            "closed_since": closed_since,
+            "closed_until": closed_until,
+            "max_cycle_time": max_cycle_time,
+            "has_estimation": has_estimation,
+            "valid_types": valid_types
+        }
+        view = copy.copy(self)
+        view.filters = {key: filters[key] if filters[key] is not None else self.filters.get(key) for key in filters}
+        view.tasks = self.tasks.select(self._filter_mask(self.tasks, **filters))
+        return view
+
+    @staticmethod
+    def _filter_mask(tasks: TaskTable,
+                     created_until: Optional[datetime.datetime],
+                     closed_since: Optional[datetime.datetime],
+                     closed_until: Optional[datetime.datetime],
+                     max_cycle_time: Optional[int],
+                     has_estimation: Optional[bool],
+                     valid_types: Optional[list[str]]) -> np.ndarray:
+        # logical checks: closed_at > started_at > created_at
+        mask = ~np.isnat(tasks.created_at) & ~np.isnat(tasks.closed_at)
+        mask &= ~(tasks.closed_at < tasks.created_at)
+        mask &= ~(tasks.started_at < tasks.created_at)
+        mask &= ~(tasks.closed_at < tasks.started_at)
+        # condition checks:
+        # created_at < created_until
+        if created_until is not None:
+            mask &= ~(tasks.created_at > np.datetime64(created_until))
+        # closed_since < closed_at < closed_until
+        if closed_since is not None:
+            mask &= ~(tasks.closed_at < np.datetime64(closed_since))
+        if closed_until is not None:
+            mask &= ~(tasks.closed_at > np.datetime64(closed_until))
+        if max_cycle_time is not None:
+            mask &= ~(tasks.cycle_time > max_cycle_time)
+        if has_estimation:
+            mask &= tasks.has_estimation
+        if valid_types is not None:
+            valid_codes = [code for code, category in enumerate(tasks.type_categories) if category in valid_types]
+            if None in valid_types:
+                valid_codes.append(MISSING_CODE)
+            mask &= np.isin(tasks.type_codes, valid_codes)
+        return mask
 
     @property
     def have_tasks_started_at(self):
         return "started_at" in self.project_schema.fields
 
+    @property
+    def tasks(self) -> TaskTable:
+        return self._tasks
+
+    @tasks.setter
+    def tasks(self, tasks: TaskTable):
+        # any change of the tasks (load, filter) invalidates the cached statistics
+        self._tasks = tasks
+        self._statistics = None
+
+    @property
+    def percentile_levels(self) -> list[int]:
+        """
+        Percentiles calculated and shown by all the reports
+        """
+        return self._percentile_levels
+
+    @percentile_levels.setter
+    def percentile_levels(self, percentile_levels: list[int]):
+        self._percentile_levels = list(percentile_levels)
+        self._statistics = None
+
+    @property
+    def statistics(self) -> DatasetStatistics:
+        if self._statistics is None:
+            self._statistics = DatasetStatistics(self.tasks, self.percentile_levels)
+        return self._statistics
+
     @property
     def first_creation_date(self):
-        if len(self.tasks) == 0:
-            return None
-        return min(task.created_at for task in [task for task in self.tasks if task.created_at is not None])
+        return self.statistics.first_creation_date
 
     @property
     def first_closing_date(self):
-        if len(self.tasks) == 0:
-            return None
-        return min(task.closed_at for task in [task for task in self.tasks if task.closed_at is not None])
+        return self.statistics.first_closing_date
 
     @property
     def last_closing_date(self):
-        if len(self.tasks) == 0:
-            return None
-        return max(task.closed_at for task in [task for task in self.tasks if task.closed_at is not None])
+        return self.statistics.last_closing_date
 
     @property
     def max_cycle_time(self):
-        if len(self.tasks) == 0:
-            return None
-        return max(task.cycle_time for task in self.tasks if task.cycle_time is not None)
+        return self.statistics.max_cycle_time
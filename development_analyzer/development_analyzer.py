@@ -1,21 +1,32 @@
+import copy
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 
 from development_analyzer.datasources.datasource import DataSource
+from development_analyzer.instrumentation import progress, span
 import os
 
-from development_analyzer.reports.cumulative_flow_diagram import CumulativeFlowDiagramReport
-from development_analyzer.reports.cycle_time_estimation_relationship import CycleTimeEstimationRelationshipReport
-from development_analyzer.reports.cycle_time_histogram import CycleTimeHistogramReport
-from development_analyzer.reports.cycle_time_scatter import CycleTimeScatterReport
-from development_analyzer.reports.monte_carlo_how_many_done import MonteCarloHowManyDoneReport
-from development_analyzer.reports.monte_carlo_when_will_be_finished import MonteCarloWhenWillBeFinishedReport
+from development_analyzer.reports.report import metrics_to_dict
+from development_analyzer.reports.report_factory import create_report
+from development_analyzer.reports.report_store import ReportStore
+
+
+@dataclass
+class ReportResult:
+    report_type: str
+    path: Optional[str]
+    error: Optional[str] = None
 
 
 class DevelopmentAnalyzer:
     def __init__(self, data_source: DataSource, show_plots: bool = False,
-                 output_folder: str = None):
+                 output_folder: str = None, report_store: Optional[ReportStore] = None):
         self.data_source = data_source
         self.show_plots = show_plots
+        # reports already generated from the same data, options and code are reused from the store
+        self.report_store = report_store
         if output_folder:
             self.output_folder = output_folder
         else:
@@ -27,50 +38,154 @@ class DevelopmentAnalyzer:
             os.makedirs(self.output_folder)
 
     def plot_scatter(self, show_labels: bool = False, highlight_last_days: int = None):
-        try:
-            report = CycleTimeScatterReport(self.data_source, self.output_folder, {
-                "show_labels": show_labels,
-                "highlight_last_days": highlight_last_days})
-            return report.generate_report()
-        except Exception as e:
-            print(f"Error plotting scatter: {e}")
+        return self._generate("scatter", {"show_labels": show_labels, "highlight_last_days": highlight_last_days})
 
     def plot_histogram(self):
-        try:
-            report = CycleTimeHistogramReport(self.data_source, self.output_folder, None)
-            return report.generate_report()
-        except Exception as e:
-            print(f"Error plotting scatter: {e}")
+        return self._generate("histogram", None)
 
     def plot_cycle_time_estimation_relationship(self):
-        try:
-            report = CycleTimeEstimationRelationshipReport(self.data_source, self.output_folder, None)
-            return report.generate_report()
-        except Exception as e:
-            print(f"Error plotting scatter: {e}")
+        return self._generate("cycle_time_estimation_relationship", None)
 
-    def plot_monte_carlo_when_will_be_finished(self, num_tasks: int = 100, num_simulations: int = 10000):
-        try:
-            report = MonteCarloWhenWillBeFinishedReport(self.data_source, self.output_folder,
-                                                        options={"num_tasks": num_tasks,
-                                                                 "num_simulations": num_simulations})
-            return report.generate_report()
-        except Exception as e:
-            print(f"Error plotting scatter: {e}")
+    def plot_monte_carlo_when_will_be_finished(self, num_tasks: int = 100, num_simulations: int = 10000,
+                                               tolerance: Optional[float] = None, seed: Optional[int] = None,
+                                               max_workers: int = 1, curve: bool = False,
+                                               engine: str = "monte_carlo"):
+        # with a tolerance (in days), num_simulations is the maximum number of simulations.
+        # with curve, the finish dates of every number of tasks up to num_tasks are plotted.
+        # the "convolution" engine computes the exact distribution instead of running simulations
+        return self._generate("monte_carlo_when_will_be_finished",
+                              {"num_tasks": num_tasks, "num_simulations": num_simulations, "tolerance": tolerance,
+                               "seed": seed, "max_workers": max_workers, "curve": curve, "engine": engine})
 
-    def plot_monte_carlo_how_many_done(self, next_x_days: int = 30, num_simulations: int = 10000):
-        try:
-            finish_date = datetime.datetime.now().date() + datetime.timedelta(days=next_x_days)
-            report = MonteCarloHowManyDoneReport(self.data_source, self.output_folder,
-                                                 options={"finish_date": finish_date,
-                                                          "num_simulations": num_simulations})
-            return report.generate_report()
-        except Exception as e:
-            print(f"Error plotting scatter: {e}")
+    def plot_monte_carlo_how_many_done(self, next_x_days: int = 30, num_simulations: int = 10000,
+                                       tolerance: Optional[float] = None, seed: Optional[int] = None,
+                                       max_workers: int = 1, curve: bool = False, engine: str = "monte_carlo"):
+        # with a tolerance (in tasks), num_simulations is the maximum number of simulations.
+        # with curve, the tasks done by every day up to next_x_days are plotted.
+        # the "convolution" engine computes the exact distribution instead of running simulations
+        finish_date = datetime.datetime.now().date() + datetime.timedelta(days=next_x_days)
+        return self._generate("monte_carlo_how_many_done",
+                              {"finish_date": finish_date, "num_simulations": num_simulations, "tolerance": tolerance,
+                               "seed": seed, "max_workers": max_workers, "curve": curve, "engine": engine})
 
     def plot_cumulative_flow_diagram(self):
+        return self._generate("cumulative_flow_diagram", None)
+
+    def generate_all(self, reports: Optional[dict[str, Optional[dict]]] = None,
+                     max_workers: Optional[int] = None) -> dict[str, ReportResult]:
+        """
+        Generates the given reports (report type -> options, all of them with their default options if not given)
+        in parallel in a pool of processes, that share a read-only snapshot of the filtered tasks.
+        Returns the result of each report, with its path or the error that made it fail.
+        """
+        if reports is None:
+            reports = self.default_reports()
+        max_workers = max_workers or min(len(reports), os.cpu_count() or 1)
+        snapshot = self._snapshot()
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                           initargs=(snapshot, self.output_folder, self.report_store))
+        except (OSError, NotImplementedError) as e:
+            # environments without shared memory (e.g. AWS Lambda) do not support process pools
+            progress(f"Process pool not available, generating reports sequentially: {e}")
+            return {report_type: _generate_report(snapshot, self.output_folder, self.report_store, report_type,
+                                                  options)
+                    for report_type, options in reports.items()}
+
+        with executor:
+            futures = {report_type: executor.submit(_generate_worker_report, report_type, options)
+                       for report_type, options in reports.items()}
+            results = {}
+            for report_type, future in futures.items():
+                try:
+                    results[report_type] = future.result()
+                except Exception as e:  # the worker process died
+                    results[report_type] = ReportResult(report_type, None, f"{e.__class__.__name__}: {e}")
+        return results
+
+    @staticmethod
+    def default_reports(tolerance: Optional[float] = None, seed: Optional[int] = None,
+                        max_workers: int = 1, curve: bool = False,
+                        engine: str = "monte_carlo") -> dict[str, Optional[dict]]:
+        """
+        Options of all the reports. With a tolerance, the Monte Carlo simulations stop once their percentiles are
+        stable within that number of days or tasks. With a seed, they are reproducible. With curve, they forecast
+        every number of tasks and every day up to the default ones. The "convolution" engine computes the exact
+        distributions of the forecasts instead of simulating them
+        """
+        return {
+            "scatter": {"show_labels": False, "highlight_last_days": None},
+            "histogram": None,
+            "cycle_time_estimation_relationship": None,
+            "monte_carlo_when_will_be_finished": {"num_tasks": 100, "num_simulations": 10000, "tolerance": tolerance,
+                                                  "seed": seed, "max_workers": max_workers, "curve": curve,
+                                                  "engine": engine},
+            "monte_carlo_how_many_done": {
+                "finish_date": datetime.datetime.now().date() + datetime.timedelta(days=30),
+                "num_simulations": 10000, "tolerance": tolerance, "seed": seed, "max_workers": max_workers,
+                "curve": curve, "engine": engine},
+            "cumulative_flow_diagram": None,
+        }
+
+    def _generate(self, report_type: str, options: Optional[dict]) -> Optional[str]:
+        result = _generate_report(self.data_source, self.output_folder, self.report_store, report_type, options)
+        if result.error:
+            progress(f"Error plotting {report_type}: {result.error}")
+        return result.path
+
+    def _snapshot(self) -> DataSource:
+        # copy of the datasource that only holds the filtered tasks, so it is cheap to send to the workers
+        snapshot = copy.copy(self.data_source)
+        snapshot.dataset = self.data_source.tasks.compact()
+        snapshot.tasks = snapshot.dataset
+        return snapshot
+
+
+def compute_metrics(data_source: DataSource,
+                    reports: Optional[dict[str, Optional[dict]]] = None) -> dict[str, dict]:
+    """
+    Computes the metrics of the given reports (report type -> options, all of them with their default options if not
+    given) without rendering them, so matplotlib is not imported.
+    Returns the metrics of each report as a dictionary that can be serialized to JSON, or the error that made it fail.
+    """
+    if reports is None:
+        reports = DevelopmentAnalyzer.default_reports()
+    metrics = {}
+    for report_type, options in reports.items():
+        with span(f"report.{report_type}.compute", tasks=len(data_source.tasks)) as report_span:
+            try:
+                report = create_report(report_type, data_source, None, options)
+                metrics[report_type] = metrics_to_dict(report.compute())
+            except Exception as e:
+                report_span.attributes["error"] = f"{e.__class__.__name__}: {e}"
+                metrics[report_type] = {"error": f"{e.__class__.__name__}: {e}"}
+    return metrics
+
+
+_worker_data_source: Optional[DataSource] = None
+_worker_output_folder: Optional[str] = None
+_worker_report_store: Optional[ReportStore] = None
+
+
+def _init_worker(data_source: DataSource, output_folder: str, report_store: Optional[ReportStore]):
+    global _worker_data_source, _worker_output_folder, _worker_report_store
+    import matplotlib
+    matplotlib.use("Agg")
+    _worker_data_source = data_source
+    _worker_output_folder = output_folder
+    _worker_report_store = report_store
+
+
+def _generate_worker_report(report_type: str, options: Optional[dict]) -> ReportResult:
+    return _generate_report(_worker_data_source, _worker_output_folder, _worker_report_store, report_type, options)
+
+
+def _generate_report(data_source: DataSource, output_folder: str, report_store: Optional[ReportStore],
+                     report_type: str, options: Optional[dict]) -> ReportResult:
+    with span(f"report.{report_type}", tasks=len(data_source.tasks)) as report_span:
         try:
-            report = CumulativeFlowDiagramReport(self.data_source, self.output_folder, None)
-            return report.generate_report()
+            report = create_report(report_type, data_source, output_folder, options, report_store)
+            return ReportResult(report_type, report.generate_report())
         except Exception as e:
-            print(f"Error plotting scatter: {e}")
+            report_span.attributes["error"] = f"{e.__class__.__name__}: {e}"
+            return ReportResult(report_type, None, f"{e.__class__.__name__}: {e}")
@@ -0,0 +1,175 @@
+import json
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+@dataclass
+class Span:
+    """
+    Measure of a stage of the analysis
+    Attributes
+    ----------
+        name: str
+            Name of the stage (e.g. load_dataset, report.histogram)
+        parent: Optional[str]
+            Name of the span that contains this one in the same thread, if any
+        start_time: float
+            Unix time at which the stage started
+        wall_time: float
+            Elapsed time of the stage in seconds
+        cpu_time: float
+            CPU time of the process during the stage in seconds (includes other threads of the process)
+        process_peak_rss: Optional[int]
+            Peak resident memory of the process in bytes since it started, at the end of the stage, None if it can not
+            be measured
+        peak_rss_increase: Optional[int]
+            Bytes the stage raised the peak resident memory of the process by: 0 when the stage stayed below an
+            earlier peak, so it is the memory the stage needs on top of the earlier ones
+        attributes: dict
+            Additional information about the stage (e.g. the number of tasks)
+    """
+    name: str
+    parent: Optional[str]
+    start_time: float
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    process_peak_rss: Optional[int] = None
+    peak_rss_increase: Optional[int] = None
+    attributes: dict = field(default_factory=dict)
+
+
+class Sink(ABC):
+    """
+    Destination of the finished spans
+    """
+
+    @abstractmethod
+    def emit(self, span: Span):
+        pass
+
+
+class JsonLinesSink(Sink):
+    """
+    Appends each span as a line of JSON to a file. The file is opened on each span, so the spans of worker processes
+    can be appended to the same file.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.lock = threading.Lock()
+
+    def emit(self, span: Span):
+        line = json.dumps(asdict(span), default=str)
+        with self.lock, open(self.file_path, "a") as spans_file:
+            spans_file.write(line + "\n")
+
+
+class StdoutSink(Sink):
+    """
+    Prints a one line summary of each span
+    """
+
+    def emit(self, span: Span):
+        if span.process_peak_rss is None:
+            peak_rss = "n/a"
+        else:
+            peak_rss = (f"+{span.peak_rss_increase / 1024 ** 2:.0f}MB "
+                        f"(process {span.process_peak_rss / 1024 ** 2:.0f}MB)")
+        print(f"[{span.name}] wall {span.wall_time:.3f}s, cpu {span.cpu_time:.3f}s, peak rss {peak_rss}")
+
+
+def print_progress(message: str, fraction: Optional[float]):
+    # only the messages of the start of each stage are printed, not the intermediate progress
+    if fraction is None:
+        print(message)
+
+
+ProgressCallback = Callable[[str, Optional[float]], None]
+
+_sinks: list[Sink] = []
+_progress_callbacks: list[ProgressCallback] = [print_progress]
+_local = threading.local()
+
+
+def add_sink(sink: Sink):
+    _sinks.append(sink)
+
+
+def remove_sink(sink: Sink):
+    _sinks.remove(sink)
+
+
+def add_progress_callback(callback: ProgressCallback):
+    """
+    Adds a callback that receives the progress messages, with the fraction of the stage done (None when the message
+    is not a progress update). Messages are printed by default, remove print_progress to silence them.
+    """
+    _progress_callbacks.append(callback)
+
+
+def remove_progress_callback(callback: ProgressCallback):
+    _progress_callbacks.remove(callback)
+
+
+def progress(message: str, fraction: Optional[float] = None):
+    for callback in _progress_callbacks:
+        callback(message, fraction)
+
+
+def simulation_progress(done: int, total: int):
+    """
+    Progress callback of the Monte Carlo engines
+    """
+    progress(f"{done} of {total} simulations done", done / total)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Measures the wall time, CPU time and increase of the peak memory of the code run in the context, and emits the span
+    to the sinks.
+    Attributes can be added to the yielded span while it runs.
+    """
+    stack = _span_stack()
+    current = Span(name=name, parent=stack[-1].name if stack else None, start_time=time.time(),
+                   attributes=attributes)
+    stack.append(current)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    peak_rss_start = _peak_rss()
+    try:
+        yield current
+    finally:
+        current.wall_time = time.perf_counter() - wall_start
+        current.cpu_time = time.process_time() - cpu_start
+        current.process_peak_rss = _peak_rss()
+        if current.process_peak_rss is not None:
+            current.peak_rss_increase = current.process_peak_rss - peak_rss_start
+        stack.pop()
+        for sink in _sinks:
+            sink.emit(current)
+
+
+def _span_stack() -> list[Span]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
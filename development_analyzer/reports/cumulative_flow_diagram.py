@@ -1,9 +1,18 @@
+import datetime
+from dataclasses import dataclass
 from typing import Optional
 from development_analyzer.datasources.datasource import DataSource
 from development_analyzer.reports.report import Report
-import datetime
-from matplotlib import pyplot as plt
-from matplotlib.dates import DateFormatter, WeekdayLocator, MonthLocator, YearLocator
+import numpy as np
+
+
+@dataclass
+class CumulativeFlowDiagramMetrics:
+    days: np.ndarray
+    # accumulated number of tasks of each band, stacked (in progress includes done, to do includes both)
+    bands: dict[str, np.ndarray]
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
 
 
 class CumulativeFlowDiagramReport(Report):
@@ -17,15 +26,22 @@ class CumulativeFlowDiagramReport(Report):
     def __init__(self, data_source: DataSource, report_path: Optional[str], options: Optional[dict]):
         super().__init__(data_source, report_path, options)
 
-    def generate_report(self):
+    def compute(self) -> CumulativeFlowDiagramMetrics:
         frequencies = self._calculate_frequencies()
-        bands = self._calculate_bands(frequencies)
+        return CumulativeFlowDiagramMetrics(
+            days=self._calculate_days(),
+            bands=self._calculate_bands(frequencies),
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+        )
+
+    def render(self, metrics: CumulativeFlowDiagramMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        from matplotlib.dates import DateFormatter, WeekdayLocator, MonthLocator, YearLocator
+        data = metrics.bands
         plt.figure(figsize=(12, 10))
 
-        dates = [band[0] for band in bands["To Do"]]
-        data = {
-            key: [band[1] for band in bands[key]] for key, item in bands.items()
-        }
+        dates = metrics.days
 
         plt.fill_between(dates, data["To Do"], data["In Progress"], label="To Do", color="#e60049", alpha=1)
         plt.fill_between(dates, data["In Progress"], data["Done"], label="In Progress", color="#ef9b20", alpha=1)
@@ -35,8 +51,7 @@ class CumulativeFlowDiagramReport(Report):
         plt.xticks(rotation=90)
         # display only one date per week in x axis:
         from matplotlib.dates import MO
-        date_range_in_days = (
-                self.data_source.last_closing_date - self.data_source.first_closing_date).days
+        date_range_in_days = (metrics.last_closing_date - metrics.first_closing_date).days
         # if difference between first and last date is less than 7 days, then show all dates:
         if date_range_in_days < 7:
             plt.gca().xaxis.set_major_locator(WeekdayLocator())
@@ -54,8 +69,8 @@ class CumulativeFlowDiagramReport(Report):
         plt.legend()
 
         # get min and max date of done issues:
-        data_max_date = self.data_source.last_closing_date
-        data_min_date = self.data_source.first_closing_date
+        data_max_date = metrics.last_closing_date
+        data_min_date = metrics.first_closing_date
         plt.xlim(left=data_min_date.date(), right=data_max_date.date())
         plt.ylim(bottom=0)
         # add grid:
@@ -63,54 +78,40 @@ class CumulativeFlowDiagramReport(Report):
 
         plt.title(
             f"Cumulative Flow Diagram\n"
-            f"(history from {self.data_source.first_closing_date.strftime('%Y-%m-%d')} to "
-            f"{self.data_source.last_closing_date.strftime('%Y-%m-%d')})")
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
 
         return self.save_report(plt)
 
-    def _calculate_frequencies(self) -> dict[str, list[tuple[str, int]]]:
-        frequencies = {
-            "Done": [],
-            "In Progress": [],
-            "To Do": [],
+    def _calculate_days(self) -> np.ndarray:
+        first_creation_date = np.datetime64(self.data_source.first_creation_date)
+        return first_creation_date + np.arange(self._num_days) * np.timedelta64(1, "D")
+
+    def _calculate_frequencies(self) -> dict[str, np.ndarray]:
+        # number of tasks created/started/closed each day, accumulated over the history
+        tasks = self.data_source.tasks
+        return {
+            "Done": np.cumsum(self._count_per_day(tasks.closed_at)),
+            "In Progress": np.cumsum(self._count_per_day(tasks.started_at)),
+            "To Do": np.cumsum(self._count_per_day(tasks.created_at)),
         }
-        for i, day in enumerate(
-                range((self.data_source.last_closing_date - self.data_source.first_creation_date).days + 1)):
-            day = self.data_source.first_creation_date + datetime.timedelta(days=day)
-            todo = frequencies["To Do"][i - 1][1] if i > 0 else 0
-            in_progress = frequencies["In Progress"][i - 1][1] if i > 0 else 0
-            done = frequencies["Done"][i - 1][1] if i > 0 else 0
-            for task in self.data_source.tasks:
-                if task.created_at is not None and task.created_at.date() == day.date():
-                    todo += 1
-                if task.started_at is not None and task.started_at.date() == day.date():
-                    in_progress += 1
-                if task.closed_at is not None and task.closed_at.date() == day.date():
-                    done += 1
-            frequencies["To Do"].append((day, todo))
-            frequencies["In Progress"].append((day, in_progress))
-            frequencies["Done"].append((day, done))
-
-        return frequencies
-
-    def _calculate_bands(self, frequencies: dict[str, list[tuple[str, int]]]) -> dict[str, list[tuple[str, int]]]:
-        bands = {
-            "Done": [],
-            "In Progress": [],
-            "To Do": [],
+
+    def _calculate_bands(self, frequencies: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        return {
+            "Done": frequencies["Done"],
+            "In Progress": frequencies["In Progress"] + frequencies["Done"],
+            "To Do": frequencies["To Do"] + frequencies["In Progress"] + frequencies["Done"],
         }
 
-        for i, day in enumerate(
-                range((self.data_source.last_closing_date - self.data_source.first_creation_date).days + 1)):
-            day = self.data_source.first_creation_date + datetime.timedelta(days=day)
-            todo = frequencies["To Do"][i][1]
-            in_progress = frequencies["In Progress"][i][1]
-            done = frequencies["Done"][i][1]
-            bands["To Do"].append((day, todo + in_progress + done))
-            bands["In Progress"].append((day, in_progress + done))
-            bands["Done"].append((day, done))
-
-        return bands
+    def _count_per_day(self, dates: np.ndarray) -> np.ndarray:
+        first_day = np.datetime64(self.data_source.first_creation_date, "D")
+        days = (dates[~np.isnat(dates)].astype("datetime64[D]") - first_day).astype(np.int64)
+        days = days[(days >= 0) & (days < self._num_days)]
+        return np.bincount(days, minlength=self._num_days)
+
+    @property
+    def _num_days(self) -> int:
+        return (self.data_source.last_closing_date - self.data_source.first_creation_date).days + 1
 
     @property
     def report_name(self):
@@ -1,38 +1,69 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
 from scipy.stats import stats
 
 from development_analyzer.reports.report import Report
-from matplotlib import pyplot as plt
 import numpy as np
 
 
+@dataclass
+class CycleTimeEstimationRelationshipMetrics:
+    estimations: np.ndarray
+    cycle_times: np.ndarray
+    # linear regression of the cycle time on the estimation, None with less than two tasks
+    slope: Optional[float]
+    intercept: Optional[float]
+    r_squared: Optional[float]
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+
+
 class CycleTimeEstimationRelationshipReport(Report):
     """
     This report will generate a relationship between the cycle time and the estimation of the tasks
     """
 
-    def generate_report(self):
-        plt.figure(figsize=(14, 8))
-        estimations = [task.estimation for task in self.data_source.tasks if task.estimation and
-                       task.cycle_time]
-        cycle_times_days = [task.cycle_time for task in self.data_source.tasks if task.estimation and
-                            task.cycle_time]
-        plt.scatter(estimations, cycle_times_days, color='#72cafc')
+    def compute(self) -> CycleTimeEstimationRelationshipMetrics:
+        tasks = self.data_source.tasks
+        has_estimation_and_cycle_time = tasks.has_estimation & tasks.has_cycle_time & (tasks.cycle_time != 0)
+        estimations = tasks.estimation[has_estimation_and_cycle_time]
+        cycle_times_days = tasks.cycle_time[has_estimation_and_cycle_time]
 
-        # add a linear regression
-        regression_label = ""
+        slope = intercept = r_squared = None
         if len(estimations) > 1:
             slope, intercept, r_value, p_value, std_err = stats.linregress(
                 estimations, cycle_times_days)
-            line = slope * np.array(estimations) + intercept
-            plt.plot(estimations, line, 'r-', label='Regression line')
-            regression_label = "(R^2= {:.2f})".format(r_value ** 2)
+            r_squared = r_value ** 2
+        return CycleTimeEstimationRelationshipMetrics(
+            estimations=estimations,
+            cycle_times=cycle_times_days,
+            slope=slope,
+            intercept=intercept,
+            r_squared=r_squared,
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+        )
+
+    def render(self, metrics: CycleTimeEstimationRelationshipMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        plt.figure(figsize=(14, 8))
+        plt.scatter(metrics.estimations, metrics.cycle_times, color='#72cafc')
+
+        # add a linear regression
+        regression_label = ""
+        if metrics.r_squared is not None:
+            line = metrics.slope * metrics.estimations + metrics.intercept
+            plt.plot(metrics.estimations, line, 'r-', label='Regression line')
+            regression_label = "(R^2= {:.2f})".format(metrics.r_squared)
 
         plt.xticks([1, 2, 3, 5, 8, 13, 20])
         plt.xlabel('Estimation')
         plt.ylabel('Cycle Time in Days')
         plt.title(f"Cycle Time vs Estimation {regression_label}"
-                  f"\n(history from {self.data_source.first_closing_date.strftime('%Y-%m-%d')} to "
-                  f"{self.data_source.last_closing_date.strftime('%Y-%m-%d')})")
+                  f"\n(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+                  f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
 
         return self.save_report(plt)
 
@@ -1,11 +1,25 @@
+import datetime
+from dataclasses import dataclass
 from typing import Optional
 
+from development_analyzer.dataset_statistics import percentile_color
 from development_analyzer.datasources.datasource import DataSource
 from development_analyzer.reports.report import Report
-from matplotlib import pyplot as plt
 import numpy as np
 
 
+@dataclass
+class CycleTimeHistogramMetrics:
+    num_tasks: int
+    cycle_time_percentiles: dict[int, float]
+    max_cycle_time: Optional[int]
+    bin_edges: np.ndarray
+    bin_counts: np.ndarray
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+    estimated_only: bool
+
+
 class CycleTimeHistogramReport(Report):
     """
     This report will generate a histogram of the cycle times for the tasks
@@ -14,53 +28,58 @@ class CycleTimeHistogramReport(Report):
     def __init__(self, data_source: DataSource, report_path: Optional[str], options: Optional[dict]):
         super().__init__(data_source, report_path, options)
 
-    def generate_report(self):
-        plt.figure(figsize=(10, 5))
+    def compute(self) -> CycleTimeHistogramMetrics:
+        cycle_times_days = self.data_source.tasks.cycle_time
+        num_bins = int((cycle_times_days.max() - cycle_times_days.min()) / 2)
+        bin_counts, bin_edges = np.histogram(cycle_times_days, bins=num_bins)
+        return CycleTimeHistogramMetrics(
+            num_tasks=len(self.data_source.tasks),
+            cycle_time_percentiles=self.data_source.statistics.cycle_time_percentiles,
+            max_cycle_time=self.data_source.max_cycle_time,
+            bin_edges=bin_edges,
+            bin_counts=bin_counts,
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+            estimated_only=bool(self.data_source.filters["has_estimation"]),
+        )
 
-        cycle_times_days = [task.cycle_time for task in self.data_source.tasks]
+    def render(self, metrics: CycleTimeHistogramMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        plt.figure(figsize=(10, 5))
 
-        num_bins = int((max(cycle_times_days) - min(cycle_times_days)) / 2)
-        values, bins, bars = plt.hist(cycle_times_days, bins=num_bins, rwidth=0.9,
-                                      label=f"Histogram of Task cycle times", color="#72cafc")
+        # the computed bins are drawn as they are, with the gap between bars of a histogram of relative width 0.9
+        num_bins = len(metrics.bin_counts)
+        bin_widths = np.diff(metrics.bin_edges)
+        bars = plt.bar(metrics.bin_edges[:-1] + 0.05 * bin_widths, metrics.bin_counts, width=0.9 * bin_widths,
+                       align="edge", label="Histogram of Task cycle times", color="#72cafc")
         if num_bins < 50:
             plt.bar_label(bars, fontsize=10)
 
-        percentile = 95
-        confidence_percentile = np.percentile(cycle_times_days, percentile)
-        plt.axvline(x=confidence_percentile, color='green', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
-        percentile = 85
-        confidence_percentile = np.percentile(cycle_times_days, percentile)
-        plt.axvline(x=confidence_percentile, color='orange', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
-        percentile = 50
-        confidence_percentile = np.percentile(cycle_times_days, percentile)
-        plt.axvline(x=confidence_percentile, color='red', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
+        for percentile, confidence_percentile in metrics.cycle_time_percentiles.items():
+            plt.axvline(x=confidence_percentile, color=percentile_color(percentile), linestyle='dashed', linewidth=2,
+                        label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
 
-        plt.xlim(left=0, right=self.data_source.max_cycle_time)
+        plt.xlim(left=0, right=metrics.max_cycle_time)
         plt.xlabel('Cycle Time in Days')
 
         # calculate the tick gap so that for 10 bins its 1, for 50 bins its 5, for 100 bins its 10, and for more than 100 its 20
-        tick_gap = 1 if self.data_source.max_cycle_time < 30 \
-            else 5 if self.data_source.max_cycle_time < 100 \
-            else 10 if self.data_source.max_cycle_time < 200 \
+        tick_gap = 1 if metrics.max_cycle_time < 30 \
+            else 5 if metrics.max_cycle_time < 100 \
+            else 10 if metrics.max_cycle_time < 200 \
             else 50
-        plt.xticks(np.arange(1, self.data_source.max_cycle_time, tick_gap))
+        plt.xticks(np.arange(1, metrics.max_cycle_time, tick_gap))
         plt.ylabel('Number of Tasks')
-        plt.legend()
+        # the bars are listed before the percentile lines
+        plt.legend(handles=[bars, *plt.gca().get_lines()])
 
+        estimated_only_label = "(Estimated Stories/Tasks)" if metrics.estimated_only else ""
         plt.title(
-            f"Cycle Time Distribution for {len(self.data_source.tasks)} completed tasks {self.estimated_only_label} "
-            f"\n(history from {self.data_source.first_closing_date.strftime('%Y-%m-%d')} to "
-            f"{self.data_source.last_closing_date.strftime('%Y-%m-%d')})")
+            f"Cycle Time Distribution for {metrics.num_tasks} completed tasks {estimated_only_label} "
+            f"\n(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
 
         return self.save_report(plt)
 
     @property
     def report_name(self):
         return "cycle_times_distribution_plot.png"
-
-    @property
-    def estimated_only_label(self) -> str:
-        return "(Estimated Stories/Tasks)" if self.data_source.filters["has_estimation"] else ""
@@ -1,12 +1,36 @@
+import csv
+from dataclasses import dataclass, field
 from typing import Optional
 
+from development_analyzer.dataset_statistics import percentile_color
 from development_analyzer.datasources.datasource import DataSource
+from development_analyzer.instrumentation import span
 from development_analyzer.reports.report import Report
 import datetime
-from matplotlib import pyplot as plt
-from matplotlib.dates import DateFormatter, WeekdayLocator, MonthLocator, YearLocator
 import numpy as np
 
+DEFAULT_TABLE_MAX_ROWS = 50
+# number of tasks written to the appendix at once
+APPENDIX_CHUNK_SIZE = 10000
+
+
+@dataclass
+class CycleTimeScatterMetrics:
+    # completed tasks, most recent first (written to the appendix instead of the JSON of the metrics)
+    done_dates: np.ndarray = field(metadata={"json": False})
+    cycle_times: np.ndarray = field(metadata={"json": False})
+    # labels of the points, only when they are shown
+    labels: Optional[list[str]] = field(metadata={"json": False})
+    cycle_time_percentiles: dict[int, float]
+    # rows of the table next to the plot
+    table_done_dates: np.ndarray
+    table_cycle_times: np.ndarray
+    table_labels: list[str]
+    table_highlighted: np.ndarray
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+    estimated_only: bool
+
 
 class CycleTimeScatterReport(Report):
     """
@@ -17,8 +41,14 @@ class CycleTimeScatterReport(Report):
         Whether to show the issue keys on the points of the scatter plot
     highlight_last_days : int
         Number of days to highlight in the scatter plot
+    table_max_rows : Optional[int]
+        Maximum number of tasks shown in the table next to the plot (the most recent ones), None to show all of them.
+        The full list of tasks is written to a csv appendix next to the plot.
     """
+    # the highlighted tasks depend on the current date
+    depends_on_date = True
     show_labels: bool
+    table_max_rows: Optional[int]
 
     def __init__(self, data_source: DataSource, report_path: Optional[str], options: Optional[dict]):
         super().__init__(data_source, report_path, options)
@@ -26,75 +56,87 @@ class CycleTimeScatterReport(Report):
             self.options = {"show_labels": False, "highlight_last_days": None}
         self.show_labels = self.options["show_labels"]
         self.highlight_last_days = self.options["highlight_last_days"]
+        self.table_max_rows = self.options.get("table_max_rows", DEFAULT_TABLE_MAX_ROWS)
+
+    def compute(self) -> CycleTimeScatterMetrics:
+        tasks = self.data_source.tasks
+        cycle_times_days = tasks.cycle_time
+
+        # get datetimes for done issues:
+        date_done_issues = tasks.closed_at
 
-    def generate_report(self):
+        order = self._done_order()
+
+        # the table only shows the most recent tasks, so its render time does not depend on the size of the dataset
+        table_order = order if self.table_max_rows is None else order[:self.table_max_rows]
+        dates = date_done_issues[table_order]
+
+        today = datetime.datetime.now()
+        highlighted = np.zeros(len(dates), dtype=bool)
+        if self.highlight_last_days:
+            highlight_since = np.datetime64(today - datetime.timedelta(days=self.highlight_last_days))
+            highlighted = dates > highlight_since
+
+        return CycleTimeScatterMetrics(
+            done_dates=date_done_issues[order],
+            cycle_times=cycle_times_days[order],
+            labels=tasks.select(order).full_labels() if self.show_labels else None,
+            cycle_time_percentiles=self.data_source.statistics.cycle_time_percentiles,
+            table_done_dates=dates,
+            table_cycle_times=cycle_times_days[table_order],
+            table_labels=tasks.select(table_order).full_labels(),
+            table_highlighted=highlighted,
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+            estimated_only=bool(self.data_source.filters["has_estimation"]),
+        )
+
+    def render(self, metrics: CycleTimeScatterMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        from matplotlib.dates import DateFormatter, WeekdayLocator, MonthLocator, YearLocator
         # fig = plt.figure(figsize=(10, 10))
         fig, (ax_scatter, ax_table) = plt.subplots(
             1, 2, gridspec_kw={'width_ratios': [2, 4]}, figsize=(30, 10))
-        cycle_times_days = [task.cycle_time for task in self.data_source.tasks]
 
-        # get datetimes for done issues:
-        date_done_issues = [task.closed_at for task in self.data_source.tasks]
-
-        ax_scatter.scatter(date_done_issues, cycle_times_days,
+        ax_scatter.scatter(metrics.done_dates, metrics.cycle_times,
                            s=20, color='#72cafc')
 
-        labels = []
-        dates = []
-        cycles = []
-        tasks_ordered_by_done_time = sorted(
-            self.data_source.tasks, key=lambda x: x.closed_at, reverse=True)
         # put issue keys on points:
-        for task in tasks_ordered_by_done_time:
-            labels.append(task.full_label)
-            dates.append(task.closed_at)
-            cycles.append(task.cycle_time)
-            if self.show_labels:
-                ax_scatter.annotate(
-                    task.full_label, (task.closed_at, task.cycle_time))
+        if metrics.labels is not None:
+            for label, date, cycle_time in zip(metrics.labels, metrics.done_dates, metrics.cycle_times):
+                ax_scatter.annotate(label, (date, cycle_time))
 
+        dates = metrics.table_done_dates
         # Hide axes for the table subplot
         ax_table.axis('off')
-        table = ax_table.table(cellText=[[d.strftime('%Y-%m-%d'), c, l] for d, c, l in zip(dates, cycles, labels)],
+        # the colors of the rows are set in bulk when the table is created
+        cell_colours = np.where(metrics.table_highlighted, 'lightgreen', 'white')[:, np.newaxis].repeat(3, axis=1)
+        table = ax_table.table(cellText=[[d, c, l] for d, c, l in
+                                         zip(np.datetime_as_string(dates, unit='D'), metrics.table_cycle_times,
+                                             metrics.table_labels)],
+                               cellColours=cell_colours if len(dates) else None,
                                colWidths=[0.15, 0.10, 0.75], cellLoc='left',
                                colLabels=['Done Date',
                                           'CycleTime', 'Task names'],
                                bbox=[0, 0, 1, 1])
         table.auto_set_font_size(False)
         table.set_fontsize(12)
+        # the body cells are already left aligned by cellLoc, only the header needs it
+        for col in range(3):
+            table[0, col].set_text_props(ha='left')
+        if len(dates) < len(metrics.cycle_times):
+            ax_table.set_title(f"{len(dates)} most recent of {len(metrics.cycle_times)} completed tasks "
+                               f"(all of them in {self.appendix_name})")
 
-        today = datetime.datetime.now()
-        for (row, col), cell in table.get_celld().items():
-            cell.set_text_props(ha='left')
-
-        if self.highlight_last_days:
-            # Iterate over rows of the table and color rows based on the condition
-            for i in range(1, len(dates) + 1):  # Start from 1 to skip the header row
-                done_date = dates[i - 1]
-                if done_date > (today - datetime.timedelta(days=self.highlight_last_days)):
-                    # Set background color for the row
-                    for j in range(3):  # len columns
-                        table.get_celld()[i, j].set_facecolor('lightgreen')
-
-        percentile = 95
-        confidence_percentile = np.percentile(cycle_times_days, percentile)
-        ax_scatter.axhline(y=confidence_percentile, color='green', linestyle='dashed', linewidth=2,
-                           label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
-        percentile = 85
-        confidence_percentile = np.percentile(cycle_times_days, percentile)
-        ax_scatter.axhline(y=confidence_percentile, color='orange', linestyle='dashed', linewidth=2,
-                           label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
-        percentile = 50
-        confidence_percentile = np.percentile(cycle_times_days, percentile)
-        ax_scatter.axhline(y=confidence_percentile, color='red', linestyle='dashed', linewidth=2,
-                           label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
+        for percentile, confidence_percentile in metrics.cycle_time_percentiles.items():
+            ax_scatter.axhline(y=confidence_percentile, color=percentile_color(percentile), linestyle='dashed',
+                               linewidth=2, label=f"{percentile}% Percentile for Task completion = {confidence_percentile:.2f} days")
 
         ax_scatter.set_xlabel('Date')
         ax_scatter.tick_params(axis='x', rotation=90)
         # display only one date per week in x axis:
         from matplotlib.dates import MO
-        date_range_in_days = (
-                self.data_source.last_closing_date - self.data_source.first_closing_date).days
+        date_range_in_days = (metrics.last_closing_date - metrics.first_closing_date).days
         # if difference between first and last date is less than 7 days, then show all dates:
         if date_range_in_days < 7:
             ax_scatter.xaxis.set_major_locator(WeekdayLocator())
@@ -112,23 +154,56 @@ class CycleTimeScatterReport(Report):
         ax_scatter.legend()
 
         # get min and max date of done issues:
-        data_max_date = self.data_source.last_closing_date + \
+        data_max_date = metrics.last_closing_date + \
                         datetime.timedelta(days=5)
-        data_min_date = self.data_source.first_closing_date - \
+        data_min_date = metrics.first_closing_date - \
                         datetime.timedelta(days=5)
         ax_scatter.set_xlim(left=data_min_date, right=data_max_date)
 
+        estimated_only_label = "(Estimated Stories/Tasks)" if metrics.estimated_only else ""
         ax_scatter.set_title(
-            f"Cycle Time Scatter Plot for {len(cycle_times_days)} completed tasks {self.estimated_only_label} "
-            f"\n(history from {self.data_source.first_closing_date.strftime('%Y-%m-%d')} to "
-            f"{self.data_source.last_closing_date.strftime('%Y-%m-%d')})")
+            f"Cycle Time Scatter Plot for {len(metrics.cycle_times)} completed tasks {estimated_only_label} "
+            f"\n(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
 
         return self.save_report(plt)
 
+    def _generate_report(self) -> Optional[str]:
+        path = super()._generate_report()
+        # the appendix is written from the tasks, outside of the compute and render phases, that do not write it
+        with span("report.appendix"):
+            self.save_appendix(self._done_order())
+        return path
+
+    def _done_order(self) -> np.ndarray:
+        # tasks ordered by done time, most recent first
+        return np.argsort(-self.data_source.tasks.closed_at.astype(np.int64), kind="stable")
+
+    def save_appendix(self, order: np.ndarray) -> Optional[str]:
+        """
+        Writes all the tasks in the given order to a csv file next to the plot, streaming them in chunks
+        """
+        if not self.report_path:
+            return None
+        tasks = self.data_source.tasks
+        filename = f"{self.report_path}/{self.appendix_name}"
+        with open(filename, "w", newline="") as appendix_file:
+            writer = csv.writer(appendix_file)
+            writer.writerow(['Done Date', 'CycleTime', 'Task names'])
+            for start in range(0, len(order), APPENDIX_CHUNK_SIZE):
+                chunk = tasks.select(order[start:start + APPENDIX_CHUNK_SIZE])
+                writer.writerows(zip(np.datetime_as_string(chunk.closed_at, unit='D'), chunk.cycle_time,
+                                     chunk.full_labels()))
+        return filename
+
     @property
     def report_name(self):
         return "cycle_times_scatter_plot.png"
 
     @property
-    def estimated_only_label(self) -> str:
-        return "(Estimated Stories/Tasks)" if self.data_source.filters["has_estimation"] else ""
+    def file_names(self) -> list[str]:
+        return [self.report_name, self.appendix_name]
+
+    @property
+    def appendix_name(self) -> str:
+        return "cycle_times_scatter_tasks.csv"
@@ -1,24 +1,69 @@
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Optional, Union
 
+from development_analyzer.dataset_statistics import (
+    distribution_percentiles, percentile_color, percentiles,
+)
 from development_analyzer.datasources.datasource import DataSource
-from development_analyzer.reports.report import Report
+from development_analyzer.instrumentation import progress
+from development_analyzer.reports.monte_carlo_report import MonteCarloReport
 import datetime
-from matplotlib import pyplot as plt
 import numpy as np
 
 
-class MonteCarloHowManyDoneReport(Report):
+@dataclass
+class MonteCarloHowManyDoneMetrics:
+    finish_date: datetime.date
+    num_simulations: int
+    # percentiles are inverted: the tasks done with the given probability
+    tasks_done_percentiles: dict[int, float]
+    tasks_done: np.ndarray
+    frequencies: np.ndarray
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+    # adaptive simulations only: half width in tasks of the confidence interval of each percentile
+    precision: Optional[dict[int, float]]
+    confidence: Optional[float]
+    converged: Optional[bool]
+    samples: np.ndarray = field(metadata={"json": False})
+
+
+@dataclass
+class HowManyDoneDistributionMetrics:
+    finish_date: datetime.date
+    # percentiles are inverted: the tasks done with the given probability
+    tasks_done_percentiles: dict[int, int]
+    # exact distribution of the tasks done, without its negligible tails (see MIN_SHOWN_PROBABILITY)
+    tasks_done: np.ndarray
+    probabilities: np.ndarray
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+
+
+@dataclass
+class MonteCarloTasksDoneCurveMetrics:
+    # None for the exact distributions of the convolution engine
+    num_simulations: Optional[int]
+    # days of the curve, from tomorrow to the finish date
+    dates: np.ndarray
+    # tasks done by each date, at each percentile (inverted, like the tasks done by the finish date)
+    tasks_done_percentiles: dict[int, np.ndarray]
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+
+
+class MonteCarloHowManyDoneReport(MonteCarloReport):
     """
     This report will simulate the number of tasks that will be completed in a given date using a Monte Carlo simulation
+    (the options of the engines are described in MonteCarloReport)
     Attributes
     ----------
         finish_date: datetime.date
             Date to simulate the number of tasks that will be completed
-        num_simulations: int
-            Number of simulations to run with the Monte Carlo simulation
     """
+    name_prefix = "monte_carlo_how_many_done"
+    precision_unit = "tasks"
     finish_date: datetime.date
-    num_simulations: int
 
     def __init__(self, data_source: DataSource, report_path: Optional[str], options: Optional[dict]):
         super().__init__(data_source, report_path, options)
@@ -28,10 +73,39 @@ class MonteCarloHowManyDoneReport(Report):
                 "num_simulations": 1000
             }
         self.finish_date = options["finish_date"]
-        self.num_simulations = options["num_simulations"]
-
-    def generate_report(self):
-        num_tasks = self._run_simulations()
+        self._read_simulation_options(options)
+
+    def compute(self) -> Union[MonteCarloHowManyDoneMetrics, HowManyDoneDistributionMetrics,
+                               MonteCarloTasksDoneCurveMetrics]:
+        if self.curve:
+            return self._compute_curve()
+        if self.engine == "convolution":
+            return self._compute_distribution()
+        num_tasks, precision, converged = self._run_simulations()
+        tasks_done, frequencies = np.unique(num_tasks, return_counts=True)
+        return MonteCarloHowManyDoneMetrics(
+            finish_date=self.finish_date,
+            num_simulations=len(num_tasks),
+            tasks_done_percentiles=percentiles(num_tasks, self.data_source.statistics.percentile_levels,
+                                               inverted=True),
+            tasks_done=tasks_done,
+            frequencies=frequencies,
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+            precision=precision,
+            confidence=self.confidence if precision is not None else None,
+            converged=converged,
+            samples=num_tasks,
+        )
+
+    def render(self, metrics: Union[MonteCarloHowManyDoneMetrics, HowManyDoneDistributionMetrics,
+                                    MonteCarloTasksDoneCurveMetrics]) -> Optional[str]:
+        if isinstance(metrics, MonteCarloTasksDoneCurveMetrics):
+            return self._render_curve(metrics)
+        if isinstance(metrics, HowManyDoneDistributionMetrics):
+            return self._render_distribution(metrics)
+        from matplotlib import pyplot as plt
+        num_tasks = metrics.samples
 
         plt.figure(figsize=(14, 10))
         num_bins = int((max(num_tasks) - min(num_tasks)) / 2)
@@ -41,18 +115,9 @@ class MonteCarloHowManyDoneReport(Report):
         if num_bins < 50:
             plt.bar_label(bars, fontsize=10)
         # percentiles are inverted, because closing 10 tasks is more probable than closing 100 tasks (inverse relationship)
-        percentile = 95
-        confidence_percentile = np.percentile(num_tasks, 100 - percentile)
-        plt.axvline(x=confidence_percentile, color='green', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile of Tasks done = {int(confidence_percentile)}")
-        percentile = 85
-        confidence_percentile = np.percentile(num_tasks, 100 - percentile)
-        plt.axvline(x=confidence_percentile, color='orange', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile of Tasks done = {int(confidence_percentile)}")
-        percentile = 50
-        confidence_percentile = np.percentile(num_tasks, 100 - percentile)
-        plt.axvline(x=confidence_percentile, color='red', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile of Tasks done = {int(confidence_percentile)}")
+        for percentile, confidence_percentile in metrics.tasks_done_percentiles.items():
+            plt.axvline(x=confidence_percentile, color=percentile_color(percentile), linestyle='dashed', linewidth=2,
+                        label=f"{percentile}% Percentile of Tasks done = {int(confidence_percentile)}")
 
         plt.xlim(left=min(num_tasks), right=max(num_tasks))
         plt.xlabel('Number of Tasks done')
@@ -62,52 +127,127 @@ class MonteCarloHowManyDoneReport(Report):
         plt.legend()
 
         plt.title(
-            f"How many tasks will be done by {self.finish_date}\n"
-            f"(MCS of {self.num_simulations} runs) "
-            f"(history from {self.data_source.first_closing_date.strftime('%Y-%m-%d')} to "
-            f"{self.data_source.last_closing_date.strftime('%Y-%m-%d')})")
+            f"How many tasks will be done by {metrics.finish_date}\n"
+            f"{self._runs_label(metrics.num_simulations)}{self._precision_label(metrics)}"
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
+
+        return self.save_report(plt)
+
+    def _compute_distribution(self) -> HowManyDoneDistributionMetrics:
+        progress(f"Computing the exact distribution of the tasks done by {self.finish_date}.")
+        num_days = (self.finish_date - datetime.datetime.now().date()).days
+        cdf = self._create_engine().tasks_done_cdf(num_days)
+        probabilities = np.diff(cdf, prepend=0)
+        tasks_done = self._likely_values(probabilities)
+        return HowManyDoneDistributionMetrics(
+            finish_date=self.finish_date,
+            tasks_done_percentiles=distribution_percentiles(cdf, self.data_source.statistics.percentile_levels,
+                                                            inverted=True),
+            tasks_done=tasks_done,
+            probabilities=probabilities[tasks_done],
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+        )
+
+    def _render_distribution(self, metrics: HowManyDoneDistributionMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        plt.figure(figsize=(14, 10))
+
+        bars = plt.bar(metrics.tasks_done, metrics.probabilities * 100, width=0.9,
+                       label="Probability of Number of tasks done", color='#72cafc')
+        if len(metrics.tasks_done) < 50:
+            plt.bar_label(bars, fmt="%.1f", fontsize=10)
+        for percentile, confidence_percentile in metrics.tasks_done_percentiles.items():
+            plt.axvline(x=confidence_percentile, color=percentile_color(percentile), linestyle='dashed', linewidth=2,
+                        label=f"{percentile}% Percentile of Tasks done = {confidence_percentile}")
+
+        plt.xlim(left=metrics.tasks_done[0] - 0.5, right=metrics.tasks_done[-1] + 0.5)
+        plt.xlabel('Number of Tasks done')
+        plt.xticks(rotation=90)
+
+        plt.ylabel('Probability (%)')
+        plt.legend()
+
+        plt.title(
+            f"How many tasks will be done by {metrics.finish_date}\n"
+            f"{self._runs_label(None)}"
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
+
+        return self.save_report(plt)
+
+    def _compute_curve(self) -> MonteCarloTasksDoneCurveMetrics:
+        num_days = (self.finish_date - datetime.datetime.now().date()).days
+        levels = self.data_source.statistics.percentile_levels
+        if self.engine == "convolution":
+            progress(f"Computing the exact distribution of the tasks done by every date until {self.finish_date}.")
+            num_simulations = None
+            tasks_done_percentiles = distribution_percentiles(self._create_engine().tasks_done_curve_cdf(num_days),
+                                                              levels, inverted=True, axis=1)
+        else:
+            progress(f"Running {self.num_simulations} simulations of the Monte Carlo simulation for every date until "
+                     f"{self.finish_date}.")
+            num_simulations = self.num_simulations
+            tasks = self._create_engine().tasks_done_curve(num_days, self.num_simulations)
+            tasks_done_percentiles = percentiles(tasks, levels, inverted=True, axis=0)
+        today = np.datetime64(datetime.datetime.now().date(), "D")
+        return MonteCarloTasksDoneCurveMetrics(
+            num_simulations=num_simulations,
+            dates=today + np.arange(1, num_days + 1),
+            tasks_done_percentiles=tasks_done_percentiles,
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+        )
+
+    def _render_curve(self, metrics: MonteCarloTasksDoneCurveMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        plt.figure(figsize=(14, 10))
+
+        self._plot_percentile_curves(plt, metrics.dates, metrics.tasks_done_percentiles,
+                                     "Percentile of Tasks done")
+
+        plt.xlim(left=metrics.dates[0], right=metrics.dates[-1])
+        plt.xlabel('Date')
+        plt.xticks(rotation=90)
+        plt.ylabel('Number of Tasks done')
+        plt.ylim(bottom=0)
+        plt.grid(True)
+        plt.legend()
+
+        plt.title(
+            f"How many tasks will be done by each date until {self.finish_date}\n"
+            f"{self._runs_label(metrics.num_simulations)}"
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
 
+        self.save_metrics(metrics, self.table_name)
         return self.save_report(plt)
 
-    def _run_simulations(self) -> list[int]:
-        num_tasks_simulations = []
-        current_simulation = 0
-        print(f"Running {self.num_simulations} simulations of the Monte Carlo simulation for finish date "
-              f"{self.finish_date}. Progress: [", end="")
-        while current_simulation < self.num_simulations:
-            throughput_per_day = self._calculate_throughput_per_day()
-            num_tasks = self._calculate_num_tasks(throughput_per_day)
-            num_tasks_simulations.append(num_tasks)
-            current_simulation += 1
-            if current_simulation % 1000 == 0:
-                end = "]\n" if current_simulation == self.num_simulations else ""
-                print(f".", end=f"{end}")
-        return num_tasks_simulations
-
-    def _calculate_throughput_per_day(self) -> dict[datetime.date, int]:
-        throughput_per_day = {}
-        for task in self.data_source.tasks:
-            if not task.closed_at:
-                continue
-            if task.closed_at.date() in throughput_per_day:
-                throughput_per_day[task.closed_at.date()] += 1
-            else:
-                throughput_per_day[task.closed_at.date()] = 1
-
-        return throughput_per_day
-
-    def _calculate_num_tasks(self, throughput_per_day: dict[datetime.date, int]) -> int:
-        current_date = datetime.datetime.now().date()
-        done_tasks = 0
-        while current_date < self.finish_date:
-            random_day = np.random.choice(list(throughput_per_day.keys()))
-            random_throughput = throughput_per_day[random_day]
-            done_tasks += random_throughput
-            current_date += datetime.timedelta(days=1)
-        return done_tasks
+    def _run_simulations(self) -> tuple[np.ndarray, Optional[dict[int, float]], Optional[bool]]:
+        """
+        Returns the number of tasks done of each simulation and, in adaptive mode, the precision of each percentile
+        and whether all of them are within the tolerance
+        """
+        engine = self._create_engine()
+        num_days = (self.finish_date - datetime.datetime.now().date()).days
+        if self.tolerance is None:
+            progress(f"Running {self.num_simulations} simulations of the Monte Carlo simulation for finish date "
+                     f"{self.finish_date}.")
+            return engine.tasks_done(num_days, self.num_simulations), None, None
+
+        progress(f"Running up to {self.num_simulations} simulations of the Monte Carlo simulation for finish date "
+                 f"{self.finish_date}, until the percentiles are within {self.tolerance} tasks.")
+        levels = self.data_source.statistics.percentile_levels
+        # the percentiles are inverted, so the precision is tracked at the complementary levels
+        result = engine.tasks_done_adaptive(num_days, [100 - level for level in levels], self.tolerance,
+                                            self.num_simulations, self.batch_size, self.confidence)
+        progress(f"Used {len(result.samples)} simulations, percentiles within "
+                 f"{max(result.precision.values())} tasks.")
+        precision = {level: result.precision[100 - level] for level in levels}
+        return result.samples, precision, result.converged
 
     @property
-    def report_name(self):
-        x_days_from_now = (self.finish_date -
-                           datetime.datetime.now().date()).days
-        return f"monte_carlo_how_many_done_plot_{x_days_from_now}.png"
+    def name_suffix(self) -> int:
+        # days from now to the finish date
+        return (self.finish_date - datetime.datetime.now().date()).days
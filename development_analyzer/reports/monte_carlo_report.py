@@ -0,0 +1,137 @@
+from abc import abstractmethod
+from typing import Any, Optional
+
+import numpy as np
+
+from development_analyzer.dataset_statistics import percentile_color
+from development_analyzer.instrumentation import simulation_progress
+from development_analyzer.reports.report import Report
+from development_analyzer.simulations.engine_factory import create_engine
+from development_analyzer.simulations.monte_carlo_engine import (
+    DEFAULT_BATCH_SIZE, DEFAULT_CONFIDENCE, DEFAULT_MAX_MATRIX_SIZE,
+)
+
+# values at both ends of the exact distributions with a lower probability are left out of their metrics and charts
+MIN_SHOWN_PROBABILITY = 1e-4
+
+
+class MonteCarloReport(Report):
+    """
+    Base class of the forecast reports, with the options of the engines, the parts shared by their charts and the
+    names of their files: <name_prefix>_plot_<name_suffix>.png, or <name_prefix>_curve_<name_suffix>.png and .json in
+    curve mode
+    Attributes
+    ----------
+        name_prefix: str
+            Start of the names of the files of the report
+        precision_unit: str
+            Unit of the forecast values, in which the tolerance and the precision of the percentiles are given
+        engine: str
+            Engine of the forecast (see simulations/engine_factory.py): "monte_carlo" samples the throughput history,
+            "convolution" computes the exact distribution of the forecast (the simulation options do not apply)
+        num_simulations: int
+            Number of simulations to run with the Monte Carlo simulation, the maximum number in adaptive mode
+        max_matrix_size: int
+            Maximum number of cells of each chunk of simulations, to bound the memory used
+        tolerance: Optional[float]
+            Adaptive mode: the simulations are run in batches until the confidence interval of each percentile is
+            within this number of precision units. None to always run num_simulations
+        batch_size: int
+            Adaptive mode: number of simulations run between each check of the precision
+        confidence: float
+            Adaptive mode: confidence level of the intervals of the percentiles
+        seed: Optional[int]
+            Seed of the simulations, to reproduce them (the same with any number of workers). None for random ones
+        max_workers: int
+            Number of processes that run the simulations
+        curve: bool
+            Forecast curve mode: the forecast of every step until the target, read from the same simulations, is
+            plotted as a fan chart of the percentiles and written to a JSON table (not adaptive)
+    """
+    # the simulations start from the current date
+    depends_on_date = True
+    # a seed gives the same simulations with any number of workers
+    unfingerprinted_options = ("max_workers",)
+    name_prefix: str
+    precision_unit: str
+    engine: str
+    num_simulations: int
+    max_matrix_size: int
+    tolerance: Optional[float]
+    batch_size: int
+    confidence: float
+    seed: Optional[int]
+    max_workers: int
+    curve: bool
+
+    def _read_simulation_options(self, options: dict):
+        self.engine = options.get("engine", "monte_carlo")
+        self.num_simulations = options["num_simulations"]
+        self.max_matrix_size = options.get("max_matrix_size", DEFAULT_MAX_MATRIX_SIZE)
+        self.tolerance = options.get("tolerance")
+        self.batch_size = options.get("batch_size", DEFAULT_BATCH_SIZE)
+        self.confidence = options.get("confidence", DEFAULT_CONFIDENCE)
+        self.seed = options.get("seed")
+        self.max_workers = options.get("max_workers", 1)
+        self.curve = options.get("curve", False)
+
+    def _create_engine(self):
+        if self.engine == "monte_carlo":
+            return create_engine(self.engine, self.data_source.tasks.throughput_per_day(),
+                                 max_matrix_size=self.max_matrix_size, progress_callback=simulation_progress,
+                                 seed=self.seed, max_workers=self.max_workers)
+        return create_engine(self.engine, self.data_source.tasks.throughput_per_day())
+
+    def _precision_label(self, metrics: Any) -> str:
+        if metrics.precision is None:
+            return ""
+        return (f"(percentiles within ±{max(metrics.precision.values()):g} {self.precision_unit} "
+                f"at {metrics.confidence:.0%} confidence) ")
+
+    @staticmethod
+    def _runs_label(num_simulations: Optional[int]) -> str:
+        return f"(MCS of {num_simulations} runs) " if num_simulations is not None else "(exact distribution) "
+
+    @staticmethod
+    def _likely_values(probabilities: np.ndarray) -> np.ndarray:
+        """
+        Values of an exact distribution from the first to the last one with a probability of at least
+        MIN_SHOWN_PROBABILITY
+        """
+        likely = np.flatnonzero(probabilities >= MIN_SHOWN_PROBABILITY)
+        return np.arange(likely[0], likely[-1] + 1)
+
+    @staticmethod
+    def _plot_percentile_curves(plt, x: np.ndarray, curves: dict[int, np.ndarray], label: str):
+        """
+        Fan chart of a forecast curve: bands between consecutive percentiles, and a line for each percentile
+        """
+        levels = sorted(curves)
+        for lower, upper in zip(levels, levels[1:]):
+            plt.fill_between(x, curves[lower], curves[upper], color='#72cafc', alpha=0.4)
+        for percentile, values in curves.items():
+            plt.plot(x, values, color=percentile_color(percentile), linestyle='dashed', linewidth=2,
+                     label=f"{percentile}% {label}")
+
+    @property
+    @abstractmethod
+    def name_suffix(self) -> int:
+        """
+        End of the names of the files of the report, the target of the forecast
+        """
+        pass
+
+    @property
+    def report_name(self):
+        return self._file_name("curve" if self.curve else "plot", "png")
+
+    @property
+    def file_names(self) -> list[str]:
+        return [self.report_name, self.table_name] if self.curve else [self.report_name]
+
+    @property
+    def table_name(self) -> str:
+        return self._file_name("curve", "json")
+
+    def _file_name(self, kind: str, extension: str) -> str:
+        return f"{self.name_prefix}_{kind}_{self.name_suffix}.{extension}"
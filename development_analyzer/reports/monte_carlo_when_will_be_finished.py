@@ -1,25 +1,69 @@
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Optional, Union
 
+from development_analyzer.dataset_statistics import (
+    distribution_percentiles, percentile_color, percentiles,
+)
 from development_analyzer.datasources.datasource import DataSource
-from development_analyzer.reports.report import Report
+from development_analyzer.instrumentation import progress
+from development_analyzer.reports.monte_carlo_report import MonteCarloReport
 import datetime
-from matplotlib import pyplot as plt
-from matplotlib.dates import DateFormatter, WeekdayLocator, MonthLocator, YearLocator
 import numpy as np
 
 
-class MonteCarloWhenWillBeFinishedReport(Report):
+@dataclass
+class MonteCarloWhenWillBeFinishedMetrics:
+    num_tasks: int
+    num_simulations: int
+    finish_date_percentiles: dict[int, datetime.date]
+    finish_dates: np.ndarray
+    frequencies: np.ndarray
+    min_date: datetime.date
+    max_date: datetime.date
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+    # adaptive simulations only: half width in days of the confidence interval of each percentile
+    precision: Optional[dict[int, float]]
+    confidence: Optional[float]
+    converged: Optional[bool]
+    samples: np.ndarray = field(metadata={"json": False})
+
+
+@dataclass
+class WhenWillBeFinishedDistributionMetrics:
+    num_tasks: int
+    finish_date_percentiles: dict[int, datetime.date]
+    # exact distribution of the finish dates, without its negligible tails (see MIN_SHOWN_PROBABILITY)
+    finish_dates: np.ndarray
+    probabilities: np.ndarray
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+
+
+@dataclass
+class MonteCarloFinishDateCurveMetrics:
+    # None for the exact distributions of the convolution engine
+    num_simulations: Optional[int]
+    # numbers of tasks of the curve, from 1 to num_tasks
+    num_tasks: np.ndarray
+    # finish date of each number of tasks, at each percentile
+    finish_date_percentiles: dict[int, np.ndarray]
+    first_closing_date: Optional[datetime.datetime]
+    last_closing_date: Optional[datetime.datetime]
+
+
+class MonteCarloWhenWillBeFinishedReport(MonteCarloReport):
     """
     This report will simulate the finish date of the project using a Monte Carlo simulation
+    (the options of the engines are described in MonteCarloReport)
     Attributes
     ----------
         num_tasks: int
             Number of tasks that are expected to be completed
-        num_simulations: int
-            Number of simulations to run with the Monte Carlo simulation
     """
+    name_prefix = "monte_carlo_when_will_be_finished"
+    precision_unit = "days"
     num_tasks: int
-    num_simulations: int
 
     def __init__(self, data_source: DataSource, report_path: Optional[str], options: Optional[dict]):
         super().__init__(data_source, report_path, options)
@@ -29,17 +73,48 @@ class MonteCarloWhenWillBeFinishedReport(Report):
                 "num_simulations": 1000
             }
         self.num_tasks = options["num_tasks"]
-        self.num_simulations = options["num_simulations"]
+        self._read_simulation_options(options)
 
-    def generate_report(self):
-        finish_dates = self._run_simulations()
+    def compute(self) -> Union[MonteCarloWhenWillBeFinishedMetrics, WhenWillBeFinishedDistributionMetrics,
+                               MonteCarloFinishDateCurveMetrics]:
+        if self.curve:
+            return self._compute_curve()
+        if self.engine == "convolution":
+            return self._compute_distribution()
+        finish_dates, precision, converged = self._run_simulations()
+        unique_dates, frequencies = np.unique(finish_dates, return_counts=True)
+        return MonteCarloWhenWillBeFinishedMetrics(
+            num_tasks=self.num_tasks,
+            num_simulations=len(finish_dates),
+            finish_date_percentiles=self._date_percentiles(finish_dates),
+            finish_dates=unique_dates,
+            frequencies=frequencies,
+            min_date=finish_dates.min().astype(datetime.date),
+            max_date=finish_dates.max().astype(datetime.date),
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+            precision=precision,
+            confidence=self.confidence if precision is not None else None,
+            converged=converged,
+            samples=finish_dates,
+        )
+
+    def render(self, metrics: Union[MonteCarloWhenWillBeFinishedMetrics, WhenWillBeFinishedDistributionMetrics,
+                                    MonteCarloFinishDateCurveMetrics]) -> Optional[str]:
+        if isinstance(metrics, MonteCarloFinishDateCurveMetrics):
+            return self._render_curve(metrics)
+        if isinstance(metrics, WhenWillBeFinishedDistributionMetrics):
+            return self._render_distribution(metrics)
+        from matplotlib import pyplot as plt
+        from matplotlib.dates import DateFormatter, WeekdayLocator, MonthLocator, YearLocator
+        finish_dates = metrics.samples
 
         plt.figure(figsize=(14, 10))
         # display only one date per week in x axis:
         from matplotlib.dates import MO
         # if difference between first and last date is less than 7 days, then show all dates:
-        max_date = max(set(finish_dates))
-        min_date = min(set(finish_dates))
+        max_date = metrics.max_date
+        min_date = metrics.min_date
         date_range_in_days = (max_date - min_date).days
         if date_range_in_days < 60:
             num_bins = date_range_in_days
@@ -63,18 +138,9 @@ class MonteCarloWhenWillBeFinishedReport(Report):
             plt.gca().xaxis.set_major_locator(YearLocator())
             plt.gca().xaxis.set_major_formatter(DateFormatter('%Y'))
 
-        percentile = 95
-        confidence_percentile = np.percentile(finish_dates, percentile)
-        plt.axvline(x=confidence_percentile, color='green', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile for Finish Date = {confidence_percentile.strftime('%Y-%m-%d')}")
-        percentile = 85
-        confidence_percentile = np.percentile(finish_dates, percentile)
-        plt.axvline(x=confidence_percentile, color='orange', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile for Finish Date = {confidence_percentile.strftime('%Y-%m-%d')}")
-        percentile = 50
-        confidence_percentile = np.percentile(finish_dates, percentile)
-        plt.axvline(x=confidence_percentile, color='red', linestyle='dashed', linewidth=2,
-                    label=f"{percentile}% Percentile for Finish Date = {confidence_percentile.strftime('%Y-%m-%d')}")
+        for percentile, confidence_percentile in metrics.finish_date_percentiles.items():
+            plt.axvline(x=confidence_percentile, color=percentile_color(percentile), linestyle='dashed', linewidth=2,
+                        label=f"{percentile}% Percentile for Finish Date = {confidence_percentile.strftime('%Y-%m-%d')}")
 
         plt.xlim(left=min_date, right=max_date)
         plt.xlabel('Finish Date')
@@ -84,51 +150,133 @@ class MonteCarloWhenWillBeFinishedReport(Report):
         plt.legend()
 
         plt.title(
-            f"When will {self.num_tasks} tasks be finished\n"
-            f"(MCS of {self.num_simulations} runs) "
-            f"(history from {self.data_source.first_closing_date.strftime('%Y-%m-%d')} to "
-            f"{self.data_source.last_closing_date.strftime('%Y-%m-%d')})")
+            f"When will {metrics.num_tasks} tasks be finished\n"
+            f"{self._runs_label(metrics.num_simulations)}{self._precision_label(metrics)}"
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
+
+        return self.save_report(plt)
+
+    def _compute_distribution(self) -> WhenWillBeFinishedDistributionMetrics:
+        progress(f"Computing the exact distribution of the finish date of {self.num_tasks} tasks.")
+        cdf = self._create_engine().days_to_finish_cdf(self.num_tasks)
+        probabilities = np.diff(cdf, prepend=0)
+        days = self._likely_values(probabilities)
+        today = np.datetime64(datetime.datetime.now().date(), "D")
+        return WhenWillBeFinishedDistributionMetrics(
+            num_tasks=self.num_tasks,
+            finish_date_percentiles={
+                percentile: (today + np.timedelta64(value, "D")).astype(datetime.date)
+                for percentile, value in distribution_percentiles(
+                    cdf, self.data_source.statistics.percentile_levels).items()},
+            finish_dates=today + days,
+            probabilities=probabilities[days],
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+        )
+
+    def _render_distribution(self, metrics: WhenWillBeFinishedDistributionMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        from matplotlib.dates import DateFormatter
+        plt.figure(figsize=(14, 10))
+
+        bars = plt.bar(metrics.finish_dates, metrics.probabilities * 100, width=0.9,
+                       label="Probability of Finish Dates", color='#72cafc')
+        if len(metrics.finish_dates) < 50:
+            plt.bar_label(bars, fmt="%.1f", fontsize=10)
+        plt.gca().xaxis.set_major_formatter(DateFormatter('%Y-%m-%d'))
+
+        for percentile, confidence_percentile in metrics.finish_date_percentiles.items():
+            plt.axvline(x=confidence_percentile, color=percentile_color(percentile), linestyle='dashed', linewidth=2,
+                        label=f"{percentile}% Percentile for Finish Date = {confidence_percentile.strftime('%Y-%m-%d')}")
+
+        plt.xlabel('Finish Date')
+        plt.xticks(rotation=90)
+
+        plt.ylabel('Probability (%)')
+        plt.legend()
+
+        plt.title(
+            f"When will {metrics.num_tasks} tasks be finished\n"
+            f"{self._runs_label(None)}"
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
 
         return self.save_report(plt)
 
-    def _run_simulations(self) -> list[datetime.date]:
-        finish_date_simulations = []
-        current_simulation = 0
-        print(f"Running {self.num_simulations} simulations of the Monte Carlo simulation for {self.num_tasks} tasks."
-              f" Progress: [",
-              end='')
-        while current_simulation < self.num_simulations:
-            throughput_per_day = self._calculate_throughput_per_day()
-            finish_date = self._calculate_finish_date(throughput_per_day)
-            finish_date_simulations.append(finish_date)
-            current_simulation += 1
-            if current_simulation % 1000 == 0:
-                end = "]\n" if current_simulation == self.num_simulations else ""
-                print(f".", end=f"{end}")
-        return finish_date_simulations
-
-    def _calculate_throughput_per_day(self) -> dict[datetime.date, int]:
-        throughput_per_day = {}
-        for task in self.data_source.tasks:
-            if not task.closed_at:
-                continue
-            if task.closed_at.date() in throughput_per_day:
-                throughput_per_day[task.closed_at.date()] += 1
-            else:
-                throughput_per_day[task.closed_at.date()] = 1
-
-        return throughput_per_day
-
-    def _calculate_finish_date(self, throughput_per_day: dict[datetime.date, int]) -> datetime.date:
-        current_date = datetime.datetime.now().date()
-        remaining_tasks = self.num_tasks
-        while remaining_tasks > 0:
-            random_day = np.random.choice(list(throughput_per_day.keys()))
-            random_throughput = throughput_per_day[random_day]
-            remaining_tasks -= random_throughput
-            current_date += datetime.timedelta(days=1)
-        return current_date
+    def _compute_curve(self) -> MonteCarloFinishDateCurveMetrics:
+        levels = self.data_source.statistics.percentile_levels
+        if self.engine == "convolution":
+            progress(f"Computing the exact distribution of the finish date of 1 to {self.num_tasks} tasks.")
+            num_simulations = None
+            days_percentiles = distribution_percentiles(self._create_engine().finish_days_curve_cdf(self.num_tasks),
+                                                        levels, axis=0)
+        else:
+            progress(f"Running {self.num_simulations} simulations of the Monte Carlo simulation for 1 to "
+                     f"{self.num_tasks} tasks.")
+            num_simulations = self.num_simulations
+            days = self._create_engine().finish_days_curve(self.num_tasks, self.num_simulations)
+            days_percentiles = percentiles(days, levels, axis=0)
+        today = np.datetime64(datetime.datetime.now().date(), "D")
+        return MonteCarloFinishDateCurveMetrics(
+            num_simulations=num_simulations,
+            num_tasks=np.arange(1, self.num_tasks + 1),
+            # truncated to whole days, like the percentiles of a single number of tasks
+            finish_date_percentiles={percentile: today + value.astype(np.int64)
+                                     for percentile, value in days_percentiles.items()},
+            first_closing_date=self.data_source.first_closing_date,
+            last_closing_date=self.data_source.last_closing_date,
+        )
+
+    def _render_curve(self, metrics: MonteCarloFinishDateCurveMetrics) -> Optional[str]:
+        from matplotlib import pyplot as plt
+        plt.figure(figsize=(14, 10))
+
+        self._plot_percentile_curves(plt, metrics.num_tasks, metrics.finish_date_percentiles,
+                                     "Percentile for Finish Date")
+
+        plt.xlim(left=1, right=metrics.num_tasks[-1])
+        plt.xlabel('Number of Tasks')
+        plt.ylabel('Finish Date')
+        plt.grid(True)
+        plt.legend()
+
+        plt.title(
+            f"When will each number of tasks up to {metrics.num_tasks[-1]} be finished\n"
+            f"{self._runs_label(metrics.num_simulations)}"
+            f"(history from {metrics.first_closing_date.strftime('%Y-%m-%d')} to "
+            f"{metrics.last_closing_date.strftime('%Y-%m-%d')})")
+
+        self.save_metrics(metrics, self.table_name)
+        return self.save_report(plt)
+
+    def _run_simulations(self) -> tuple[np.ndarray, Optional[dict[int, float]], Optional[bool]]:
+        """
+        Returns the finish date of each simulation and, in adaptive mode, the precision of each percentile and whether
+        all of them are within the tolerance
+        """
+        engine = self._create_engine()
+        today = np.datetime64(datetime.datetime.now().date(), "D")
+        if self.tolerance is None:
+            progress(f"Running {self.num_simulations} simulations of the Monte Carlo simulation for {self.num_tasks} "
+                     f"tasks.")
+            return today + engine.days_to_finish(self.num_tasks, self.num_simulations), None, None
+
+        progress(f"Running up to {self.num_simulations} simulations of the Monte Carlo simulation for {self.num_tasks} "
+                 f"tasks, until the percentiles are within {self.tolerance} days.")
+        levels = self.data_source.statistics.percentile_levels
+        result = engine.days_to_finish_adaptive(self.num_tasks, levels, self.tolerance, self.num_simulations,
+                                                self.batch_size, self.confidence)
+        progress(f"Used {len(result.samples)} simulations, percentiles within "
+                 f"{max(result.precision.values())} days.")
+        return today + result.samples, result.precision, result.converged
+
+    def _date_percentiles(self, finish_dates: np.ndarray) -> dict[int, datetime.date]:
+        today = np.datetime64(datetime.datetime.now().date(), "D")
+        days = percentiles((finish_dates - today).astype(np.int64), self.data_source.statistics.percentile_levels)
+        return {percentile: (today + np.timedelta64(int(value), "D")).astype(datetime.date)
+                for percentile, value in days.items()}
 
     @property
-    def report_name(self):
-        return f"monte_carlo_when_will_be_finished_plot_{self.num_tasks}.png"
+    def name_suffix(self) -> int:
+        return self.num_tasks
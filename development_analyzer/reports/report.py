@@ -1,28 +1,219 @@
+import dataclasses
+import datetime
+import functools
+import hashlib
+import json
+import os
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Optional
+
+import numpy as np
 
 from development_analyzer.datasources.datasource import DataSource
+from development_analyzer.instrumentation import progress, span
+from development_analyzer.reports.report_store import ReportStore
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class Report(ABC):
+    """
+    Base class of the reports. Each report is split in a compute phase, that returns its metrics as a dataclass without
+    using matplotlib, and a render phase that plots them.
+    When a report store is set, generated reports are stored under the fingerprint of their
+    data, options and code, and reused instead of generated again while none of them change.
+    Attributes
+    ----------
+        depends_on_date: bool
+            Whether the report depends on the current date (e.g. forecasts from today), so it is not reused on
+            another day
+        unfingerprinted_options: tuple[str, ...]
+            Options that do not change the files of the report (e.g. the number of processes), left out of its
+            fingerprint
+        report_store: Optional[ReportStore]
+            Store of the generated reports, None to always generate them
+    """
+    depends_on_date: bool = False
+    unfingerprinted_options: tuple[str, ...] = ()
+    report_store: Optional[ReportStore] = None
 
     def __init__(self, data_source: DataSource, report_path: Optional[str], options: Optional[dict]):
         self.data_source = data_source
         self.report_path = report_path
         self.options = options
 
+    def generate_report(self) -> Optional[str]:
+        """
+        Generates the report, unless a report with the same fingerprint is found in the output folder or in the
+        report store, which is returned without computing or rendering anything
+        """
+        if self.report_store is None or not self.report_path:
+            return self._generate_report()
+
+        fingerprint = self.fingerprint
+        filename = f"{self.report_path}/{self.report_name}"
+        if self._is_in_report_path(fingerprint) or \
+                self.report_store.fetch(fingerprint, self.file_names, self.report_path):
+            self._write_fingerprint(fingerprint)
+            progress(f"Reused report plot {filename}, its data, options and code have not changed")
+            return filename
+
+        path = self._generate_report()
+        if path:
+            with span("report.store", file=filename):
+                self.report_store.put(fingerprint, [f"{self.report_path}/{name}" for name in self.file_names])
+            self._write_fingerprint(fingerprint)
+        return path
+
+    @abstractmethod
+    def compute(self) -> Any:
+        """
+        Returns the metrics of the report, as a dataclass
+        """
+        pass
+
     @abstractmethod
-    def generate_report(self):
+    def render(self, metrics: Any) -> Optional[str]:
+        """
+        Plots the metrics, returning the path of the saved report if it has a report path
+        """
         pass
 
+    def _generate_report(self) -> Optional[str]:
+        with span("report.compute"):
+            metrics = self.compute()
+        with span("report.render"):
+            return self.render(metrics)
+
     @property
     @abstractmethod
     def report_name(self):
         pass
 
+    @property
+    def file_names(self) -> list[str]:
+        """
+        Names of the files written by the report in the report path
+        """
+        return [self.report_name]
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hash of everything the report depends on: the filtered tasks, the report class and options, the code and
+        the current date for the reports that depend on it
+        """
+        content = {
+            "report": f"{type(self).__module__}.{type(self).__qualname__}",
+            "options": {name: value for name, value in self.options.items()
+                        if name not in self.unfingerprinted_options} if self.options else self.options,
+            "tasks": self.data_source.statistics.content_hash,
+            # the rest of the filters only matter through the filtered tasks
+            "has_estimation": self.data_source.filters.get("has_estimation"),
+            "percentiles": self.data_source.percentile_levels,
+            "code": _code_version(),
+            "date": datetime.date.today() if self.depends_on_date else None,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
     def save_report(self, plt) -> Optional[str]:
         if self.report_path:
             filename = f"{self.report_path}/{self.report_name}"
-            plt.savefig(filename)
-            print(f"Saved report plot to {filename}")
+            # the figure is drawn when it is saved, so this is the rendering time
+            with span("report.save", file=filename):
+                plt.savefig(filename)
+                plt.close()
+            progress(f"Saved report plot to {filename}")
             return filename
+
+    def save_metrics(self, metrics: Any, file_name: str) -> Optional[str]:
+        """
+        Writes the metrics as JSON next to the report
+        """
+        if self.report_path:
+            filename = f"{self.report_path}/{file_name}"
+            with open(filename, "w") as metrics_file:
+                json.dump(metrics_to_dict(metrics), metrics_file, indent=2)
+            progress(f"Saved report metrics to {filename}")
+            return filename
+
+    def _is_in_report_path(self, fingerprint: str) -> bool:
+        fingerprint_path = self._fingerprint_path
+        if not os.path.exists(fingerprint_path):
+            return False
+        try:
+            with open(fingerprint_path) as fingerprint_file:
+                sidecar = json.load(fingerprint_file)
+        except ValueError:
+            return False
+        if sidecar.get("fingerprint") != fingerprint:
+            return False
+        # the files may have been written again since the sidecar, e.g. by a run without a report store
+        file_hashes = self._file_hashes()
+        return file_hashes is not None and sidecar.get("files") == file_hashes
+
+    def _write_fingerprint(self, fingerprint: str):
+        with open(self._fingerprint_path, "w") as fingerprint_file:
+            json.dump({"fingerprint": fingerprint, "files": self._file_hashes()}, fingerprint_file)
+
+    def _file_hashes(self) -> Optional[dict[str, str]]:
+        """
+        Hash of the content of each file of the report in the report path, None if any of them is missing
+        """
+        hashes = {}
+        for name in self.file_names:
+            file_path = f"{self.report_path}/{name}"
+            if not os.path.exists(file_path):
+                return None
+            with open(file_path, "rb") as report_file:
+                hashes[name] = hashlib.sha256(report_file.read()).hexdigest()
+        return hashes
+
+    @property
+    def _fingerprint_path(self) -> str:
+        # hidden sidecar next to the report, with the fingerprint and the hashes of the files in the report path
+        return f"{self.report_path}/.{self.report_name}.fingerprint"
+
+
+def metrics_to_dict(metrics: Any) -> dict:
+    """
+    Converts the metrics of a report to a dictionary that can be serialized to JSON. Fields with "json": False in
+    their metadata (e.g. the raw samples used to plot) are left out.
+    """
+    return {metrics_field.name: _to_json_value(getattr(metrics, metrics_field.name))
+            for metrics_field in dataclasses.fields(metrics) if metrics_field.metadata.get("json", True)}
+
+
+def _to_json_value(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return metrics_to_dict(value)
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    elif isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, dict):
+        return {key: _to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(item) for item in value]
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def _code_version() -> str:
+    """
+    Hash of the source code of the package and the versions of the libraries that affect the reports
+    """
+    import matplotlib
+    import numpy as np
+    digest = hashlib.sha256(f"{np.__version__} {matplotlib.__version__}".encode())
+    source_paths = sorted(os.path.join(folder, file_name) for folder, _, file_names in os.walk(PACKAGE_FOLDER)
+                          for file_name in file_names if file_name.endswith(".py"))
+    for source_path in source_paths:
+        digest.update(os.path.relpath(source_path, PACKAGE_FOLDER).encode())
+        with open(source_path, "rb") as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
@@ -0,0 +1,46 @@
+from typing import Optional
+
+from development_analyzer.datasources.datasource import DataSource
+from development_analyzer.reports.report import Report
+from development_analyzer.reports.report_store import ReportStore
+
+REPORT_TYPES = [
+    "scatter",
+    "histogram",
+    "cycle_time_estimation_relationship",
+    "monte_carlo_when_will_be_finished",
+    "monte_carlo_how_many_done",
+    "cumulative_flow_diagram",
+]
+
+
+def create_report(report_type: str, data_source: DataSource, report_path: Optional[str],
+                  options: Optional[dict], report_store: Optional[ReportStore] = None) -> Report:
+    report = _create_report(report_type, data_source, report_path, options)
+    report.report_store = report_store
+    return report
+
+
+def _create_report(report_type: str, data_source: DataSource, report_path: Optional[str],
+                   options: Optional[dict]) -> Report:
+    if report_type == "scatter":
+        from development_analyzer.reports.cycle_time_scatter import CycleTimeScatterReport
+        return CycleTimeScatterReport(data_source, report_path, options)
+    elif report_type == "histogram":
+        from development_analyzer.reports.cycle_time_histogram import CycleTimeHistogramReport
+        return CycleTimeHistogramReport(data_source, report_path, options)
+    elif report_type == "cycle_time_estimation_relationship":
+        from development_analyzer.reports.cycle_time_estimation_relationship import \
+            CycleTimeEstimationRelationshipReport
+        return CycleTimeEstimationRelationshipReport(data_source, report_path, options)
+    elif report_type == "monte_carlo_when_will_be_finished":
+        from development_analyzer.reports.monte_carlo_when_will_be_finished import MonteCarloWhenWillBeFinishedReport
+        return MonteCarloWhenWillBeFinishedReport(data_source, report_path, options)
+    elif report_type == "monte_carlo_how_many_done":
+        from development_analyzer.reports.monte_carlo_how_many_done import MonteCarloHowManyDoneReport
+        return MonteCarloHowManyDoneReport(data_source, report_path, options)
+    elif report_type == "cumulative_flow_diagram":
+        from development_analyzer.reports.cumulative_flow_diagram import CumulativeFlowDiagramReport
+        return CumulativeFlowDiagramReport(data_source, report_path, options)
+    else:
+        raise ValueError(f"Invalid type: {report_type}")
@@ -0,0 +1,53 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+
+class ReportStore(ABC):
+    """
+    Content-addressed store of generated reports: the files of each report are stored under the fingerprint of the
+    data, options and code they were generated from, so they can be reused while none of them change.
+    """
+
+    @abstractmethod
+    def fetch(self, key: str, file_names: list[str], folder: str) -> bool:
+        """
+        Copies the files stored under the key to the folder.
+        Returns False, without copying anything, if any of the files is not stored.
+        """
+        pass
+
+    @abstractmethod
+    def put(self, key: str, file_paths: list[str]):
+        pass
+
+
+class LocalReportStore(ReportStore):
+    """
+    Report store in a local folder, with a subfolder per fingerprint
+    Attributes
+    ----------
+        folder: str
+            Folder where the reports are stored
+    """
+    folder: str
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    def fetch(self, key: str, file_names: list[str], folder: str) -> bool:
+        stored_paths = [os.path.join(self.folder, key, file_name) for file_name in file_names]
+        if not all(os.path.exists(stored_path) for stored_path in stored_paths):
+            return False
+        for stored_path, file_name in zip(stored_paths, file_names):
+            shutil.copyfile(stored_path, os.path.join(folder, file_name))
+        return True
+
+    def put(self, key: str, file_paths: list[str]):
+        key_folder = os.path.join(self.folder, key)
+        os.makedirs(key_folder, exist_ok=True)
+        for file_path in file_paths:
+            # copied under a temporary name and renamed, so a concurrent fetch never sees a partial file
+            stored_path = os.path.join(key_folder, os.path.basename(file_path))
+            shutil.copyfile(file_path, f"{stored_path}.tmp")
+            os.replace(f"{stored_path}.tmp", stored_path)
@@ -0,0 +1,155 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from development_analyzer.dataset_statistics import distribution_percentiles, percentiles
+from development_analyzer.datasources.datasource import DataSource
+from development_analyzer.instrumentation import progress, span
+from development_analyzer.simulations.engine_factory import create_engine
+
+# level of the percentile whose error is measured
+MEDIAN = 50
+
+
+@dataclass
+class BacktestForecast:
+    # day the forecast is made on, with the tasks closed before it
+    origin: datetime.date
+    # forecast percentiles, inverted for the tasks done like in the reports
+    percentiles: dict[int, float]
+    # tasks done in the horizon, or days needed to finish the tasks, after the origin
+    actual: int
+    # the tasks were not finished by the end of the history: actual is the fewest days they can still need
+    censored: bool = False
+
+
+@dataclass
+class ForecastBacktest:
+    forecasts: list[BacktestForecast]
+    # share of the forecasts whose actual outcome is within each percentile, calibrated forecasts have a coverage
+    # close to the level. A censored forecast only counts, as a miss, at the percentiles its history already ran past
+    coverage: dict[int, float]
+    # error of the 50% percentile, of the forecasts that are not censored: mean of its absolute difference with the
+    # actual outcome, and mean of the difference (positive when it overestimates the tasks done or the days needed)
+    mean_absolute_error: Optional[float]
+    bias: Optional[float]
+    # number of forecasts whose outcome had not happened by the end of the history
+    censored: int
+
+
+@dataclass
+class BacktestResult:
+    engine: str
+    num_simulations: int
+    horizon_days: int
+    num_tasks: int
+    # how many tasks are done in horizon_days days
+    how_many_done: ForecastBacktest
+    # in how many days num_tasks tasks are finished
+    when_will_be_finished: ForecastBacktest
+
+
+def backtest(data_source: DataSource, horizon_days: int = 30, num_tasks: int = 100, num_simulations: int = 2000,
+             step_days: int = 7, min_history_days: int = 30, window_days: Optional[int] = None,
+             engine: str = "monte_carlo", seed: Optional[int] = None) -> BacktestResult:
+    """
+    Moves a forecast origin across the history of the filtered tasks, every step_days days after the first
+    min_history_days, and forecasts at each one the tasks done in horizon_days days and the days needed to finish
+    num_tasks tasks, from the throughput of the days before the origin (the last window_days days if given). The
+    origins without any closed task in those days are skipped, as there is no throughput to forecast from.
+    The forecasts are compared with what actually happened after the origin. When num_tasks tasks were not finished
+    by the end of the history, the forecast of their finish is censored: it is only known to be missed at the
+    percentiles below the days the history runs after the origin, and it is left out of the rest and of the error.
+    The daily throughput is turned once into prefix sums: the outcome after each origin is the difference of two of
+    them, and the throughput history known at each origin is a slice of the same array of days with closed tasks.
+    """
+    levels = data_source.statistics.percentile_levels
+    forecast_levels = list(dict.fromkeys([*levels, MEDIAN]))
+    closing_days = data_source.tasks.closed_at[~np.isnat(data_source.tasks.closed_at)].astype("datetime64[D]")
+    if closing_days.size == 0:
+        raise ValueError("Cannot backtest without closed tasks")
+    first_day = closing_days.min()
+    daily = np.bincount((closing_days - first_day).astype(np.int64))
+    # tasks closed, and days with closed tasks (the throughput samples of the engines), before each day
+    done = np.concatenate([[0], np.cumsum(daily)])
+    known_days = np.concatenate([[0], np.cumsum(daily > 0)])
+    throughput_samples = daily[daily > 0]
+
+    origins = np.arange(min_history_days, len(daily), step_days)
+    # first throughput sample of the history known at each origin
+    window_starts = known_days[np.maximum(origins - window_days, 0)] if window_days else np.zeros_like(origins)
+    has_throughput = known_days[origins] > window_starts
+    origins, window_starts = origins[has_throughput], window_starts[has_throughput]
+    # the tasks done are only known when the horizon ends before the end of the history
+    has_horizon = origins + horizon_days <= len(daily)
+    is_censored = done[-1] - done[origins] < num_tasks
+    # first day with num_tasks tasks closed after each origin, or the day after the end of the history when they
+    # were not closed in it (the fewest days they can still need)
+    finish_days = np.searchsorted(done, done[origins] + num_tasks, side="left") - origins
+
+    seeds = np.random.SeedSequence(seed).generate_state(len(daily))
+    how_many_forecasts = []
+    when_finished_forecasts = []
+    progress(f"Backtesting {len(origins)} forecast origins with the {engine} engine.")
+    with span("backtest", origins=len(origins), engine=engine):
+        for index, origin in enumerate(origins):
+            options = {"seed": int(seeds[origin])} if engine == "monte_carlo" else {}
+            origin_engine = create_engine(engine, throughput_samples[window_starts[index]:known_days[origin]],
+                                          **options)
+            origin_date = (first_day + np.timedelta64(int(origin), "D")).astype(datetime.date)
+            if has_horizon[index]:
+                how_many_forecasts.append(BacktestForecast(
+                    origin=origin_date,
+                    percentiles=_tasks_done_percentiles(origin_engine, engine, horizon_days, num_simulations,
+                                                        forecast_levels),
+                    actual=int(done[origin + horizon_days] - done[origin])))
+            when_finished_forecasts.append(BacktestForecast(
+                origin=origin_date,
+                percentiles=_days_to_finish_percentiles(origin_engine, engine, num_tasks, num_simulations,
+                                                        forecast_levels),
+                actual=int(finish_days[index]),
+                censored=bool(is_censored[index])))
+
+    return BacktestResult(
+        engine=engine,
+        num_simulations=num_simulations,
+        horizon_days=horizon_days,
+        num_tasks=num_tasks,
+        # the tasks done are within a percentile when at least its tasks are done, and the days when they are not
+        # exceeded
+        how_many_done=_score(how_many_forecasts, levels, lambda actual, forecast: actual >= forecast),
+        when_will_be_finished=_score(when_finished_forecasts, levels, lambda actual, forecast: actual <= forecast),
+    )
+
+
+def _tasks_done_percentiles(engine, engine_type: str, num_days: int, num_simulations: int,
+                            levels: Sequence[int]) -> dict[int, float]:
+    if engine_type == "convolution":
+        return distribution_percentiles(engine.tasks_done_cdf(num_days), levels, inverted=True)
+    return percentiles(engine.tasks_done(num_days, num_simulations), levels, inverted=True)
+
+
+def _days_to_finish_percentiles(engine, engine_type: str, num_tasks: int, num_simulations: int,
+                                levels: Sequence[int]) -> dict[int, float]:
+    if engine_type == "convolution":
+        return distribution_percentiles(engine.days_to_finish_cdf(num_tasks), levels)
+    return percentiles(engine.days_to_finish(num_tasks, num_simulations), levels)
+
+
+def _score(forecasts: list[BacktestForecast], levels: Sequence[int], is_within) -> ForecastBacktest:
+    actual = np.array([forecast.actual for forecast in forecasts])
+    censored = np.array([forecast.censored for forecast in forecasts], dtype=bool)
+    coverage = {}
+    for level in levels:
+        forecast_values = np.array([forecast.percentiles[level] for forecast in forecasts])
+        # censored outcomes need at least their actual days, so they are only known to exceed the lower percentiles
+        is_known = ~censored | (forecast_values < actual)
+        coverage[level] = float(np.mean(is_within(actual[is_known], forecast_values[is_known]))) \
+            if is_known.any() else np.nan
+    if censored.all():
+        return ForecastBacktest(forecasts, coverage, None, None, int(censored.sum()))
+    error = np.array([forecast.percentiles[MEDIAN] for forecast in forecasts])[~censored] - actual[~censored]
+    return ForecastBacktest(forecasts, coverage, float(np.mean(np.abs(error))), float(np.mean(error)),
+                            int(censored.sum()))
@@ -0,0 +1,108 @@
+import numpy as np
+
+# probability of the simulations left out of the first passage distributions, that are computed day by day until
+# the probability of not having finished yet is below it
+DEFAULT_TAIL_PROBABILITY = 1e-9
+# below this length of the shortest array, the direct convolution is faster than the FFT one
+DIRECT_CONVOLUTION_SIZE = 64
+
+
+class ConvolutionEngine:
+    """
+    Exact alternative to the Monte Carlo engine: instead of sampling days of the throughput history, the
+    distribution of the tasks done in d days is the d-fold convolution of the distribution of the daily throughput,
+    computed with FFT convolutions by exponentiation by squaring. The finish days are the first passage of the
+    cumulative throughput over the number of tasks, computed day by day.
+    The distributions are returned as cumulative probabilities indexed by the number of tasks or days, see
+    dataset_statistics.distribution_percentiles.
+    Attributes
+    ----------
+        throughput_samples: np.ndarray
+            Number of tasks closed on each day of the history, each day being equally likely
+        pmf: np.ndarray
+            Probability of closing each number of tasks (from 0) in a day
+        tail_probability: float
+            Maximum probability of not having finished left out of the first passage distributions
+    """
+    throughput_samples: np.ndarray
+    pmf: np.ndarray
+    tail_probability: float
+
+    def __init__(self, throughput_samples, tail_probability: float = DEFAULT_TAIL_PROBABILITY):
+        self.throughput_samples = np.asarray(throughput_samples, dtype=np.int64)
+        if self.throughput_samples.size == 0:
+            raise ValueError("Cannot simulate without throughput history")
+        self.pmf = np.bincount(self.throughput_samples) / self.throughput_samples.size
+        self.tail_probability = tail_probability
+
+    def tasks_done_cdf(self, num_days: int) -> np.ndarray:
+        """
+        Distribution of the number of tasks done in the given number of days.
+        Returns the probability of having done at most n tasks at the position n.
+        """
+        distribution = np.ones(1)
+        power = self.pmf
+        num_days = max(num_days, 0)
+        # exponentiation by squaring: pmf^num_days from the binary digits of num_days
+        while num_days:
+            if num_days & 1:
+                distribution = _convolve(distribution, power)
+            num_days >>= 1
+            if num_days:
+                power = _convolve(power, power)
+        return _cumulative(distribution)
+
+    def tasks_done_curve_cdf(self, num_days: int) -> np.ndarray:
+        """
+        Distributions of the number of tasks done in every number of days from 1 to num_days.
+        Returns a (num_days x (num_days * max throughput + 1)) matrix, with the probability of having done at most n
+        tasks in d days at the position (d - 1, n).
+        """
+        num_days = max(num_days, 0)
+        cdf = np.ones((num_days, (len(self.pmf) - 1) * num_days + 1))
+        distribution = np.ones(1)
+        for day in range(num_days):
+            distribution = _convolve(distribution, self.pmf)
+            cdf[day, :len(distribution)] = _cumulative(distribution)
+        return cdf
+
+    def days_to_finish_cdf(self, num_tasks: int) -> np.ndarray:
+        """
+        Distribution of the number of days needed to finish the given number of tasks.
+        Returns the probability of having finished in at most d days at the position d.
+        """
+        return self.finish_days_curve_cdf(num_tasks)[:, -1] if num_tasks > 0 else np.ones(1)
+
+    def finish_days_curve_cdf(self, max_tasks: int) -> np.ndarray:
+        """
+        Distributions of the number of days needed to finish every number of tasks from 1 to max_tasks.
+        Returns a (days x max_tasks) matrix, with the probability of having finished n tasks in at most d days at
+        the position (d, n - 1). The days go on until max_tasks are finished with 1 - tail_probability.
+        """
+        if max_tasks > 0 and self.pmf[0] >= 1:
+            raise ValueError("Cannot finish any task with a throughput history without closed tasks")
+        # probability of each number of tasks done, among the ones below max_tasks: the cumulative throughput never
+        # decreases, so the probability above max_tasks is not needed to know when fewer tasks are finished
+        unfinished = np.zeros(max(max_tasks, 0))
+        unfinished[:1] = 1
+        # n tasks are finished in d days when at least n tasks are done on day d
+        rows = [1 - np.cumsum(unfinished)]
+        while max_tasks > 0 and 1 - rows[-1][-1] > self.tail_probability:
+            unfinished = _convolve(unfinished, self.pmf)[:max_tasks]
+            rows.append(1 - np.cumsum(unfinished))
+        return np.array(rows)
+
+
+def _convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if min(len(a), len(b)) < DIRECT_CONVOLUTION_SIZE:
+        return np.convolve(a, b)
+    size = len(a) + len(b) - 1
+    result = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)
+    # the FFT leaves rounding noise around 0 in the probabilities
+    return np.clip(result, 0, None)
+
+
+def _cumulative(distribution: np.ndarray) -> np.ndarray:
+    # normalized, so the rounding errors of the convolutions do not move the last probability away from 1
+    cdf = np.cumsum(distribution)
+    return cdf / cdf[-1]
@@ -0,0 +1,15 @@
+ENGINE_TYPES = [
+    "monte_carlo",
+    "convolution",
+]
+
+
+def create_engine(engine_type: str, throughput_samples, **kwargs):
+    if engine_type == "monte_carlo":
+        from development_analyzer.simulations.monte_carlo_engine import MonteCarloEngine
+        return MonteCarloEngine(throughput_samples, **kwargs)
+    elif engine_type == "convolution":
+        from development_analyzer.simulations.convolution_engine import ConvolutionEngine
+        return ConvolutionEngine(throughput_samples, **kwargs)
+    else:
+        raise ValueError(f"Invalid type: {engine_type}")
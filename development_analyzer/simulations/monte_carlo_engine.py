@@ -0,0 +1,332 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from statistics import NormalDist
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+# maximum number of cells of each simulation matrix (~32MB of int64), used to bound the memory of each chunk
+DEFAULT_MAX_MATRIX_SIZE = 4_000_000
+# simulations drawn from each independent random stream. The simulations are split in blocks of this size, so the
+# results for a seed do not depend on the number of workers that run the blocks
+SIMULATION_BLOCK_SIZE = 2000
+# simulations run between each check of the precision of the adaptive simulations
+DEFAULT_BATCH_SIZE = 1000
+# blocks each batch of the adaptive simulations is split in (with at most SIMULATION_BLOCK_SIZE simulations each), so
+# a batch can run in several workers. It does not depend on the number of workers, like the block size
+ADAPTIVE_BLOCKS_PER_BATCH = 8
+# confidence level of the intervals of the percentiles of the adaptive simulations
+DEFAULT_CONFIDENCE = 0.95
+
+ProgressCallback = Callable[[int, int], None]
+
+
+@dataclass
+class AdaptiveResult:
+    """
+    Result of the adaptive simulations
+    Attributes
+    ----------
+        samples: np.ndarray
+            Result of each simulation run, its length is the number of simulations used
+        precision: dict[float, float]
+            Half width of the confidence interval of each percentile, in the unit of the samples (days or tasks)
+        converged: bool
+            Whether all the percentiles are within the tolerance, False if the maximum number of simulations was run
+            before
+    """
+    samples: np.ndarray
+    precision: dict[float, float]
+    converged: bool
+
+
+class MonteCarloEngine:
+    """
+    Vectorized Monte Carlo engine that simulates the development by sampling days of the throughput history.
+    The simulations are split in blocks, each one drawn from its own random stream (spawned from the seed) as
+    (simulations x days) matrices, split in chunks to bound the memory used. The blocks can be run in a pool of
+    processes, and are merged in order, so a seed gives the same results with any number of workers.
+    Attributes
+    ----------
+        throughput_samples: np.ndarray
+            Number of tasks closed on each day of the history, each day being equally likely to be sampled
+        max_matrix_size: int
+            Maximum number of cells of each simulation matrix
+        progress_callback: Optional[Callable[[int, int], None]]
+            Called after each block with the number of simulations done and the total number of simulations
+        seed_sequence: np.random.SeedSequence
+            Root of the random streams of the blocks, from the seed (fresh entropy if no seed is given)
+        max_workers: int
+            Number of processes that run the blocks, 1 to run them in the current process
+    """
+    throughput_samples: np.ndarray
+    max_matrix_size: int
+    progress_callback: Optional[ProgressCallback]
+    seed_sequence: np.random.SeedSequence
+    max_workers: int
+
+    def __init__(self, throughput_samples, max_matrix_size: int = DEFAULT_MAX_MATRIX_SIZE,
+                 progress_callback: Optional[ProgressCallback] = None, seed: Optional[int] = None,
+                 max_workers: int = 1):
+        self.throughput_samples = np.asarray(throughput_samples, dtype=np.int64)
+        if self.throughput_samples.size == 0:
+            raise ValueError("Cannot simulate without throughput history")
+        self.max_matrix_size = max_matrix_size
+        self.progress_callback = progress_callback
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.max_workers = max_workers
+
+    def days_to_finish(self, num_tasks: int, num_simulations: int) -> np.ndarray:
+        """
+        Simulates the number of days needed to finish the given number of tasks.
+        Returns an array with the number of days of each simulation.
+        """
+        return self._days_to_finish(num_tasks, num_simulations, self.progress_callback)
+
+    def tasks_done(self, num_days: int, num_simulations: int) -> np.ndarray:
+        """
+        Simulates the number of tasks done in the given number of days.
+        Returns an array with the number of tasks done of each simulation.
+        """
+        return self._tasks_done(num_days, num_simulations, self.progress_callback)
+
+    def finish_days_curve(self, max_tasks: int, num_simulations: int) -> np.ndarray:
+        """
+        Simulates the number of days needed to finish every number of tasks from 1 to max_tasks, reading all of them
+        from the same simulated cumulative throughput paths.
+        Returns a (num_simulations x max_tasks) matrix, with the days to finish n tasks of each simulation in the
+        column n - 1.
+        """
+        if max_tasks > 0 and self.throughput_samples.max() <= 0:
+            raise ValueError("Cannot finish any task with a throughput history without closed tasks")
+        return self._run_blocks("_finish_days_curve_block", max_tasks, num_simulations, self.progress_callback)
+
+    def tasks_done_curve(self, num_days: int, num_simulations: int) -> np.ndarray:
+        """
+        Simulates the number of tasks done in every number of days from 1 to num_days.
+        Returns a (num_simulations x num_days) matrix, with the tasks done in d days of each simulation in the
+        column d - 1.
+        """
+        return self._run_blocks("_tasks_done_curve_block", num_days, num_simulations, self.progress_callback)
+
+    def days_to_finish_adaptive(self, num_tasks: int, levels: Sequence[float], tolerance: float,
+                                max_simulations: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                                confidence: float = DEFAULT_CONFIDENCE) -> AdaptiveResult:
+        """
+        Simulates the number of days needed to finish the given number of tasks in batches, until the confidence
+        intervals of the percentiles at the given levels are narrower than the tolerance in days (see _run_adaptive)
+        """
+        return self._run_adaptive(lambda size, block_size, executor:
+                                  self._days_to_finish(num_tasks, size, None, executor, block_size),
+                                  levels, tolerance, max_simulations, batch_size, confidence)
+
+    def tasks_done_adaptive(self, num_days: int, levels: Sequence[float], tolerance: float,
+                            max_simulations: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                            confidence: float = DEFAULT_CONFIDENCE) -> AdaptiveResult:
+        """
+        Simulates the number of tasks done in the given number of days in batches, until the confidence intervals of
+        the percentiles at the given levels are narrower than the tolerance in tasks (see _run_adaptive)
+        """
+        return self._run_adaptive(lambda size, block_size, executor:
+                                  self._tasks_done(num_days, size, None, executor, block_size),
+                                  levels, tolerance, max_simulations, batch_size, confidence)
+
+    def _days_to_finish(self, num_tasks: int, num_simulations: int, progress_callback: Optional[ProgressCallback],
+                        executor: Optional[ProcessPoolExecutor] = None,
+                        block_size: int = SIMULATION_BLOCK_SIZE) -> np.ndarray:
+        if num_tasks > 0 and self.throughput_samples.max() <= 0:
+            raise ValueError("Cannot finish any task with a throughput history without closed tasks")
+        return self._run_blocks("_days_to_finish_block", num_tasks, num_simulations, progress_callback, executor,
+                                block_size)
+
+    def _tasks_done(self, num_days: int, num_simulations: int, progress_callback: Optional[ProgressCallback],
+                    executor: Optional[ProcessPoolExecutor] = None,
+                    block_size: int = SIMULATION_BLOCK_SIZE) -> np.ndarray:
+        return self._run_blocks("_tasks_done_block", num_days, num_simulations, progress_callback, executor,
+                                block_size)
+
+    def _run_blocks(self, simulation: str, argument: int, num_simulations: int,
+                    progress_callback: Optional[ProgressCallback],
+                    executor: Optional[ProcessPoolExecutor] = None,
+                    block_size: int = SIMULATION_BLOCK_SIZE) -> np.ndarray:
+        """
+        Runs the simulation method over blocks of block_size simulations, each one with the next random stream spawned
+        from the seed, and concatenates their results in order. The blocks run in the given pool of processes, or in a
+        new one for this call if max_workers allows it
+        """
+        sizes = [min(block_size, num_simulations - start) for start in range(0, num_simulations, block_size)]
+        if not sizes:
+            return np.zeros(0, dtype=np.int64)
+        seeds = self.seed_sequence.spawn(len(sizes))
+        arguments = (repeat(self.throughput_samples), repeat(self.max_matrix_size), repeat(simulation),
+                     repeat(argument), sizes, seeds)
+
+        own_executor = executor is None
+        if own_executor:
+            executor = self._create_executor(len(sizes))
+        results = []
+        try:
+            blocks = executor.map(_simulate_block, *arguments) if executor else map(_simulate_block, *arguments)
+            for block in blocks:
+                results.append(block)
+                if progress_callback:
+                    progress_callback(sum(len(result) for result in results), num_simulations)
+        finally:
+            if own_executor and executor:
+                executor.shutdown()
+        return np.concatenate(results)
+
+    def _create_executor(self, num_blocks: int) -> Optional[ProcessPoolExecutor]:
+        """
+        Pool of processes to run the given number of blocks, None to run them in the current process
+        """
+        if self.max_workers <= 1 or num_blocks <= 1:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=min(self.max_workers, num_blocks))
+        except (OSError, NotImplementedError):
+            # environments without shared memory (e.g. AWS Lambda) do not support process pools
+            return None
+
+    def _days_to_finish_block(self, num_tasks: int, num_simulations: int, rng: np.random.Generator) -> np.ndarray:
+        days = np.zeros(num_simulations, dtype=np.int64)
+        if num_tasks <= 0:
+            return days
+
+        # initial guess of the days needed, simulations that do not finish in it are extended afterwards
+        horizon = max(1, math.ceil(1.5 * num_tasks / self.throughput_samples.mean()))
+        for start, stop in self._chunks(num_simulations, horizon):
+            pending = np.arange(start, stop)
+            remaining_tasks = np.full(stop - start, num_tasks, dtype=np.int64)
+            elapsed_days = 0
+            while pending.size > 0:
+                throughput = self._draw(rng, pending.size, horizon)
+                np.cumsum(throughput, axis=1, out=throughput)
+                finished = throughput[:, -1] >= remaining_tasks
+                # first day where the cumulative throughput reaches the remaining tasks:
+                finish_day = np.argmax(throughput[finished] >= remaining_tasks[finished, None], axis=1) + 1
+                days[pending[finished]] = elapsed_days + finish_day
+
+                remaining_tasks = remaining_tasks[~finished] - throughput[~finished, -1]
+                pending = pending[~finished]
+                elapsed_days += horizon
+        return days
+
+    def _tasks_done_block(self, num_days: int, num_simulations: int, rng: np.random.Generator) -> np.ndarray:
+        tasks = np.zeros(num_simulations, dtype=np.int64)
+        if num_days <= 0:
+            return tasks
+        for start, stop in self._chunks(num_simulations, num_days):
+            tasks[start:stop] = self._draw(rng, stop - start, num_days).sum(axis=1)
+        return tasks
+
+    def _finish_days_curve_block(self, max_tasks: int, num_simulations: int,
+                                 rng: np.random.Generator) -> np.ndarray:
+        days = np.zeros((num_simulations, max(max_tasks, 0)), dtype=np.int64)
+        if max_tasks <= 0:
+            return days
+        num_tasks = np.arange(1, max_tasks + 1)
+        horizon = max(1, math.ceil(1.5 * max_tasks / self.throughput_samples.mean()))
+        for start, stop in self._chunks(num_simulations, max(horizon, max_tasks)):
+            paths = self._draw(rng, stop - start, horizon)
+            np.cumsum(paths, axis=1, out=paths)
+            # the paths are extended until all of them finish the largest number of tasks
+            while paths[:, -1].min() < max_tasks:
+                extension = self._draw(rng, stop - start, horizon)
+                np.cumsum(extension, axis=1, out=extension)
+                paths = np.hstack([paths, extension + paths[:, -1:]])
+            # days to finish n tasks: the days with less than n tasks done, plus the day that reaches n
+            days[start:stop] = _count_below(paths, num_tasks) + 1
+        return days
+
+    def _tasks_done_curve_block(self, num_days: int, num_simulations: int, rng: np.random.Generator) -> np.ndarray:
+        tasks = np.zeros((num_simulations, max(num_days, 0)), dtype=np.int64)
+        if num_days <= 0:
+            return tasks
+        for start, stop in self._chunks(num_simulations, num_days):
+            tasks[start:stop] = np.cumsum(self._draw(rng, stop - start, num_days), axis=1)
+        return tasks
+
+    def _run_adaptive(self, simulate: Callable[[int, int, Optional[ProcessPoolExecutor]], np.ndarray],
+                      levels: Sequence[float], tolerance: float, max_simulations: int, batch_size: int,
+                      confidence: float) -> AdaptiveResult:
+        """
+        Runs the simulations in batches until the confidence interval of each percentile is at most twice the
+        tolerance wide, or max_simulations are run. Each batch is split in ADAPTIVE_BLOCKS_PER_BATCH blocks, and all
+        the batches run in the same pool of processes.
+        The intervals are distribution free: for n samples, the percentile at level q lies between the order
+        statistics of ranks n*q -/+ z*sqrt(n*q*(1-q)) with the given confidence (normal approximation of the binomial
+        number of samples below it).
+        """
+        if max_simulations < 1:
+            raise ValueError(f"The maximum number of simulations must be positive, got {max_simulations}")
+        if batch_size < 1:
+            raise ValueError(f"The batch size must be positive, got {batch_size}")
+        if tolerance < 0:
+            raise ValueError(f"The tolerance must not be negative, got {tolerance}")
+        if not 0 < confidence < 1:
+            raise ValueError(f"The confidence must be between 0 and 1, got {confidence}")
+        if not levels:
+            raise ValueError("At least one percentile level is needed to check the precision")
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        batches = []
+        num_done = 0
+        block_size = min(SIMULATION_BLOCK_SIZE, math.ceil(batch_size / ADAPTIVE_BLOCKS_PER_BATCH))
+        executor = self._create_executor(math.ceil(min(batch_size, max_simulations) / block_size))
+        try:
+            while True:
+                size = min(batch_size, max_simulations - num_done)
+                batches.append(simulate(size, block_size, executor))
+                num_done += size
+                samples = np.concatenate(batches)
+                precision = _percentile_precision(np.sort(samples), levels, z)
+                converged = max(precision.values()) <= tolerance
+                if self.progress_callback:
+                    self.progress_callback(num_done, max_simulations)
+                if converged or num_done >= max_simulations:
+                    return AdaptiveResult(samples, precision, converged)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def _draw(self, rng: np.random.Generator, num_simulations: int, num_days: int) -> np.ndarray:
+        return rng.choice(self.throughput_samples, size=(num_simulations, num_days))
+
+    def _chunks(self, num_simulations: int, num_days: int):
+        chunk_size = max(1, self.max_matrix_size // num_days)
+        for start in range(0, num_simulations, chunk_size):
+            yield start, min(start + chunk_size, num_simulations)
+
+
+def _simulate_block(throughput_samples: np.ndarray, max_matrix_size: int, simulation: str, argument: int,
+                    num_simulations: int, seed: np.random.SeedSequence) -> np.ndarray:
+    # module level, so it can be run in the worker processes
+    engine = MonteCarloEngine(throughput_samples, max_matrix_size)
+    return getattr(engine, simulation)(argument, num_simulations, np.random.default_rng(seed))
+
+
+def _count_below(paths: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Number of elements of each row of paths (non decreasing rows) below each of the values, as a
+    (rows x values) matrix. The rows are offset so they are sorted as a whole, and searched at once.
+    """
+    num_rows, num_columns = paths.shape
+    rows = np.arange(num_rows, dtype=np.int64)[:, None]
+    offsets = rows * (max(int(paths.max()), int(values.max())) + 1)
+    positions = np.searchsorted((paths + offsets).ravel(), (values[None, :] + offsets).ravel(), side="left")
+    return positions.reshape(num_rows, len(values)) - rows * num_columns
+
+
+def _percentile_precision(sorted_samples: np.ndarray, levels: Sequence[float], z: float) -> dict[float, float]:
+    # half width of the order statistics interval of each percentile
+    n = len(sorted_samples)
+    precision = {}
+    for level in levels:
+        q = level / 100
+        spread = z * math.sqrt(n * q * (1 - q))
+        lower = sorted_samples[max(0, math.floor(n * q - spread))]
+        upper = sorted_samples[min(n - 1, math.ceil(n * q + spread))]
+        precision[level] = float(upper - lower) / 2
+    return precision
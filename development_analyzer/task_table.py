@@ -0,0 +1,272 @@
+import datetime
+import hashlib
+from typing import Iterator, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from development_analyzer.task import Task
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DATETIME_DTYPE = "datetime64[us]"
+MISSING_CODE = -1
+COLUMN_NAMES = ["type_codes", "status_codes", "created_at", "started_at", "closed_at", "estimation", "description",
+                "cycle_time"]
+
+
+class _Column:
+    """
+    Column of a TaskTable, gathered from the base columns through the index of the table (if it is a view)
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, table, owner=None):
+        if table is None:
+            return self
+        return table.column(self.name)
+
+
+class TaskTable:
+    """
+    Columnar store of the tasks of a dataset.
+    Dates are stored as datetime64 columns (NaT when missing), type and status as categorical codes (-1 when missing)
+    and estimations as floats (NaN when missing). Task objects are only built on demand when iterating the table.
+    Selecting tasks returns a view that shares the base columns, keeping only an array of indices over them,
+    so views can be stacked without copying the dataset.
+    Attributes
+    ----------
+        type_codes: np.ndarray
+            Code of the type of each task in type_categories
+        type_categories: np.ndarray
+            Distinct types of the tasks
+        status_codes: np.ndarray
+            Code of the status of each task in status_categories
+        status_categories: np.ndarray
+            Distinct statuses of the tasks
+        created_at: np.ndarray
+        started_at: np.ndarray
+        closed_at: np.ndarray
+        estimation: np.ndarray
+        description: np.ndarray
+        cycle_time: np.ndarray
+            Cycle time in days of each task, 0 when it can not be calculated (see has_cycle_time)
+        index: Optional[np.ndarray]
+            Indices of the tasks of the view in the base columns, None if the table is not a view
+    """
+    type_codes = _Column()
+    status_codes = _Column()
+    created_at = _Column()
+    started_at = _Column()
+    closed_at = _Column()
+    estimation = _Column()
+    description = _Column()
+    cycle_time = _Column()
+    type_categories: np.ndarray
+    status_categories: np.ndarray
+    index: Optional[np.ndarray]
+
+    def __init__(self, columns: dict[str, np.ndarray], type_categories: np.ndarray, status_categories: np.ndarray,
+                 index: Optional[np.ndarray] = None):
+        self._columns = columns
+        self._view_columns = {}
+        self.type_categories = type_categories
+        self.status_categories = status_categories
+        self.index = index
+        if "cycle_time" not in self._columns:
+            self._columns["cycle_time"] = self._calculate_cycle_time()
+
+    @classmethod
+    def from_columns(cls, type, status, created_at, started_at, closed_at, estimation, description) -> "TaskTable":
+        type_codes, type_categories = _encode_categories(type)
+        status_codes, status_categories = _encode_categories(status)
+        columns = {
+            "type_codes": type_codes,
+            "status_codes": status_codes,
+            "created_at": np.asarray(created_at, dtype=DATETIME_DTYPE),
+            "started_at": np.asarray(started_at, dtype=DATETIME_DTYPE),
+            "closed_at": np.asarray(closed_at, dtype=DATETIME_DTYPE),
+            "estimation": np.asarray(estimation, dtype=np.float64),
+            "description": np.asarray(description, dtype=object),
+        }
+        return cls(columns, type_categories, status_categories)
+
+    @classmethod
+    def empty(cls) -> "TaskTable":
+        columns = {
+            "type_codes": np.empty(0, dtype=np.int32),
+            "status_codes": np.empty(0, dtype=np.int32),
+            "created_at": np.empty(0, dtype=DATETIME_DTYPE),
+            "started_at": np.empty(0, dtype=DATETIME_DTYPE),
+            "closed_at": np.empty(0, dtype=DATETIME_DTYPE),
+            "estimation": np.empty(0, dtype=np.float64),
+            "description": np.empty(0, dtype=object),
+        }
+        return cls(columns, np.empty(0, dtype=object), np.empty(0, dtype=object))
+
+    @classmethod
+    def concatenate(cls, tables: list["TaskTable"]) -> "TaskTable":
+        """
+        Returns a table with the tasks of all the given tables, merging their categories
+        """
+        if not tables:
+            return cls.empty()
+        type_codes, type_categories = _merge_categories([table.type_codes for table in tables],
+                                                        [table.type_categories for table in tables])
+        status_codes, status_categories = _merge_categories([table.status_codes for table in tables],
+                                                            [table.status_categories for table in tables])
+        columns = {name: np.concatenate([table.column(name) for table in tables]) for name in COLUMN_NAMES
+                   if name not in ["type_codes", "status_codes"]}
+        columns["type_codes"] = type_codes
+        columns["status_codes"] = status_codes
+        return cls(columns, type_categories, status_categories)
+
+    def column(self, name: str) -> np.ndarray:
+        if self.index is None:
+            return self._columns[name]
+        if name not in self._view_columns:
+            self._view_columns[name] = self._columns[name][self.index]
+        return self._view_columns[name]
+
+    def select(self, selection: np.ndarray) -> "TaskTable":
+        """
+        Returns a view with the tasks selected by a boolean mask or an array of indices over this table.
+        The base columns are shared with this table and are not copied.
+        """
+        selection = np.asarray(selection)
+        if selection.dtype == bool:
+            selection = np.flatnonzero(selection)
+        index = selection if self.index is None else self.index[selection]
+        return TaskTable(self._columns, self.type_categories, self.status_categories, index=index)
+
+    def compact(self) -> "TaskTable":
+        """
+        Returns a table that only holds the columns of the tasks of this table, without the rest of the base columns
+        of the view
+        """
+        columns = {name: self.column(name) for name in COLUMN_NAMES}
+        return TaskTable(columns, self.type_categories, self.status_categories)
+
+    @property
+    def type(self) -> np.ndarray:
+        return _decode_categories(self.type_codes, self.type_categories)
+
+    @property
+    def status(self) -> np.ndarray:
+        return _decode_categories(self.status_codes, self.status_categories)
+
+    @property
+    def has_cycle_time(self) -> np.ndarray:
+        return ~np.isnat(self.closed_at) & ~np.isnat(self._cycle_start)
+
+    @property
+    def has_estimation(self) -> np.ndarray:
+        # same as the truthiness of the estimation of a task: missing and 0 estimations are not valid
+        return ~np.isnan(self.estimation) & (self.estimation != 0)
+
+    def throughput_per_day(self) -> np.ndarray:
+        """
+        Returns the number of tasks closed on each day that had at least one task closed
+        """
+        closing_days = self.closed_at[~np.isnat(self.closed_at)].astype("datetime64[D]")
+        _, throughput = np.unique(closing_days, return_counts=True)
+        return throughput
+
+    def full_labels(self) -> list[str]:
+        """
+        Returns the full label of each task (see Task.full_label), without building the Task objects
+        """
+        return [f"{description} ({int(estimation)} points)" if has_estimation else f"{description}"
+                for description, estimation, has_estimation in
+                zip(self.description, self.estimation, self.has_estimation)]
+
+    def content_hash(self) -> str:
+        """
+        Returns a hash of the content of the tasks of the table
+        """
+        digest = hashlib.sha256()
+        for name in COLUMN_NAMES:
+            if name != "description":
+                digest.update(np.ascontiguousarray(self.column(name)).tobytes())
+        for values in [self.type_categories, self.status_categories, self.description]:
+            # unit separator between the values, so the boundaries of each value are part of the hash
+            digest.update("\x1f".join("\x00" if value is None else str(value) for value in values).encode())
+            digest.update(b"\x1e")
+        return digest.hexdigest()
+
+    def task(self, index: int) -> Task:
+        estimation = self.estimation[index]
+        return Task(
+            type=_decode_category(self.type_codes[index], self.type_categories),
+            status=_decode_category(self.status_codes[index], self.status_categories),
+            created_at=_to_datetime(self.created_at[index]),
+            closed_at=_to_datetime(self.closed_at[index]),
+            started_at=_to_datetime(self.started_at[index]),
+            estimation=None if np.isnan(estimation) else int(estimation),
+            description=self.description[index],
+        )
+
+    def to_dataframe(self) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.DataFrame({
+            "type": self.type,
+            "status": self.status,
+            "created_at": self.created_at,
+            "closed_at": self.closed_at,
+            "started_at": self.started_at,
+            "estimation": self.estimation,
+            "description": self.description,
+        })
+
+    def __len__(self) -> int:
+        return len(self._columns["created_at"]) if self.index is None else len(self.index)
+
+    def __iter__(self) -> Iterator[Task]:
+        for index in range(len(self)):
+            yield self.task(index)
+
+    @property
+    def _cycle_start(self) -> np.ndarray:
+        # not ideal, but we need to handle the case where the task does not have a started_at date
+        return np.where(np.isnat(self.started_at), self.created_at, self.started_at)
+
+    def _calculate_cycle_time(self) -> np.ndarray:
+        valid = self.has_cycle_time
+        cycle_time = np.zeros(len(self), dtype=np.int64)
+        # floor division keeps the same semantics as timedelta.days
+        cycle_time[valid] = (self.closed_at[valid] - self._cycle_start[valid]) // np.timedelta64(1, "D") + 1
+        return cycle_time
+
+
+def _encode_categories(values) -> tuple[np.ndarray, np.ndarray]:
+    import pandas as pd
+    codes, categories = pd.factorize(np.asarray(values, dtype=object))
+    return codes.astype(np.int32), np.asarray(categories, dtype=object)
+
+
+def _merge_categories(codes: list[np.ndarray], categories: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    merged_categories = {}
+    merged_codes = []
+    for table_codes, table_categories in zip(codes, categories):
+        mapping = [merged_categories.setdefault(category, len(merged_categories)) for category in table_categories]
+        # the missing code (-1) indexes the last element of the mapping, that keeps it missing
+        mapping = np.array(mapping + [MISSING_CODE], dtype=np.int32)
+        merged_codes.append(mapping[table_codes])
+    return np.concatenate(merged_codes), np.asarray(list(merged_categories), dtype=object)
+
+
+def _decode_categories(codes: np.ndarray, categories: np.ndarray) -> np.ndarray:
+    values = np.empty(len(codes), dtype=object)
+    present = codes != MISSING_CODE
+    values[present] = categories[codes[present]]
+    return values
+
+
+def _decode_category(code: int, categories: np.ndarray) -> Optional[str]:
+    return None if code == MISSING_CODE else categories[code]
+
+
+def _to_datetime(value: np.datetime64) -> Optional[datetime.datetime]:
+    return None if np.isnat(value) else value.astype(datetime.datetime)
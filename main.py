@@ -1,11 +1,20 @@
 import argparse
 import datetime
+import json
+import sys
 
-from development_analyzer import DevelopmentAnalyzer
+from development_analyzer import DevelopmentAnalyzer, compute_metrics
 from development_analyzer.datasources.datasource_factory import create_datasource
+from development_analyzer.instrumentation import (
+    add_sink, print_progress, remove_progress_callback, span, JsonLinesSink, StdoutSink,
+)
 from development_analyzer.project_schemas.project_schema_factory import (
     create_project_schema,
 )
+from development_analyzer.reports.report import metrics_to_dict
+from development_analyzer.reports.report_store import LocalReportStore
+from development_analyzer.simulations.backtesting import backtest
+from development_analyzer.simulations.engine_factory import ENGINE_TYPES
 
 if __name__ == "__main__":
     # read params from command line
@@ -28,6 +37,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Regenerate the dataset from the external source",
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Incrementally sync the dataset with the changes of the external source since the previous sync",
+    )
     parser.add_argument(
         "--max_cycle_time",
         type=int,
@@ -52,13 +66,86 @@ if __name__ == "__main__":
         action="store_true",
         help="Filter out tasks that do not have an estimation",
     )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the wall time, CPU time and peak memory of each stage",
+    )
+    parser.add_argument(
+        "--trace_file",
+        type=str,
+        default=None,
+        help="JSON lines file where the timings of each stage are appended",
+    )
+    parser.add_argument(
+        "--report_cache",
+        type=str,
+        default=None,
+        help="Folder where the reports are stored, to reuse them while their data, options and code do not change",
+    )
+    parser.add_argument(
+        "--mc_tolerance",
+        type=float,
+        default=None,
+        help="Run the Monte Carlo simulations in batches until their percentiles are stable within this number of "
+        "days (finish date) or tasks (tasks done), up to the usual number of simulations",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the Monte Carlo simulations, to reproduce them",
+    )
+    parser.add_argument(
+        "--mc_workers",
+        type=int,
+        default=1,
+        help="Number of processes that run the Monte Carlo simulations",
+    )
+    parser.add_argument(
+        "--forecast_curve",
+        action="store_true",
+        help="Forecast the finish date of every number of tasks up to 100, and the tasks done by every day of the "
+        "next 30 days, from one pass of the Monte Carlo simulations",
+    )
+    parser.add_argument(
+        "--forecast_engine",
+        type=str,
+        choices=ENGINE_TYPES,
+        default="monte_carlo",
+        help="Engine of the forecasts: monte_carlo simulations, or the exact distributions computed by convolution",
+    )
+    parser.add_argument(
+        "--metrics_only",
+        "--metrics-only",
+        action="store_true",
+        help="Print the metrics of the reports as JSON instead of plotting them",
+    )
+    parser.add_argument(
+        "--backtest",
+        action="store_true",
+        help="Print as JSON how calibrated the forecasts of the tasks done in 30 days and the finish date of 100 tasks "
+        "have been, made every week of the history with the tasks closed until then",
+    )
     args = parser.parse_args()
 
+    if args.metrics_only or args.backtest:
+        # stdout only holds the JSON
+        remove_progress_callback(print_progress)
+    if args.timings:
+        add_sink(StdoutSink())
+    if args.trace_file:
+        add_sink(JsonLinesSink(args.trace_file))
+
     project_schema = create_project_schema(args.project)
 
     datasource = create_datasource(source=args.source, schema=project_schema)
     if args.regenerate:
-        datasource.import_dataset(args.dataset)
+        with span("import_dataset", source=args.source):
+            datasource.import_dataset(args.dataset)
+    elif args.sync:
+        with span("sync_dataset", source=args.source):
+            datasource.sync_dataset(args.dataset)
 
     datasource.load_dataset(args.dataset)
 
@@ -85,10 +172,29 @@ if __name__ == "__main__":
         valid_types=None,
     )
 
-    analyzer = DevelopmentAnalyzer(datasource)
+    if args.backtest:
+        result = backtest(datasource, engine=args.forecast_engine, seed=args.seed)
+        json.dump(metrics_to_dict(result), sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        sys.exit(0)
+
+    if args.metrics_only:
+        reports = DevelopmentAnalyzer.default_reports(args.mc_tolerance, args.seed, args.mc_workers,
+                                                      args.forecast_curve, args.forecast_engine)
+        metrics = compute_metrics(datasource, reports)
+        json.dump(metrics, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        sys.exit(0)
+
+    report_store = LocalReportStore(args.report_cache) if args.report_cache else None
+    analyzer = DevelopmentAnalyzer(datasource, report_store=report_store)
     analyzer.plot_scatter(show_labels=False)
     analyzer.plot_histogram()
     analyzer.plot_cycle_time_estimation_relationship()
-    analyzer.plot_monte_carlo_when_will_be_finished(num_tasks=100)
-    analyzer.plot_monte_carlo_how_many_done(next_x_days=30)
+    analyzer.plot_monte_carlo_when_will_be_finished(num_tasks=100, tolerance=args.mc_tolerance, seed=args.seed,
+                                                    max_workers=args.mc_workers, curve=args.forecast_curve,
+                                                    engine=args.forecast_engine)
+    analyzer.plot_monte_carlo_how_many_done(next_x_days=30, tolerance=args.mc_tolerance, seed=args.seed,
+                                            max_workers=args.mc_workers, curve=args.forecast_curve,
+                                            engine=args.forecast_engine)
     analyzer.plot_cumulative_flow_diagram()
@@ -1,6 +1,8 @@
 import json
 
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -14,10 +16,13 @@ if os.environ.get("AWS_EXECUTION_ENV") is not None:
 
 from development_analyzer import DevelopmentAnalyzer
 from development_analyzer.datasources.datasource_factory import create_datasource
+from development_analyzer.instrumentation import add_sink, span, StdoutSink
 from development_analyzer.project_schemas.project_schema_factory import (
     create_project_schema,
 )
+from development_analyzer.reports.report_store import ReportStore
 import boto3
+from botocore.exceptions import ClientError
 
 if os.environ.get("AWS_EXECUTION_ENV") is None:  # testing
     # open .env_full.json
@@ -26,6 +31,38 @@ if os.environ.get("AWS_EXECUTION_ENV") is None:  # testing
         os.environ["PROJECTS"] = json.dumps(data["projects"])
         os.environ["SENDER_EMAIL"] = data["sender_email"]
 
+DEFAULT_MAX_CONCURRENT_PROJECTS = 4
+_render_lock = threading.Lock()
+# timings of each stage are printed to the CloudWatch logs
+add_sink(StdoutSink())
+
+
+class S3ReportStore(ReportStore):
+    """
+    Report store in the S3 bucket, so quiet projects reuse the reports of previous runs.
+    It uses the s3 client of the project it stores the reports of
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str = "report_cache"):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def fetch(self, key: str, file_names: list[str], folder: str) -> bool:
+        try:
+            for file_name in file_names:
+                self.s3_client.head_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}/{file_name}")
+        except ClientError:
+            return False
+        for file_name in file_names:
+            self.s3_client.download_file(self.bucket, f"{self.prefix}/{key}/{file_name}", f"{folder}/{file_name}")
+        return True
+
+    def put(self, key: str, file_paths: list[str]):
+        for file_path in file_paths:
+            self.s3_client.upload_file(file_path, self.bucket,
+                                       f"{self.prefix}/{key}/{os.path.basename(file_path)}")
+
 
 def handler(event, context):
     # TODO: use events to run specific plots
@@ -37,28 +74,52 @@ def handler(event, context):
             project["email_list"] = override_email_list
         print(f"Email list overridden to {override_email_list}")
 
-    for project in projects:
-        os.environ["AIRTABLE_API_KEY"] = project["AIRTABLE_API_KEY"]
-        os.environ["AIRTABLE_BASE"] = project["AIRTABLE_BASE"]
-        os.environ["AIRTABLE_TABLE"] = project["AIRTABLE_TABLE"]
+    # projects are independent (each one has its own credentials and dataset file), so they are processed
+    # concurrently: most of the time is spent waiting for Airtable, SES and S3
+    max_workers = int(os.environ.get("MAX_CONCURRENT_PROJECTS", DEFAULT_MAX_CONCURRENT_PROJECTS))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(projects)))) as executor:
+        list(executor.map(_process_project, projects))
+
+
+def _process_project(project: dict):
+    # the default boto3 session is not thread-safe, so each project creates its clients from its own session
+    session = boto3.session.Session()
+    s3_client = session.client("s3")
+    ses_client = session.client("ses", region_name=os.environ["AWS_REGION"])
+    with span("project", project=project["name"]):
         try:
+            if project.get("sync"):
+                with span("restore_dataset", project=project["name"]):
+                    _restore_dataset(s3_client, project)
             files = _scan_project(
                 project=project["name"],
                 source=project["source"],
                 dataset_file=project["dataset"],
                 regenerate=project["regenerate"],
+                sync=project.get("sync", False),
                 max_cycle_time=project["max_cycle_time"],
                 created_last=project["created_last"],
                 closed_last=project["closed_last"],
                 need_estimate=project["need_estimate"],
+                credentials={
+                    "api_key": project["AIRTABLE_API_KEY"],
+                    "base": project["AIRTABLE_BASE"],
+                    "table": project["AIRTABLE_TABLE"],
+                },
+                report_store=S3ReportStore(s3_client, os.environ["S3_BUCKET"]),
             )
         except Exception as e:
             print(f'Error processing project {project["name"]}: {str(e)}')
-            _send_error_email(e)
-            continue
+            _send_error_email(ses_client, e)
+            return
+        if project.get("sync"):
+            with span("store_dataset", project=project["name"]):
+                _store_dataset(s3_client, project)
         # send SES email with the reports
-        _send_email(project, files)
-        _store_reports(project, files)
+        with span("send_email", project=project["name"]):
+            _send_email(ses_client, project, files)
+        with span("store_reports", project=project["name"]):
+            _store_reports(s3_client, project, files)
 
 
 def _scan_project(
@@ -66,17 +127,24 @@ def _scan_project(
     source,
     dataset_file,
     regenerate,
+    sync,
     max_cycle_time,
     created_last,
     closed_last,
     need_estimate,
+    credentials,
+    report_store: ReportStore,
 ):
     dataset_file = f"/tmp/{dataset_file}"
     project_schema = create_project_schema(project)
 
-    datasource = create_datasource(source=source, schema=project_schema)
+    datasource = create_datasource(source=source, schema=project_schema, **credentials)
     if regenerate:
-        datasource.import_dataset(dataset_file)
+        with span("import_dataset", project=project):
+            datasource.import_dataset(dataset_file)
+    elif sync:
+        with span("sync_dataset", project=project):
+            datasource.sync_dataset(dataset_file)
 
     datasource.load_dataset(dataset_file)
 
@@ -103,20 +171,20 @@ def _scan_project(
         valid_types=None,
     )
 
-    analyzer = DevelopmentAnalyzer(datasource)
-    reports = [
-        analyzer.plot_scatter(show_labels=False, highlight_last_days=7),
-        analyzer.plot_histogram(),
-        analyzer.plot_cumulative_flow_diagram(),
-    ]
+    analyzer = DevelopmentAnalyzer(datasource, report_store=report_store)
+    # pyplot keeps global state and is not thread-safe, so the projects take turns to render
+    with _render_lock:
+        reports = [
+            analyzer.plot_scatter(show_labels=False, highlight_last_days=7),
+            analyzer.plot_histogram(),
+            analyzer.plot_cumulative_flow_diagram(),
+        ]
 
     # return report names:
     return reports
 
 
-def _send_email(project: dict, report_paths: list[str]):
-    ses_client = boto3.client("ses", region_name=os.environ["AWS_REGION"])
-
+def _send_email(ses_client, project: dict, report_paths: list[str]):
     msg = MIMEMultipart()
     msg["Subject"] = f'Weekly report for {project["name"]}'
     # Add a text message to the email
@@ -148,9 +216,7 @@ def _send_email(project: dict, report_paths: list[str]):
         print("Email sending failed:", str(e))
 
 
-def _send_error_email(exception: Exception):
-    ses_client = boto3.client("ses", region_name=os.environ["AWS_REGION"])
-
+def _send_error_email(ses_client, exception: Exception):
     msg = MIMEMultipart()
     msg["Subject"] = f"Error processing weekly reports"
     # Add a text message to the email
@@ -174,8 +240,29 @@ def _send_error_email(exception: Exception):
         print("Email sending failed:", str(e))
 
 
-def _store_reports(project: dict, report_paths: list[str]):
-    s3_client = boto3.client("s3")
+def _dataset_files(project: dict) -> list[str]:
+    # the dataset and the watermark of its last sync
+    return [project["dataset"], f'{project["dataset"]}.sync.json']
+
+
+def _restore_dataset(s3_client, project: dict):
+    # lambda storage does not persist between runs, so the synced dataset is kept in s3
+    s3_bucket = os.environ["S3_BUCKET"]
+    for file_name in _dataset_files(project):
+        try:
+            s3_client.download_file(s3_bucket, f"datasets/{file_name}", f"/tmp/{file_name}")
+        except ClientError as e:
+            print(f"Dataset file {file_name} not found in s3, it will be fully imported: {str(e)}")
+
+
+def _store_dataset(s3_client, project: dict):
+    s3_bucket = os.environ["S3_BUCKET"]
+    for file_name in _dataset_files(project):
+        s3_client.upload_file(f"/tmp/{file_name}", s3_bucket, f"datasets/{file_name}")
+    print(f'Dataset for project {project["name"]} stored in s3://{s3_bucket}/datasets/')
+
+
+def _store_reports(s3_client, project: dict, report_paths: list[str]):
     s3_bucket = os.environ["S3_BUCKET"]
     for report_path in report_paths:
         with open(report_path, "rb") as buffer:
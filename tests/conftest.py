@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from development_analyzer.datasources.datasource_factory import create_datasource
+from development_analyzer.project_schemas.project_schema_factory import create_project_schema
+from development_analyzer.task_table import TaskTable
+
+
+@pytest.fixture
+def cycle_time_datasource():
+    """
+    Tasks with cycle times of 1 to 20 days, one created each day
+    """
+    cycle_times = np.tile(np.arange(1, 21), 3)
+    created_at = np.datetime64("2024-01-01") + np.arange(len(cycle_times)).astype("timedelta64[D]")
+    closed_at = created_at + cycle_times.astype("timedelta64[D]")
+    num_tasks = len(cycle_times)
+    datasource = create_datasource(source="airtable", schema=create_project_schema("sample_project"))
+    datasource.tasks = TaskTable.from_columns(
+        type=["Task"] * num_tasks, status=["Done"] * num_tasks, created_at=created_at,
+        started_at=[np.datetime64("NaT")] * num_tasks, closed_at=closed_at, estimation=[np.nan] * num_tasks,
+        description=[f"task {index}" for index in range(num_tasks)])
+    datasource.filters = {"has_estimation": False}
+    return datasource
@@ -0,0 +1,106 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+# partition formula of AirtableClient: FIND(MID(RECORD_ID(), 4, 1), '<characters>') > 0
+PARTITION_FORMULA = re.compile(r"FIND\(MID\(RECORD_ID\(\), 4, 1\), '([^']*)'\) > 0")
+
+
+class FakeAirtable:
+    """
+    Local fake of the list records endpoint of the Airtable API, serving an in-memory table on a random port.
+    It paginates with offsets, filters by the partition formulas of AirtableClient, and answers the first
+    num_throttled requests with 429 (with a Retry-After header if retry_after is given).
+    Attributes
+    ----------
+        records: list[dict]
+            Records of the table, in the order they are paginated
+        num_throttled: int
+            Number of requests still to be answered with 429
+        retry_after: Optional[str]
+            Retry-After header of the 429 responses
+        requests: list[dict]
+            Query parameters of each request received, including the throttled ones
+    """
+    records: list[dict]
+    num_throttled: int
+    retry_after: Optional[str]
+    requests: list[dict]
+
+    def __init__(self, records: list[dict], num_throttled: int = 0, retry_after: Optional[str] = None):
+        self.records = records
+        self.num_throttled = num_throttled
+        self.retry_after = retry_after
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> "FakeAirtable":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def list_records(self, params: dict) -> tuple[int, dict, dict]:
+        """
+        Returns the status, headers and body of the response to a list records request
+        """
+        with self.lock:
+            self.requests.append(params)
+            if self.num_throttled > 0:
+                self.num_throttled -= 1
+                headers = {"Retry-After": self.retry_after} if self.retry_after is not None else {}
+                return 429, headers, {"errors": [{"error": "RATE_LIMIT_REACHED"}]}
+
+        records = self.records
+        partition = PARTITION_FORMULA.search(params.get("filterByFormula", ""))
+        if partition:
+            records = [record for record in records if record["id"][3] in partition.group(1)]
+        page_size = int(params.get("pageSize", 100))
+        start = int(params.get("offset", 0))
+        body = {"records": records[start:start + page_size]}
+        if start + page_size < len(records):
+            body["offset"] = str(start + page_size)
+        return 200, {}, body
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                status, headers, body = fake.list_records({key: values[0] for key, values in query.items()})
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def make_records(num_records: int, modified_at: str = "2024-03-01T00:00:00.000Z") -> list[dict]:
+    """
+    Records with ids spread over all the partitions, like the random ids of Airtable
+    """
+    from development_analyzer.datasources.airtable_client import RECORD_ID_CHARACTERS
+    return [{"id": f"rec{RECORD_ID_CHARACTERS[index % len(RECORD_ID_CHARACTERS)]}{index:010d}",
+             "createdTime": modified_at,
+             "fields": {"Name": f"task {index}", "lastModified": modified_at}}
+            for index in range(num_records)]
@@ -0,0 +1,89 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from development_analyzer.datasources.airtable_client import AirtableClient, PAGE_SIZE
+from tests.fake_airtable import FakeAirtable, make_records
+
+
+def create_client(fake: FakeAirtable, **kwargs) -> AirtableClient:
+    options = {"requests_per_second": 1000, "backoff_seconds": 0.01, **kwargs}
+    return AirtableClient("key", "base", "table", endpoint_url=fake.url, **options)
+
+
+def test_iterate_pages_follows_the_offsets():
+    records = make_records(2 * PAGE_SIZE + 5)
+    with FakeAirtable(records) as fake:
+        pages = list(create_client(fake).iterate_pages())
+
+    assert [len(page) for page in pages] == [PAGE_SIZE, PAGE_SIZE, 5]
+    assert [record["id"] for page in pages for record in page] == [record["id"] for record in records]
+    assert [request.get("offset") for request in fake.requests] == [None, str(PAGE_SIZE), str(2 * PAGE_SIZE)]
+
+
+def test_iterate_pages_passes_the_formula():
+    with FakeAirtable(make_records(3)) as fake:
+        list(create_client(fake).iterate_pages("IS_AFTER(LAST_MODIFIED_TIME(), '2024-01-01')"))
+
+    assert fake.requests[0]["filterByFormula"] == "IS_AFTER(LAST_MODIFIED_TIME(), '2024-01-01')"
+
+
+def test_throttled_requests_are_retried_with_exponential_backoff():
+    with FakeAirtable(make_records(10), num_throttled=3) as fake, \
+            mock.patch("development_analyzer.datasources.airtable_client.time.sleep") as sleep, \
+            mock.patch("development_analyzer.datasources.airtable_client.random.random", return_value=0.0):
+        pages = list(create_client(fake, backoff_seconds=1.0).iterate_pages())
+
+    assert len(pages[0]) == 10
+    assert len(fake.requests) == 4
+    # the short waits of the rate limiter are left out
+    backoffs = [call.args[0] for call in sleep.call_args_list if call.args[0] >= 0.5]
+    assert backoffs == [1.0, 2.0, 4.0]
+
+
+def test_throttled_requests_wait_the_retry_after_header():
+    with FakeAirtable(make_records(10), num_throttled=1, retry_after="7") as fake, \
+            mock.patch("development_analyzer.datasources.airtable_client.time.sleep") as sleep:
+        list(create_client(fake).iterate_pages())
+
+    assert 7.0 in [call.args[0] for call in sleep.call_args_list]
+
+
+def test_throttling_beyond_the_retries_raises():
+    with FakeAirtable(make_records(10), num_throttled=10) as fake:
+        with pytest.raises(requests.HTTPError):
+            list(create_client(fake, max_retries=2).iterate_pages())
+
+    assert len(fake.requests) == 3
+
+
+def test_concurrent_paging_fetches_every_partition_once():
+    records = make_records(1000)
+    with FakeAirtable(records, num_throttled=2) as fake:
+        pages = list(create_client(fake).iterate_pages_concurrently(concurrency=4, max_buffered_pages=2))
+
+    ids = [record["id"] for page in pages for record in page]
+    assert sorted(ids) == sorted(record["id"] for record in records)
+    partitions = {request["filterByFormula"] for request in fake.requests}
+    assert len(partitions) == 4
+    assert all(len(page) <= PAGE_SIZE for page in pages)
+
+
+def test_concurrent_paging_keeps_the_formula_of_each_partition():
+    with FakeAirtable(make_records(50)) as fake:
+        list(create_client(fake).iterate_pages_concurrently("{Status} = 'Done'", concurrency=2))
+
+    assert all(request["filterByFormula"].startswith("AND({Status} = 'Done', FIND(") for request in fake.requests)
+
+
+def test_concurrent_paging_requests_are_rate_limited():
+    with FakeAirtable(make_records(10 * PAGE_SIZE)) as fake:
+        start = time.monotonic()
+        list(create_client(fake, requests_per_second=20).iterate_pages_concurrently(concurrency=4))
+        elapsed = time.monotonic() - start
+
+    # 4 partitions of about 250 records: 3 pages each, spaced 1/20 s apart
+    assert len(fake.requests) == 12
+    assert elapsed >= 11 / 20
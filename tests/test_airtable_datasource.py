@@ -0,0 +1,136 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from development_analyzer.datasources.airtable_datasource import AirtableDataSource, RECORD_ID_COLUMN
+from development_analyzer.project_schemas.project_schema_factory import create_project_schema
+
+
+class FakeClient:
+    """
+    Client that returns the given pages, optionally failing after them, and records the formulas requested
+    """
+
+    def __init__(self, pages: list[list[dict]], error: Exception = None):
+        self.pages = pages
+        self.error = error
+        self.formulas = []
+
+    def iterate_pages_concurrently(self, formula=None, concurrency=4):
+        self.formulas.append(formula)
+        yield from self.pages
+        if self.error:
+            raise self.error
+
+
+def record(record_id: str, name: str, modified: str) -> dict:
+    return {"id": record_id, "fields": {"Name": name, "lastModifiedStatus": modified}}
+
+
+def sync(datasource: AirtableDataSource, file_path: str, client: FakeClient, full: bool = False):
+    datasource._client = lambda: client
+    if full:
+        datasource.import_dataset(file_path)
+    else:
+        datasource.sync_dataset(file_path)
+
+
+def read_dataset(file_path: str) -> dict[str, str]:
+    dataset = pd.read_csv(file_path, dtype=str)
+    return dict(zip(dataset[RECORD_ID_COLUMN], dataset["Name"]))
+
+
+def read_watermark(file_path: str) -> str:
+    with open(f"{file_path}.sync.json") as sync_file:
+        return json.load(sync_file)["watermark"]
+
+
+@pytest.fixture
+def datasource() -> AirtableDataSource:
+    return AirtableDataSource(create_project_schema("sample_project"), api_key="key", base="base", table="table")
+
+
+@pytest.fixture
+def file_path(tmp_path, datasource) -> str:
+    file_path = str(tmp_path / "dataset.csv")
+    sync(datasource, file_path, FakeClient([[record("rec1", "first", "2024-01-01T00:00:00.000Z"),
+                                             record("rec2", "second", "2024-01-02T00:00:00.000Z")]]), full=True)
+    return file_path
+
+
+def test_import_stores_the_records_and_the_watermark(file_path):
+    assert read_dataset(file_path) == {"rec1": "first", "rec2": "second"}
+    assert read_watermark(file_path) == "2024-01-02T00:00:00.000Z"
+
+
+def test_sync_fetches_the_records_modified_since_the_watermark(datasource, file_path):
+    client = FakeClient([])
+    sync(datasource, file_path, client)
+
+    assert client.formulas == ["NOT(IS_BEFORE({lastModifiedStatus}, '2024-01-02T00:00:00.000Z'))"]
+    assert read_dataset(file_path) == {"rec1": "first", "rec2": "second"}
+
+
+def test_sync_replaces_the_updated_records(datasource, file_path):
+    sync(datasource, file_path, FakeClient([[record("rec1", "first updated", "2024-01-03T00:00:00.000Z")]]))
+
+    assert read_dataset(file_path) == {"rec1": "first updated", "rec2": "second"}
+    assert len(pd.read_csv(file_path)) == 2
+
+
+def test_sync_appends_the_new_records(datasource, file_path):
+    sync(datasource, file_path, FakeClient([[record("rec3", "third", "2024-01-03T00:00:00.000Z")],
+                                            [record("rec4", "fourth", "2024-01-04T00:00:00.000Z")]]))
+
+    assert read_dataset(file_path) == {"rec1": "first", "rec2": "second", "rec3": "third", "rec4": "fourth"}
+
+
+def test_sync_adds_the_new_columns(datasource, file_path):
+    new_record = record("rec3", "third", "2024-01-03T00:00:00.000Z")
+    new_record["fields"]["Points"] = "3"
+    sync(datasource, file_path, FakeClient([[new_record]]))
+
+    dataset = pd.read_csv(file_path, dtype=str).set_index(RECORD_ID_COLUMN)
+    assert dataset.loc["rec3", "Points"] == "3"
+    assert pd.isna(dataset.loc["rec1", "Points"])
+
+
+def test_watermark_advances_after_a_successful_sync(datasource, file_path):
+    sync(datasource, file_path, FakeClient([[record("rec1", "first updated", "2024-01-05T00:00:00.000Z"),
+                                             record("rec3", "third", "2024-01-04T00:00:00.000Z")]]))
+
+    assert read_watermark(file_path) == "2024-01-05T00:00:00.000Z"
+
+
+def test_watermark_does_not_move_back(datasource, file_path):
+    # records modified at the watermark are fetched again
+    sync(datasource, file_path, FakeClient([[record("rec2", "second", "2024-01-02T00:00:00.000Z")]]))
+
+    assert read_watermark(file_path) == "2024-01-02T00:00:00.000Z"
+
+
+def test_failed_sync_leaves_the_previous_dataset_and_watermark(datasource, file_path):
+    with open(file_path) as dataset_file:
+        previous_dataset = dataset_file.read()
+    client = FakeClient([[record("rec1", "first updated", "2024-01-05T00:00:00.000Z")]],
+                        error=ConnectionError("connection lost"))
+
+    with pytest.raises(ConnectionError):
+        sync(datasource, file_path, client)
+
+    with open(file_path) as dataset_file:
+        assert dataset_file.read() == previous_dataset
+    assert read_watermark(file_path) == "2024-01-02T00:00:00.000Z"
+    assert sorted(os.listdir(os.path.dirname(file_path))) == ["dataset.csv", "dataset.csv.sync.json"]
+
+
+def test_sync_without_previous_sync_imports_the_whole_table(datasource, tmp_path):
+    file_path = str(tmp_path / "new.csv")
+    client = FakeClient([[record("rec1", "first", "2024-01-01T00:00:00.000Z")]])
+    sync(datasource, file_path, client)
+
+    assert client.formulas == [None]
+    assert read_dataset(file_path) == {"rec1": "first"}
+    assert read_watermark(file_path) == "2024-01-01T00:00:00.000Z"
@@ -0,0 +1,67 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from development_analyzer.datasources.datasource_factory import create_datasource
+from development_analyzer.project_schemas.project_schema_factory import create_project_schema
+from development_analyzer.simulations.backtesting import backtest
+from development_analyzer.task_table import TaskTable
+
+
+@pytest.fixture
+def datasource():
+    """
+    One task closed on each of the first 30 days, then only on days 35 and 44: the end of the history
+    """
+    closing_days = [*range(30), 35, 44]
+    closed_at = np.datetime64("2024-01-01") + np.array(closing_days, dtype="timedelta64[D]")
+    num_tasks = len(closing_days)
+    datasource = create_datasource(source="airtable", schema=create_project_schema("sample_project"))
+    datasource.tasks = TaskTable.from_columns(
+        type=["Task"] * num_tasks, status=["Done"] * num_tasks, created_at=closed_at, started_at=closed_at,
+        closed_at=closed_at, estimation=[np.nan] * num_tasks, description=[""] * num_tasks)
+    return datasource
+
+
+def test_finished_origins(datasource):
+    # the origins are days 30, 35 and 40, and a single task needs 1 day with the throughput known at each of them
+    result = backtest(datasource, horizon_days=5, num_tasks=1, step_days=5, seed=0).when_will_be_finished
+    assert [forecast.actual for forecast in result.forecasts] == [6, 1, 5]
+    assert not any(forecast.censored for forecast in result.forecasts)
+    assert result.censored == 0
+    assert result.coverage == {95: pytest.approx(1 / 3), 85: pytest.approx(1 / 3), 50: pytest.approx(1 / 3)}
+    assert result.mean_absolute_error == pytest.approx(3)
+    assert result.bias == pytest.approx(-3)
+
+
+def test_censored_origins(datasource):
+    # 10 tasks are forecast to need 10 days, but only 2 tasks are closed after the origins
+    result = backtest(datasource, horizon_days=5, num_tasks=10, step_days=5, seed=0).when_will_be_finished
+    assert [forecast.percentiles[50] for forecast in result.forecasts] == [10, 10, 10]
+    # the tasks need more days than the history runs after each origin
+    assert [forecast.actual for forecast in result.forecasts] == [16, 11, 6]
+    assert all(forecast.censored for forecast in result.forecasts)
+    assert result.censored == 3
+    # the history already ran past the percentiles of the first two origins, that are missed, while the outcome of
+    # the last one is unknown
+    assert result.coverage == {95: 0.0, 85: 0.0, 50: 0.0}
+    assert result.mean_absolute_error is None
+    assert result.bias is None
+
+
+def test_censored_origins_unknown_at_every_percentile(datasource):
+    result = backtest(datasource, horizon_days=5, num_tasks=20, step_days=5, seed=0).when_will_be_finished
+    assert result.censored == 3
+    assert all(np.isnan(coverage) for coverage in result.coverage.values())
+
+
+def test_origins_without_throughput_in_the_window_are_skipped(datasource):
+    # no task is closed in the 4 days before the origins of days 35 and 40
+    result = backtest(datasource, horizon_days=5, num_tasks=1, step_days=5, window_days=4, seed=0)
+    for forecasts in [result.how_many_done.forecasts, result.when_will_be_finished.forecasts]:
+        assert [forecast.origin for forecast in forecasts] == [datetime.date(2024, 1, 31)]
+
+    # the 10 days before each origin include a day with closed tasks
+    result = backtest(datasource, horizon_days=5, num_tasks=1, step_days=5, window_days=10, seed=0)
+    assert [forecast.actual for forecast in result.when_will_be_finished.forecasts] == [6, 1, 5]
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from development_analyzer.simulations.convolution_engine import ConvolutionEngine, DIRECT_CONVOLUTION_SIZE
+
+# 0, 1 or 2 tasks closed a day, each with probability 1/3
+THROUGHPUT = [0, 1, 2]
+
+
+def test_tasks_done_cdf():
+    engine = ConvolutionEngine(THROUGHPUT)
+    np.testing.assert_allclose(engine.tasks_done_cdf(1), np.array([1, 2, 3]) / 3)
+    # the sum of two days: 1, 2, 3, 2, 1 ways out of 9 to do 0 to 4 tasks
+    np.testing.assert_allclose(engine.tasks_done_cdf(2), np.array([1, 3, 6, 8, 9]) / 9)
+    np.testing.assert_allclose(engine.tasks_done_cdf(3), np.cumsum([1, 3, 6, 7, 6, 3, 1]) / 27)
+    np.testing.assert_array_equal(engine.tasks_done_cdf(0), [1])
+
+
+def test_tasks_done_curve_cdf():
+    engine = ConvolutionEngine(THROUGHPUT)
+    cdf = engine.tasks_done_curve_cdf(3)
+    assert cdf.shape == (3, 7)
+    # the days with fewer possible tasks are padded with a cumulative probability of 1
+    np.testing.assert_allclose(cdf[0], [1 / 3, 2 / 3, 1, 1, 1, 1, 1])
+    np.testing.assert_allclose(cdf[1], np.array([1, 3, 6, 8, 9, 9, 9]) / 9)
+    for days in range(1, 4):
+        np.testing.assert_allclose(cdf[days - 1, :2 * days + 1], engine.tasks_done_cdf(days))
+    assert engine.tasks_done_curve_cdf(0).shape == (0, 1)
+
+
+def test_days_to_finish_cdf():
+    engine = ConvolutionEngine(THROUGHPUT, tail_probability=0.1)
+    # 2 tasks are not finished in d days when at most 1 task is done: (d + 1) / 3^d, below 0.1 from day 4
+    np.testing.assert_allclose(engine.days_to_finish_cdf(2), [0, 1 / 3, 6 / 9, 23 / 27, 76 / 81])
+    np.testing.assert_array_equal(engine.days_to_finish_cdf(0), [1])
+
+
+def test_finish_days_curve_cdf():
+    engine = ConvolutionEngine(THROUGHPUT, tail_probability=0.1)
+    cdf = engine.finish_days_curve_cdf(2)
+    # 1 task is finished in d days unless no task is done on any of them
+    np.testing.assert_allclose(cdf[:, 0], [0, 2 / 3, 8 / 9, 26 / 27, 80 / 81])
+    np.testing.assert_allclose(cdf[:, 1], engine.days_to_finish_cdf(2))
+
+
+def test_finish_days_are_computed_until_the_tail_probability():
+    for tail_probability in [0.1, 1e-3, 1e-9]:
+        cdf = ConvolutionEngine(THROUGHPUT, tail_probability=tail_probability).days_to_finish_cdf(2)
+        assert 1 - cdf[-1] <= tail_probability
+        assert 1 - cdf[-2] > tail_probability
+
+
+def test_zero_throughput():
+    engine = ConvolutionEngine([0, 0, 0])
+    np.testing.assert_array_equal(engine.tasks_done_cdf(5), [1])
+    np.testing.assert_array_equal(engine.tasks_done_curve_cdf(2), [[1], [1]])
+    np.testing.assert_array_equal(engine.days_to_finish_cdf(0), [1])
+    with pytest.raises(ValueError, match="without closed tasks"):
+        engine.days_to_finish_cdf(1)
+    with pytest.raises(ValueError, match="without closed tasks"):
+        engine.finish_days_curve_cdf(3)
+    with pytest.raises(ValueError, match="without throughput history"):
+        ConvolutionEngine([])
+
+
+def test_fft_convolutions_match_the_direct_ones():
+    throughput = np.arange(2 * DIRECT_CONVOLUTION_SIZE)
+    pmf = np.full(len(throughput), 1 / len(throughput))
+    expected = np.ones(1)
+    for _ in range(5):
+        expected = np.convolve(expected, pmf)
+    np.testing.assert_allclose(ConvolutionEngine(throughput).tasks_done_cdf(5), np.cumsum(expected), atol=1e-12)
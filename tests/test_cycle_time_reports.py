@@ -0,0 +1,42 @@
+import csv
+import json
+
+import matplotlib
+import numpy as np
+
+from development_analyzer.reports.report import metrics_to_dict
+from development_analyzer.reports.report_factory import create_report
+
+matplotlib.use("Agg")
+
+
+def test_scatter_compute_does_not_write_files(tmp_path, cycle_time_datasource):
+    report = create_report("scatter", cycle_time_datasource, str(tmp_path),
+                           {"show_labels": False, "highlight_last_days": None})
+    report.compute()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_scatter_appendix_is_written_with_the_report(tmp_path, cycle_time_datasource):
+    report = create_report("scatter", cycle_time_datasource, str(tmp_path),
+                           {"show_labels": False, "highlight_last_days": None})
+    report.generate_report()
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(report.file_names)
+    with open(tmp_path / report.appendix_name) as appendix_file:
+        rows = list(csv.reader(appendix_file))[1:]
+    assert len(rows) == len(cycle_time_datasource.tasks)
+    # most recent first
+    assert [row[0] for row in rows] == sorted((row[0] for row in rows), reverse=True)
+
+
+def test_histogram_draws_the_computed_bins(cycle_time_datasource):
+    from matplotlib import pyplot as plt
+    report = create_report("histogram", cycle_time_datasource, None, None)
+    metrics = report.compute()
+    # the bins are in the JSON of the metrics, and the chart is drawn from them alone
+    assert json.loads(json.dumps(metrics_to_dict(metrics)))["bin_counts"] == metrics.bin_counts.tolist()
+    metrics.bin_counts = metrics.bin_counts * 2
+    report.render(metrics)
+    heights = [bar.get_height() for bar in plt.gca().patches]
+    plt.close("all")
+    np.testing.assert_array_equal(heights, metrics.bin_counts)
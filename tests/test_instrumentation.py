@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from development_analyzer import instrumentation
+from development_analyzer.instrumentation import Sink, Span, add_sink, remove_sink, span
+
+ALLOCATION = 100 * 1024 ** 2
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.spans = []
+
+    def emit(self, span: Span):
+        self.spans.append(span)
+
+
+@pytest.mark.skipif(instrumentation.resource is None, reason="resource usage is not available")
+def test_peak_rss_increase_is_the_memory_each_stage_adds():
+    sink = ListSink()
+    add_sink(sink)
+    try:
+        with span("allocate"):
+            np.ones(ALLOCATION // 8).sum()
+        # the same memory again fits under the peak of the previous stage
+        with span("allocate_again"):
+            np.ones(ALLOCATION // 8).sum()
+    finally:
+        remove_sink(sink)
+
+    first, second = sink.spans
+    assert first.peak_rss_increase >= ALLOCATION * 0.9
+    assert second.peak_rss_increase < ALLOCATION * 0.1
+    assert second.process_peak_rss >= first.process_peak_rss >= first.peak_rss_increase
@@ -0,0 +1,102 @@
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from development_analyzer.simulations import monte_carlo_engine
+from development_analyzer.simulations.monte_carlo_engine import (
+    ADAPTIVE_BLOCKS_PER_BATCH, DEFAULT_BATCH_SIZE, MonteCarloEngine, SIMULATION_BLOCK_SIZE,
+)
+
+THROUGHPUT = [1, 2, 2, 3, 5, 8]
+
+
+class FakeExecutor:
+    """
+    Executor that runs the blocks in the current process, counting the pools created
+    """
+    created = 0
+    last = None
+
+    def __init__(self, max_workers: int):
+        FakeExecutor.created += 1
+        FakeExecutor.last = self
+        self.max_workers = max_workers
+        self.shut_down = False
+
+    def map(self, function, *iterables):
+        assert not self.shut_down
+        return map(function, *iterables)
+
+    def shutdown(self):
+        self.shut_down = True
+
+
+@pytest.fixture
+def fake_executor():
+    FakeExecutor.created = 0
+    FakeExecutor.last = None
+    with mock.patch.object(monte_carlo_engine, "ProcessPoolExecutor", FakeExecutor):
+        yield FakeExecutor
+
+
+@pytest.mark.parametrize("arguments, message", [
+    ({"max_simulations": 0}, "maximum number of simulations"),
+    ({"batch_size": 0}, "batch size"),
+    ({"tolerance": -1}, "tolerance"),
+    ({"confidence": 1}, "confidence"),
+    ({"levels": []}, "percentile level"),
+])
+def test_adaptive_simulations_validate_their_arguments(arguments, message):
+    engine = MonteCarloEngine(THROUGHPUT, seed=1)
+    options = {"levels": [50, 85], "tolerance": 1, "max_simulations": 1000, **arguments}
+    for simulate in [engine.days_to_finish_adaptive, engine.tasks_done_adaptive]:
+        with pytest.raises(ValueError, match=message):
+            simulate(10, **options)
+
+
+def test_adaptive_batches_reuse_one_pool(fake_executor):
+    engine = MonteCarloEngine(THROUGHPUT, seed=1, max_workers=2)
+    # the tasks done in 200 days spread over hundreds of values, so a tolerance of 0 is never reached
+    result = engine.tasks_done_adaptive(200, [50, 95], tolerance=0, max_simulations=5 * SIMULATION_BLOCK_SIZE,
+                                        batch_size=2 * SIMULATION_BLOCK_SIZE)
+
+    assert len(result.samples) == 5 * SIMULATION_BLOCK_SIZE
+    assert not result.converged
+    assert fake_executor.created == 1
+
+
+def test_adaptive_default_batches_fan_out_to_the_workers(fake_executor):
+    engine = MonteCarloEngine(THROUGHPUT, seed=1, max_workers=4)
+    result = engine.tasks_done_adaptive(200, [50, 95], tolerance=0, max_simulations=3 * DEFAULT_BATCH_SIZE)
+
+    assert len(result.samples) == 3 * DEFAULT_BATCH_SIZE
+    assert fake_executor.created == 1
+    assert fake_executor.last.max_workers == min(4, ADAPTIVE_BLOCKS_PER_BATCH)
+
+
+def test_adaptive_results_in_a_process_pool_match_one_process():
+    options = {"levels": [50, 95], "tolerance": 0, "max_simulations": 2 * DEFAULT_BATCH_SIZE}
+    sequential = MonteCarloEngine(THROUGHPUT, seed=5).days_to_finish_adaptive(30, **options)
+    parallel = MonteCarloEngine(THROUGHPUT, seed=5, max_workers=2).days_to_finish_adaptive(30, **options)
+
+    np.testing.assert_array_equal(sequential.samples, parallel.samples)
+    assert sequential.precision == parallel.precision
+
+
+def test_adaptive_results_do_not_depend_on_the_workers(fake_executor):
+    options = {"levels": [50, 95], "tolerance": 0.5, "max_simulations": 6 * SIMULATION_BLOCK_SIZE,
+               "batch_size": 2 * SIMULATION_BLOCK_SIZE}
+    sequential = MonteCarloEngine(THROUGHPUT, seed=7).tasks_done_adaptive(10, **options)
+    parallel = MonteCarloEngine(THROUGHPUT, seed=7, max_workers=3).tasks_done_adaptive(10, **options)
+
+    np.testing.assert_array_equal(sequential.samples, parallel.samples)
+    assert sequential.precision == parallel.precision
+
+
+def test_adaptive_simulations_stop_once_converged():
+    engine = MonteCarloEngine(THROUGHPUT, seed=3)
+    result = engine.tasks_done_adaptive(10, [50], tolerance=100, max_simulations=10000, batch_size=500)
+
+    assert result.converged
+    assert len(result.samples) == 500
@@ -0,0 +1,45 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from development_analyzer.reports.monte_carlo_how_many_done import MonteCarloHowManyDoneReport
+from development_analyzer.reports.monte_carlo_report import MIN_SHOWN_PROBABILITY, MonteCarloReport
+from development_analyzer.reports.monte_carlo_when_will_be_finished import MonteCarloWhenWillBeFinishedReport
+
+
+def how_many_done(**options) -> MonteCarloHowManyDoneReport:
+    finish_date = datetime.date.today() + datetime.timedelta(days=30)
+    return MonteCarloHowManyDoneReport(None, "output", {"finish_date": finish_date, "num_simulations": 100,
+                                                        **options})
+
+
+def when_will_be_finished(**options) -> MonteCarloWhenWillBeFinishedReport:
+    return MonteCarloWhenWillBeFinishedReport(None, "output", {"num_tasks": 40, "num_simulations": 100, **options})
+
+
+@pytest.mark.parametrize("report, stem", [
+    (how_many_done, "monte_carlo_how_many_done"),
+    (when_will_be_finished, "monte_carlo_when_will_be_finished"),
+])
+def test_file_names(report, stem):
+    suffix = 30 if report is how_many_done else 40
+    assert report().file_names == [f"{stem}_plot_{suffix}.png"]
+    # the chart and the table of a curve share their name
+    assert report(curve=True).file_names == [f"{stem}_curve_{suffix}.png", f"{stem}_curve_{suffix}.json"]
+
+
+def test_likely_values_leave_out_the_negligible_tails():
+    probabilities = np.array([MIN_SHOWN_PROBABILITY / 2, MIN_SHOWN_PROBABILITY, 0.5, 0,
+                              0.5 - 2 * MIN_SHOWN_PROBABILITY, MIN_SHOWN_PROBABILITY / 2])
+    # values in between are kept even when they are unlikely
+    np.testing.assert_array_equal(MonteCarloReport._likely_values(probabilities), [1, 2, 3, 4])
+
+
+def test_labels():
+    report = when_will_be_finished()
+    assert report._runs_label(100) == "(MCS of 100 runs) "
+    assert report._runs_label(None) == "(exact distribution) "
+    metrics = type("Metrics", (), {"precision": {95: 2.0, 50: 0.5}, "confidence": 0.95})
+    assert report._precision_label(metrics) == "(percentiles within ±2 days at 95% confidence) "
+    assert how_many_done()._precision_label(metrics) == "(percentiles within ±2 tasks at 95% confidence) "
@@ -0,0 +1,37 @@
+import matplotlib
+
+from development_analyzer.reports.report_factory import create_report
+from development_analyzer.reports.report_store import LocalReportStore
+
+matplotlib.use("Agg")
+
+
+def read(file_path: str) -> bytes:
+    with open(file_path, "rb") as report_file:
+        return report_file.read()
+
+
+def test_report_overwritten_without_store_is_not_reused(tmp_path, cycle_time_datasource):
+    datasource = cycle_time_datasource
+    output, store = tmp_path / "output", LocalReportStore(str(tmp_path / "store"))
+    output.mkdir()
+    all_tasks = datasource.tasks
+    path = create_report("histogram", datasource, str(output), None, store).generate_report()
+    original = read(path)
+
+    # a run with other filters and no store writes the same file
+    datasource.tasks = all_tasks.select(all_tasks.cycle_time <= 5)
+    create_report("histogram", datasource, str(output), None).generate_report()
+    assert read(path) != original
+
+    datasource.tasks = all_tasks
+    assert read(create_report("histogram", datasource, str(output), None, store).generate_report()) == original
+
+
+def test_fingerprint_does_not_depend_on_the_number_of_workers(cycle_time_datasource):
+    def fingerprint(**options) -> str:
+        return create_report("monte_carlo_when_will_be_finished", cycle_time_datasource, None,
+                             {"num_tasks": 10, "num_simulations": 100, "seed": 1, **options}).fingerprint
+
+    assert fingerprint(max_workers=1) == fingerprint(max_workers=4) == fingerprint()
+    assert fingerprint(seed=2) != fingerprint()